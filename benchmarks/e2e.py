@@ -0,0 +1,112 @@
+"""End-to-end throughput of BasicBalatro against the fake mod (fakemod.py) over UDP.
+
+    python -m benchmarks.e2e --decisions 500 --busy 0.05 --step-delay 0 --busy-delay 0.05
+    python -m benchmarks.e2e --decisions 500 --subscribe --format packed --loss 0.01
+    python -m benchmarks.e2e --decisions 500 --fields --pad-bytes 8000
+
+The env launches fakemod.py itself through BALATRO_EXEC_PATH, exactly as it
+would launch the game. Reports decisions/sec and the PROFILER breakdown of
+where the time went, and writes them as JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from core.profiling import PROFILER
+from dqn_agent import DQNAgent
+from env import AGENT_FIELDS, BasicBalatro
+
+FAKEMOD_PATH = Path(__file__).resolve().parent.parent / "fakemod.py"
+
+
+def run(decisions, subscribe=False, wire_format="json", step_delay=None, busy_delay=None, optimize=True,
+        busy=0.0, busy_jitter=0.0, loss=0.0, reorder=0.0, pad_bytes=0, seed=0, quiet=True, fields=False,
+        replay_ratio=None):
+    os.environ["BALATRO_EXEC_PATH"] = str(FAKEMOD_PATH)
+    for name, value in [("BUSY", busy), ("BUSY_JITTER", busy_jitter), ("LOSS", loss), ("REORDER", reorder),
+                        ("PAD_BYTES", pad_bytes), ("SEED", seed)]:
+        os.environ[f"BALATRO_FAKE_{name}"] = str(value)
+
+    agent = DQNAgent(device="cpu", replay_ratio=replay_ratio if optimize else None)
+    if not optimize:
+        agent.optimize_model = lambda: None
+    env = BasicBalatro(agent=agent, subscribe=subscribe, wire_format=wire_format,
+                       fields=AGENT_FIELDS if fields else None)
+    if step_delay is not None:
+        env.step_delay = step_delay
+    if busy_delay is not None:
+        env.busy_delay = busy_delay
+
+    PROFILER.configure(enabled=True)
+    start = time.perf_counter()
+    try:
+        # The agent prints every decision and reward
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            while agent.steps_done < decisions:
+                env.run_step()
+    finally:
+        elapsed = time.perf_counter() - start
+        env.close()
+        agent.close()
+    report = PROFILER.snapshot()
+    PROFILER.configure(enabled=False)
+
+    return {
+        "decisions": agent.steps_done,
+        "elapsed_s": elapsed,
+        "decisions_per_s": agent.steps_done / elapsed,
+        "env_steps": report["steps"],
+        "retries": report["counters"].get("env.state.retry", 0),
+        "reconnects": report["counters"].get("env.reconnect", 0),
+        "sleep_s": report["sleep_s"],
+        "work_s": report["work_s"],
+        "counters": report["counters"],
+        "timers": report["timers"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--decisions", type=int, default=500)
+    parser.add_argument("--subscribe", action="store_true")
+    parser.add_argument("--format", default="json", choices=["json", "packed"])
+    parser.add_argument("--fields", action="store_true", help="ask only for the gamestate fields the agent reads")
+    parser.add_argument("--step-delay", type=float, help="override BalatroEnvBase.step_delay")
+    parser.add_argument("--busy-delay", type=float, help="override BalatroEnvBase.busy_delay")
+    parser.add_argument("--no-optimize", action="store_true", help="act only, skip gradient steps")
+    parser.add_argument("--replay-ratio", type=float, help="train on a background learner at this many updates per transition")
+    parser.add_argument("--busy", type=float, default=0.0, help="fake mod: seconds BUSY after each action")
+    parser.add_argument("--busy-jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0, help="fake mod: datagram drop probability")
+    parser.add_argument("--reorder", type=float, default=0.0, help="fake mod: datagram reorder probability")
+    parser.add_argument("--pad-bytes", type=int, default=0, help="fake mod: padding added to JSON gamestates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmarks/e2e_results.json")
+    args = parser.parse_args(argv)
+
+    result = run(args.decisions, subscribe=args.subscribe, wire_format=args.format, step_delay=args.step_delay,
+                 busy_delay=args.busy_delay, optimize=not args.no_optimize, busy=args.busy,
+                 busy_jitter=args.busy_jitter, loss=args.loss, reorder=args.reorder, pad_bytes=args.pad_bytes,
+                 seed=args.seed, fields=args.fields, replay_ratio=args.replay_ratio)
+    result["config"] = vars(args)
+
+    print(f"{result['decisions']} decisions in {result['elapsed_s']:.2f} s: "
+          f"{result['decisions_per_s']:.1f} decisions/s, {result['retries']} GET_STATE retries, "
+          f"{result['reconnects']} reconnects")
+    print(f"sleep {result['sleep_s']:.2f} s, work {result['work_s']:.2f} s")
+    print(f"{'phase':<24}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, h in sorted(result["timers"].items(), key=lambda item: -item[1]["total_s"]):
+        print(f"{name:<24}{h['count']:>8}{h['total_s']:>10.3f}{h['p50_s'] * 1e3:>10.3f}{h['p99_s'] * 1e3:>10.3f}")
+
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
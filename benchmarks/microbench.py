@@ -0,0 +1,248 @@
+"""Microbenchmarks for the code that runs on every agent decision.
+
+Needs no game instance: gamestates are synthesized in the mod's format.
+
+    python -m benchmarks.microbench --out benchmarks/results.json
+    python -m benchmarks.microbench --baseline benchmarks/baseline.json --threshold 0.15
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+
+Results map each benchmark name to its median and minimum time per call in
+microseconds. With --baseline, any benchmark slower than baseline * (1 +
+threshold) is reported and the exit status is 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import torch
+
+from core.balsim import SELECTING_HAND, BalatroSim
+from core.encoders import encode_game, encode_games
+from core.inference import InferenceEngine
+from core.rlutils import ReplayMemory
+from dqn_agent import DQNAgent
+from env import Actions, BasicBalatro
+
+SUITS = ["Hearts", "Diamonds", "Spades", "Clubs"]
+
+
+def synthetic_card(rng):
+    return {
+        "type": "Card",
+        "id": rng.randint(2, 14),
+        "suit": rng.choice(SUITS),
+        "effect": "Base",
+        "cost": 1,
+        "sell_cost": 1,
+        "seal": "None",
+    }
+
+
+def synthetic_gamestate(rng, hand_size=8):
+    """A SELECTING_HAND gamestate shaped like the mod's getGamestate output."""
+    return {
+        "state": SELECTING_HAND,
+        "waiting_for": None,
+        "game": {
+            "hands_played": rng.randint(0, 20),
+            "Skips": 0,
+            "round": rng.randint(1, 24),
+            "dollars": rng.randint(0, 50),
+            "max_jokers": 5,
+            "bankrupt_at": 0,
+            "chips": rng.randint(0, 5000),
+        },
+        "hand": sorted((synthetic_card(rng) for _ in range(hand_size)), key=lambda card: -card["id"]),
+        "jokers": [],
+        "consumables": [],
+        "shop": {},
+        "current_round": {
+            "discards_left": rng.randint(0, 3),
+            "hands_left": rng.randint(1, 4),
+            "blind_on_deck": "Small",
+            "reroll_cost": 5,
+        },
+        "used_vouchers": [],
+        "handsData": {},
+        "current_hand": {},
+        "waitingForAction": True,
+        "action_no": rng.randint(0, 10000),
+    }
+
+
+def synthetic_selection(rng, max_selected=5):
+    return rng.sample(range(1, 9), rng.randint(0, max_selected))
+
+
+def measure(fn, repeat=7, min_time=0.05):
+    """Median and minimum seconds per call of fn(), calibrated so each repeat runs >= min_time."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings), min(timings)
+
+
+class Suite:
+    def __init__(self, seed=0, repeat=7, min_time=0.05, filter=None):
+        self.rng = random.Random(seed)
+        self.repeat = repeat
+        self.min_time = min_time
+        self.filter = filter
+        self.results = {}
+
+    def bench(self, name, fn, **params):
+        if self.filter and self.filter not in name:
+            return
+        median, best = measure(fn, self.repeat, self.min_time)
+        self.results[name] = {"median_us": median * 1e6, "min_us": best * 1e6, "params": params}
+        print(f"{name:<45} {median * 1e6:12.2f} us/call")
+
+    def gamestates(self, count):
+        return [synthetic_gamestate(self.rng) for _ in range(count)], \
+               [synthetic_selection(self.rng) for _ in range(count)]
+
+    def run(self, batch_sizes, buffer_sizes, backends=("eager",)):
+        agent = DQNAgent(device="cpu")
+        env = BasicBalatro(agent=agent, simulator=BalatroSim(seed=0))
+
+        Gs, selections = self.gamestates(max(batch_sizes + [64]))
+        self.bench("encode_game", lambda: encode_game(Gs[0], selections[0]))
+        for n in batch_sizes:
+            self.bench(f"encode_games[batch={n}]", lambda n=n: encode_games(Gs[:n], selections[:n]), batch=n)
+
+        output = torch.zeros(10)
+        self.bench("leave_correct_actions",
+                   lambda: agent.leave_correct_actions(output, Gs[0], selections[0], "Hand"))
+        for n in batch_sizes:
+            self.bench(f"masks[batch={n}]", lambda n=n: agent.masker.masks(Gs[:n], selections[:n], "Hand"), batch=n)
+        for n in batch_sizes:
+            self.bench(f"get_policy_actions[batch={n}]",
+                       lambda n=n: agent.get_policy_actions(Gs[:n], selections[:n], "Hand"), batch=n)
+
+        states = torch.from_numpy(encode_games(Gs, selections))
+        for backend in backends:
+            net = agent.policy_net if backend == "eager" else InferenceEngine(agent.policy_net, backend)
+            for n in batch_sizes:
+                def forward(net=net, x=states[:n]):
+                    with torch.inference_mode():
+                        return net(x)
+                self.bench(f"policy_forward[backend={backend},batch={n}]", forward, backend=backend, batch=n)
+
+        action = torch.tensor([[3]])
+        mask = torch.zeros(10, dtype=torch.bool)
+        for capacity in buffer_sizes:
+            memory = ReplayMemory(capacity)
+            for i in range(capacity):
+                memory.push(states[i % len(states)], action, states[(i + 1) % len(states)], 1.0, mask)
+            self.bench(f"replay_push[capacity={capacity}]",
+                       lambda memory=memory: memory.push(states[0], action, states[1], 1.0, mask), capacity=capacity)
+            for n in batch_sizes:
+                self.bench(f"replay_sample[capacity={capacity},batch={n}]",
+                           lambda memory=memory, n=n: memory.sample(n), capacity=capacity, batch=n)
+
+        # steps_done is pinned off the save interval so no checkpoint is written
+        for i in range(agent.memory.capacity):
+            agent.memory.push(states[i % len(states)], action, states[(i + 1) % len(states)], 1.0, mask)
+        agent.steps_done = 1
+        self.bench("optimize_model[minibatch=256]", agent.optimize_model, minibatch=256)
+
+        play = [Actions.PLAY_HAND, [1, 2, 3, 4, 5]]
+        self.bench("actionToCmd", lambda: env.actionToCmd(play))
+
+        hands = [[G["hand"][i - 1] for i in selected] for G, selected in zip(Gs, selections)]
+        self.bench("evaluate_hand", lambda: [env.evaluate_hand(hand) for hand in hands[:64]], hands=64)
+
+        next_Gs = [dict(G, game=dict(G["game"], chips=G["game"]["chips"] + 100)) for G in Gs]
+        env.G = Gs[0]
+
+        def calculate_rewards():
+            # calculate_reward prints every reward; keep that out of the table
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(64):
+                    env.calculate_reward(Gs[i], selections[i], "Hand", next_Gs[i], [], "Hand")
+        self.bench("calculate_reward", calculate_rewards, rewards=64)
+
+        env.close()
+        return self.results
+
+
+def compare(results, baseline, threshold):
+    """Benchmarks slower than their baseline median by more than `threshold`, as (name, old, new) tuples."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        if result["median_us"] > old["median_us"] * (1 + threshold):
+            regressions.append((name, old["median_us"], result["median_us"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="benchmarks/results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown vs the baseline, 0.10 = 10%%")
+    parser.add_argument("--save-baseline", help="also write the results here as the new baseline")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--buffer-sizes", type=int, nargs="+", default=[2500, 100000])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timing repeat")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    parser.add_argument("--backends", nargs="+", default=["eager", "int8"],
+                        help="policy inference backends to time: eager, int8, compile")
+    args = parser.parse_args(argv)
+
+    torch.set_num_threads(args.threads)
+    suite = Suite(repeat=args.repeat, min_time=args.min_time, filter=args.filter)
+    results = suite.run(args.batch_sizes, args.buffer_sizes, args.backends)
+
+    report = {
+        "meta": {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "threads": args.threads,
+        },
+        "results": results,
+    }
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.2f} -> {new:.2f} us/call (+{(new / old - 1) * 100:.1f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold * 100:.0f}% of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
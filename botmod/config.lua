@@ -1,12 +1,24 @@
 BALATRO_BOT_CONFIG = {
     enabled = true, -- Disables ALL mod functionality if false
     port = '12345', -- Port for the bot to listen on, overwritten by arg[1]
-    -- dt = 8.0/60.0, -- Tells the game that every update is dt seconds long
+    client_timeout = 600, -- Seconds of silence after which a client's SUBSCRIBE, FORMAT and FIELDS are forgotten
+    -- Everything below can also be changed at runtime with the CONFIG command
+    dt = 0, -- Tells the game that every update is dt seconds long, e.g. 8.0/60.0; 0 keeps the real frame time
     uncap_fps = true,
     instant_move = false,
     disable_vsync = true,
     disable_card_eval_status_text = false, -- e.g. +10 when scoring a queen
-    frame_ratio = 1, -- Draw every 100th frame, set to 1 for normal rendering
+    frame_ratio = 1, -- Draw every Nth frame, set to 1 for normal rendering and 0 to never draw
+    skip_animations = false, -- Drops the waits of timed game events
+    -- Adaptive dt: raise dt by dt_step after every dt_successes READY transitions, up to dt_max,
+    -- and multiply it by dt_backoff, down to dt_min, when an action is not READY after dt_stall real seconds
+    adaptive_dt = false,
+    dt_min = 1.0/60.0,
+    dt_max = 0.5,
+    dt_step = 1.25,
+    dt_backoff = 0.5,
+    dt_successes = 20,
+    dt_stall = 2.0,
 }
 
-return BALATRO_BOT_CONFIG
\ No newline at end of file
+return BALATRO_BOT_CONFIG
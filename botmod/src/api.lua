@@ -11,6 +11,41 @@ BalatrobotAPI.socket = nil
 BalatrobotAPI.waitingForAction = false -- Initially, we are ready for an action: start the game
 BalatrobotAPI.action_no = 0
 
+-- Clients that asked to be pushed the gamestate as soon as the bot becomes ready, keyed by "ip:port"
+BalatrobotAPI.subscribers = { }
+
+-- Wire format of the gamestate per client, keyed by "ip:port": "JSON" (default) or "PACKED"
+BalatrobotAPI.formats = { }
+
+-- Gamestate field projection per client, keyed by "ip:port": { spec = "hand,game.chips", projection = {...} }
+BalatrobotAPI.fields = { }
+
+-- When each client last sent a message, keyed by "ip:port", so registrations of vanished clients can expire
+BalatrobotAPI.lastseen = { }
+BalatrobotAPI.lastsweep = 0
+
+-- Encoded gamestates of the current stable state, keyed by format and field spec. Cleared when action_no moves on.
+BalatrobotAPI.snapshots = { action_no = -1, entries = { } }
+
+-- Adaptive dt bookkeeping: READY transitions since dt last changed, and when the pending action was sent
+BalatrobotAPI.adaptive = { successes = 0, action_started = nil }
+
+-- Options of BALATRO_BOT_CONFIG the CONFIG command may change, with the type of their value
+local CONFIG_OPTIONS = {
+    dt = 'number',
+    instant_move = 'boolean',
+    disable_card_eval_status_text = 'boolean',
+    frame_ratio = 'number',
+    skip_animations = 'boolean',
+    adaptive_dt = 'boolean',
+    dt_min = 'number',
+    dt_max = 'number',
+    dt_step = 'number',
+    dt_backoff = 'number',
+    dt_successes = 'number',
+    dt_stall = 'number',
+}
+
 -- Table of states where the API client is expected to provide an action
 local INTERACTIVE_STATES = {
     [G.STATES.MENU] = true,
@@ -53,14 +88,76 @@ local ACTION_DISPATCH = {
 }
 
 -- Packages and sends the current game state to the API client.
-function BalatrobotAPI.notifyapiclient()
-    local _gamestate = Utils.getGamestate()
-    _gamestate.waitingForAction = BalatrobotAPI.waitingForAction
-    _gamestate.action_no = BalatrobotAPI.action_no
-    local _gamestateJsonString = json.encode(_gamestate)
+-- Defaults to the sender of the message being handled this frame.
+function BalatrobotAPI.notifyapiclient(ip, port)
+    ip = ip or msg_or_ip
+    port = port or port_or_nil
 
-    if BalatrobotAPI.socket and port_or_nil ~= nil then
-        BalatrobotAPI.socket:sendto(string.format("%s", _gamestateJsonString), msg_or_ip, port_or_nil)
+    if not BalatrobotAPI.socket or port == nil then
+        return
+    end
+
+    local client = ip .. ':' .. port
+    local format = BalatrobotAPI.formats[client] or 'JSON'
+    local fields = BalatrobotAPI.fields[client]
+    local key = format .. '|' .. (fields and fields.spec or '')
+
+    -- The game does not change while it waits for an action, so one snapshot per stable state serves every request
+    local snapshots = BalatrobotAPI.snapshots
+    if snapshots.action_no ~= BalatrobotAPI.action_no then
+        snapshots.action_no = BalatrobotAPI.action_no
+        snapshots.entries = { }
+    end
+    local payload = BalatrobotAPI.waitingForAction and snapshots.entries[key]
+
+    if not payload then
+        local projection = fields and fields.projection
+        if format == 'PACKED' then
+            projection = Utils.PACKED_FIELDS
+        end
+        local _gamestate = Utils.getGamestate(projection)
+        _gamestate.waitingForAction = BalatrobotAPI.waitingForAction
+        _gamestate.action_no = BalatrobotAPI.action_no
+
+        if format == 'PACKED' then
+            payload = Utils.packGamestate(_gamestate)
+        else
+            payload = json.encode(_gamestate)
+        end
+        if BalatrobotAPI.waitingForAction then
+            snapshots.entries[key] = payload
+        end
+    end
+    BalatrobotAPI.socket:sendto(payload, ip, port)
+end
+
+-- Drops every registration of a client: its subscription, wire format and field projection.
+function BalatrobotAPI.forgetclient(client)
+    BalatrobotAPI.subscribers[client] = nil
+    BalatrobotAPI.formats[client] = nil
+    BalatrobotAPI.fields[client] = nil
+    BalatrobotAPI.lastseen[client] = nil
+end
+
+-- Forgets clients silent for client_timeout seconds, e.g. an env killed before it could send BYE.
+-- A live subscriber sends an action after every push, so it is never that quiet.
+function BalatrobotAPI.expireclients()
+    local now = love.timer.getTime()
+    if now - BalatrobotAPI.lastsweep < BALATRO_BOT_CONFIG.client_timeout / 10 then
+        return
+    end
+    BalatrobotAPI.lastsweep = now
+    for client, seen in pairs(BalatrobotAPI.lastseen) do
+        if now - seen > BALATRO_BOT_CONFIG.client_timeout then
+            BalatrobotAPI.forgetclient(client)
+        end
+    end
+end
+
+-- Pushes the current game state to every subscribed client.
+function BalatrobotAPI.notifysubscribers()
+    for _, subscriber in pairs(BalatrobotAPI.subscribers) do
+        BalatrobotAPI.notifyapiclient(subscriber.ip, subscriber.port)
     end
 end
 
@@ -74,6 +171,67 @@ function BalatrobotAPI.respond(str)
     end
 end
 
+-- Applies "key=value,key=value" to BALATRO_BOT_CONFIG. Nothing is changed if any pair is invalid.
+-- Returns an error string, or nil on success.
+function BalatrobotAPI.applyconfig(options)
+    local updates = { }
+    for pair in string.gmatch(options or '', '[^,]+') do
+        local key, value = pair:match('^%s*([%w_]+)=(.-)%s*$')
+        local kind = key and CONFIG_OPTIONS[key]
+        if not kind then
+            return "Error: Unknown config option " .. tostring(key or pair)
+        end
+        if kind == 'boolean' then
+            if value ~= 'true' and value ~= 'false' then
+                return "Error: Config option " .. key .. " expects true or false"
+            end
+            updates[key] = value == 'true'
+        else
+            updates[key] = tonumber(value)
+            if not updates[key] then
+                return "Error: Config option " .. key .. " expects a number"
+            end
+        end
+    end
+    for key, value in pairs(updates) do
+        BALATRO_BOT_CONFIG[key] = value
+    end
+    if updates.dt or updates.adaptive_dt ~= nil then
+        BalatrobotAPI.adaptive.successes = 0
+    end
+    return nil
+end
+
+function BalatrobotAPI.currentconfig()
+    local config = { }
+    for key, _ in pairs(CONFIG_OPTIONS) do
+        config[key] = BALATRO_BOT_CONFIG[key]
+    end
+    return config
+end
+
+-- Adaptive dt: speeds up after a run of clean READY transitions, backs off after a stall
+function BalatrobotAPI.adaptdt(succeeded)
+    local config = BALATRO_BOT_CONFIG
+    local adaptive = BalatrobotAPI.adaptive
+    if not config.adaptive_dt then
+        return
+    end
+    local dt = config.dt > 0 and config.dt or config.dt_min
+    if succeeded then
+        adaptive.successes = adaptive.successes + 1
+        if adaptive.successes < config.dt_successes then
+            return
+        end
+        dt = math.min(dt * config.dt_step, config.dt_max)
+    else
+        dt = math.max(dt * config.dt_backoff, config.dt_min)
+        sendDebugMessage("Readiness stalled, backing dt off to " .. dt)
+    end
+    adaptive.successes = 0
+    config.dt = dt
+end
+
 function BalatrobotAPI.stablestate()
     -- Check if the game state is stable and not in a transition
     local stable = true
@@ -103,7 +261,17 @@ function BalatrobotAPI.updatereadiness()
         if not BalatrobotAPI.waitingForAction then
             BalatrobotAPI.waitingForAction = true
             BalatrobotAPI.action_no = BalatrobotAPI.action_no + 1
+            BalatrobotAPI.notifysubscribers()
+            if BalatrobotAPI.adaptive.action_started then
+                BalatrobotAPI.adaptive.action_started = nil
+                BalatrobotAPI.adaptdt(true)
+            end
         end
+    elseif BalatrobotAPI.adaptive.action_started
+            and love.timer.getTime() - BalatrobotAPI.adaptive.action_started > BALATRO_BOT_CONFIG.dt_stall then
+        -- Restart the clock so a transition that stays stuck keeps backing off
+        BalatrobotAPI.adaptive.action_started = love.timer.getTime()
+        BalatrobotAPI.adaptdt(false)
     end
 end
 
@@ -117,14 +285,65 @@ function BalatrobotAPI.update(dt)
         BalatrobotAPI.socket:setsockname('127.0.0.1', tonumber(port))
     end
 
+    BalatrobotAPI.expireclients()
+
     data, msg_or_ip, port_or_nil = BalatrobotAPI.socket:receivefrom()
     if data then
         local command = data:match("^[^|]+")
+        local client = msg_or_ip .. ':' .. port_or_nil
+        BalatrobotAPI.lastseen[client] = love.timer.getTime()
 
         if command == 'STATUS' then
             local status = BalatrobotAPI.waitingForAction and "READY" or "BUSY"
             BalatrobotAPI.respond({ status = status})
 
+        elseif command == 'SUBSCRIBE' then
+            BalatrobotAPI.subscribers[client] = { ip = msg_or_ip, port = port_or_nil }
+            BalatrobotAPI.respond({ subscribed = true })
+            -- Already ready: the client would otherwise wait for the next transition
+            if BalatrobotAPI.waitingForAction then
+                BalatrobotAPI.notifyapiclient()
+            end
+
+        elseif command == 'UNSUBSCRIBE' then
+            BalatrobotAPI.subscribers[client] = nil
+            BalatrobotAPI.respond({ subscribed = false })
+
+        elseif command == 'BYE' then
+            -- Sent by a client closing its socket: nothing sent to that port will be read again
+            BalatrobotAPI.forgetclient(client)
+            BalatrobotAPI.respond({ bye = true })
+
+        elseif command == 'FORMAT' then
+            local format = data:match("|(.*)")
+            if format == 'JSON' or format == 'PACKED' then
+                BalatrobotAPI.formats[client] = format
+                BalatrobotAPI.respond({ format = format })
+            else
+                BalatrobotAPI.respond({ error = "Error: Unknown format " .. tostring(format) })
+            end
+
+        elseif command == 'FIELDS' then
+            local spec = data:match("|(.*)")
+            local projection, err = Utils.parseFields(spec)
+            if err then
+                BalatrobotAPI.respond({ error = err })
+            elseif projection then
+                BalatrobotAPI.fields[client] = { spec = spec, projection = projection }
+                BalatrobotAPI.respond({ fields = spec })
+            else
+                BalatrobotAPI.fields[client] = nil
+                BalatrobotAPI.respond({ fields = "ALL" })
+            end
+
+        elseif command == 'CONFIG' then
+            local err = BalatrobotAPI.applyconfig(data:match("|(.*)"))
+            if err then
+                BalatrobotAPI.respond({ error = err })
+            else
+                BalatrobotAPI.respond({ config = BalatrobotAPI.currentconfig() })
+            end
+
         elseif command == 'GET_STATE' then
             if BalatrobotAPI.waitingForAction then
                 BalatrobotAPI.notifyapiclient()
@@ -144,6 +363,7 @@ function BalatrobotAPI.update(dt)
                 sendDebugMessage("Set actions.executing to true for action: " .. _action[1])
                 Actions.executing = true
                 BalatrobotAPI.waitingForAction = false
+                BalatrobotAPI.adaptive.action_started = love.timer.getTime()
                 local dispatch_func = ACTION_DISPATCH[_action[1]]
                 if dispatch_func then dispatch_func(_action) end
             else
@@ -166,14 +386,15 @@ function BalatrobotAPI.init()
     -- Add the main API update to the loop
     love.update = Hook.addcallback(love.update, BalatrobotAPI.update)
 
-    -- Tell the game engine that every frame is 8/60 seconds long
+    -- Tell the game engine that every frame is BALATRO_BOT_CONFIG.dt seconds long, e.g. 8/60
     -- Speeds up the game execution
-    -- Values higher than this seem to cause instability
-    if BALATRO_BOT_CONFIG.dt then
-        love.update = Hook.addbreakpoint(love.update, function(dt)
+    -- Values higher than 8/60 seem to cause instability, which adaptive_dt backs off from
+    love.update = Hook.addbreakpoint(love.update, function(dt)
+        if BALATRO_BOT_CONFIG.dt and BALATRO_BOT_CONFIG.dt > 0 then
             return BALATRO_BOT_CONFIG.dt
-        end)
-    end
+        end
+        return dt
+    end)
 
     -- Disable FPS cap
     if BALATRO_BOT_CONFIG.uncap_fps then
@@ -181,11 +402,14 @@ function BalatrobotAPI.init()
     end
 
     -- Makes things move instantly instead of sliding
-    if BALATRO_BOT_CONFIG.instant_move then
-        function Moveable.move_xy(self, dt)
+    local original_move_xy = Moveable.move_xy
+    function Moveable.move_xy(self, dt)
+        if BALATRO_BOT_CONFIG.instant_move then
             -- Directly set the visible transform to the target transform
             self.VT.x = self.T.x
             self.VT.y = self.T.y
+        else
+            original_move_xy(self, dt)
         end
     end
 
@@ -195,8 +419,20 @@ function BalatrobotAPI.init()
     end
 
     -- Disable card scoring animation text
-    if BALATRO_BOT_CONFIG.disable_card_eval_status_text then
-        card_eval_status_text = function(card, eval_type, amt, percent, dir, extra) end
+    local original_card_eval_status_text = card_eval_status_text
+    card_eval_status_text = function(card, eval_type, amt, percent, dir, extra)
+        if not BALATRO_BOT_CONFIG.disable_card_eval_status_text then
+            original_card_eval_status_text(card, eval_type, amt, percent, dir, extra)
+        end
+    end
+
+    -- Skip the waits of timed events; eased events keep their duration since ease divides by it
+    local original_event_init = Event.init
+    function Event:init(config)
+        original_event_init(self, config)
+        if BALATRO_BOT_CONFIG.skip_animations and (self.trigger == 'after' or self.trigger == 'before') then
+            self.delay = 0
+        end
     end
 
     G.SETTINGS.GAMESPEED = 4.0
@@ -217,16 +453,20 @@ function BalatrobotAPI.init()
     -- Only draw/present every Nth frame
     local original_draw = love.draw
     local draw_count = 0
+    local function should_draw()
+        local ratio = BALATRO_BOT_CONFIG.frame_ratio
+        return ratio > 0 and draw_count % ratio == 0
+    end
     love.draw = function()
         draw_count = draw_count + 1
-        if draw_count % BALATRO_BOT_CONFIG.frame_ratio == 0 then
+        if should_draw() then
             original_draw()
         end
     end
 
     local original_present = love.graphics.present
     love.graphics.present = function()
-        if draw_count % BALATRO_BOT_CONFIG.frame_ratio == 0 then
+        if should_draw() then
             original_present()
         end
     end
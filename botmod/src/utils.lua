@@ -214,20 +214,65 @@ function Utils.getGameData()
     return _game
 end
 
-function Utils.getGamestate()
+-- Builders of the top-level gamestate fields. Looked up at call time, since getRoundData is redefined below.
+Utils.GAMESTATE_FIELDS = {
+    waiting_for = function() return G.waitingFor end,
+    game = function() return Utils.getGameData() end,
+    hand = function() return Utils.getHandData() end,
+    jokers = function() return Utils.getJokersData() end,
+    consumables = function() return Utils.getConsumablesData() end,
+    shop = function() return Utils.getShopData() end,
+    current_round = function() return Utils.getRoundData() end,
+    used_vouchers = function() return Utils.getVouchers() end,
+    handsData = function() return Utils.getHandsData() end,
+    current_hand = function() return G.GAME.current_round.current_hand end,
+}
+
+-- Fields read by Utils.packGamestate
+Utils.PACKED_FIELDS = { game = true, hand = true, current_round = true, shop = { cards = true } }
+
+-- Parses a FIELDS projection such as "hand,game.chips,current_round" into
+-- { hand = true, game = { chips = true }, current_round = true }.
+-- Returns nil for the full gamestate, or nil and an error string.
+function Utils.parseFields(spec)
+    if not spec or spec == '' then
+        return nil
+    end
+    local projection = { }
+    for field in spec:gmatch('[^,]+') do
+        local top, sub = field:match('^%s*([%w_]+)%.?([%w_]*)%s*$')
+        if not top or not Utils.GAMESTATE_FIELDS[top] then
+            return nil, "Error: Unknown gamestate field " .. field
+        end
+        if sub == '' then
+            projection[top] = true
+        elseif projection[top] ~= true then
+            projection[top] = projection[top] or { }
+            projection[top][sub] = true
+        end
+    end
+    return projection
+end
+
+-- Builds the gamestate, or only the fields of a projection from Utils.parseFields. state is always included.
+function Utils.getGamestate(projection)
     local _gamestate = {}
 
     _gamestate.state = G.STATE
-    _gamestate.waiting_for = G.waitingFor
-    _gamestate.game = Utils.getGameData()
-    _gamestate.hand = Utils.getHandData()
-    _gamestate.jokers = Utils.getJokersData()
-    _gamestate.consumables = Utils.getConsumablesData()
-    _gamestate.shop = Utils.getShopData()
-    _gamestate.current_round = Utils.getRoundData()
-    _gamestate.used_vouchers = Utils.getVouchers()
-    _gamestate.handsData = Utils.getHandsData()
-    _gamestate.current_hand = G.GAME.current_round.current_hand
+    for field, build in pairs(Utils.GAMESTATE_FIELDS) do
+        local wanted = projection == nil or projection[field]
+        if wanted then
+            local _value = build()
+            if type(wanted) == 'table' and type(_value) == 'table' then
+                local _projected = { }
+                for key, _ in pairs(wanted) do
+                    _projected[key] = _value[key]
+                end
+                _value = _projected
+            end
+            _gamestate[field] = _value
+        end
+    end
     return _gamestate
 end
 
@@ -244,6 +289,41 @@ function Utils.getRoundData()
     return _round
 end
 
+-- Compact fixed-layout encoding of the fields the Python encoders consume.
+-- Must match core/wire.py:
+--   header  "<c2BBI4BbbBHi4dH": magic "BG", version, state, action_no, waitingForAction,
+--           hands_left, discards_left, hand card count, round, dollars, chips, hands_played
+--   hand    "BB" per card: id, suit index (Hearts, Diamonds, Spades, Clubs; 255 if unknown)
+--   shop    "B" card count, then "BH" per card: is joker, cost
+Utils.PACKED_VERSION = 2
+Utils.SUIT_IDS = { Hearts = 0, Diamonds = 1, Spades = 2, Clubs = 3 }
+
+function Utils.packGamestate(gamestate)
+    local _game = gamestate.game or { }
+    local _round = gamestate.current_round or { }
+    local _hand = gamestate.hand or { }
+    local _shopcards = (gamestate.shop and gamestate.shop.cards) or { }
+
+    local _values = {
+        "BG", Utils.PACKED_VERSION, gamestate.state or 0, gamestate.action_no or 0,
+        gamestate.waitingForAction and 1 or 0,
+        _round.hands_left or 0, _round.discards_left or 0, #_hand,
+        _game.round or 0, _game.dollars or 0, _game.chips or 0, _game.hands_played or 0,
+    }
+    for i = 1, #_hand do
+        _values[#_values + 1] = _hand[i].id or 0
+        _values[#_values + 1] = Utils.SUIT_IDS[_hand[i].suit] or 255
+    end
+    _values[#_values + 1] = #_shopcards
+    for i = 1, #_shopcards do
+        _values[#_values + 1] = _shopcards[i].type == "Joker" and 1 or 0
+        _values[#_values + 1] = _shopcards[i].cost or 0
+    end
+
+    local _format = "<c2BBI4BbbBHi4dH" .. string.rep("BB", #_hand) .. "B" .. string.rep("BH", #_shopcards)
+    return love.data.pack("string", _format, unpack(_values))
+end
+
 function Utils.parseaction(data)
     -- Protocol is ACTION|arg1|arg2
     action = data:match("^([%a%u_]*)")
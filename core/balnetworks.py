@@ -6,18 +6,19 @@ import torch.optim as optim
 import torch.nn.functional as F
 
 class SimpleDQN(nn.Module):
-    def __init__(self, n_observations, n_actions):
+    def __init__(self, n_observations, n_actions, device=None, dtype=None):
         super(SimpleDQN, self).__init__()
+        factory_kwargs = {"device": device, "dtype": dtype}
         self.net1 = nn.Sequential(
-            nn.Linear(n_observations, 512),
+            nn.Linear(n_observations, 512, **factory_kwargs),
             nn.ReLU(),
-            nn.Linear(512, 1024),
+            nn.Linear(512, 1024, **factory_kwargs),
             nn.ReLU(),
-            nn.Linear(1024, 1024),
+            nn.Linear(1024, 1024, **factory_kwargs),
             nn.ReLU(),
-            nn.Linear(1024, 512),
+            nn.Linear(1024, 512, **factory_kwargs),
             nn.ReLU(),
-            nn.Linear(512, n_actions)
+            nn.Linear(512, n_actions, **factory_kwargs)
         )
 
     def forward(self, x):
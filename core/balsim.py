@@ -0,0 +1,275 @@
+import random
+
+from core.hands import classify
+
+# Numeric values of the game's G.STATES, see env.State
+SELECTING_HAND = 1
+GAME_OVER = 4
+SHOP = 5
+BLIND_SELECT = 7
+ROUND_EVAL = 8
+MENU = 11
+
+SUITS = ["Hearts", "Diamonds", "Spades", "Clubs"]
+DECK_SUITS = {
+    "Red Deck": SUITS,
+    "Checkered Deck": ["Spades", "Spades", "Hearts", "Hearts"],
+}
+
+ANTE_CHIPS = [300, 800, 2000, 5000, 11000, 20000, 35000, 50000]
+BLINDS = [("Small", 1.0, 3), ("Big", 1.5, 4), ("Boss", 2.0, 5)]
+
+# hand name: (base chips, base mult)
+HAND_VALUES = {
+    "Flush Five": (160, 16),
+    "Flush House": (140, 14),
+    "Five of a Kind": (120, 12),
+    "Straight Flush": (100, 8),
+    "Four of a Kind": (60, 7),
+    "Full House": (40, 4),
+    "Flush": (35, 4),
+    "Straight": (30, 4),
+    "Three of a Kind": (30, 3),
+    "Two Pair": (20, 2),
+    "Pair": (10, 2),
+    "High Card": (5, 1),
+}
+
+
+def card_chips(rank):
+    if rank == 14:
+        return 11
+    return min(rank, 10)
+
+
+def classify_hand(cards):
+    """Returns (hand name, indices of the scoring cards) for up to 5 (rank, suit) cards."""
+    return classify(cards)
+
+
+class BalatroSim:
+    """In-process stand-in for a Balatro instance running the bot mod.
+
+    Only the blind / hand selection / play / discard loop is simulated: no
+    jokers, consumables, boosters or boss blind effects, and the shop is
+    always empty. `handle` takes the same pipe-delimited messages the mod
+    accepts and returns the decoded reply the mod would have sent, so the
+    gamestate dicts have the shape of `Utils.getGamestate`.
+    """
+
+    def __init__(self, seed=None, hand_size=8, hands=4, discards=3, max_ante=8):
+        self.hand_size = hand_size
+        self.hands = hands
+        self.discards = discards
+        self.max_ante = max_ante
+
+        self.state = MENU
+        self.action_no = 0
+        self.rng = random.Random(seed)
+
+        self.deck = []
+        self.hand = []
+        self.dollars = 0
+        self.round = 0
+        self.ante = 1
+        self.blind = 0
+        self.chips = 0
+        self.hands_left = 0
+        self.discards_left = 0
+        self.hands_played = 0
+        self.skips = 0
+        self.won = False
+        self.current_hand = None
+
+    # --- protocol ---
+
+    def handle(self, data):
+        parts = data.split("|")
+        command = parts[0]
+        args = parts[1:]
+
+        if command == "STATUS":
+            return self.respond({"status": "READY"})
+        if command == "GET_STATE":
+            return self.gamestate()
+
+        handler = getattr(self, "do_" + command.lower(), None)
+        if handler is None:
+            return self.respond({"error": f"Error: Invalid action {command}"})
+        error = handler(*args)
+        if error:
+            return self.respond({"error": error})
+        self.action_no += 1
+        return self.respond({"response": f"Action received: {command}"})
+
+    def respond(self, response):
+        return {"response": response}
+
+    def gamestate(self):
+        shop = {}
+        if self.state == SHOP:
+            shop = {"reroll_cost": 5, "cards": [], "boosters": [], "vouchers": []}
+        return {
+            "state": self.state,
+            "waiting_for": None,
+            "game": {
+                "hands_played": self.hands_played,
+                "Skips": self.skips,
+                "round": self.round,
+                "dollars": self.dollars,
+                "max_jokers": 5,
+                "bankrupt_at": 0,
+                "chips": self.chips,
+            },
+            "hand": [self.card_data(card) for card in self.hand],
+            "jokers": [],
+            "consumables": [],
+            "shop": shop,
+            "current_round": {
+                "discards_left": self.discards_left,
+                "hands_left": self.hands_left,
+                "blind_on_deck": BLINDS[self.blind][0],
+                "reroll_cost": 5,
+            },
+            "used_vouchers": [],
+            "handsData": {},
+            "current_hand": self.current_hand,
+            "waitingForAction": True,
+            "action_no": self.action_no,
+        }
+
+    def card_data(self, card):
+        rank, suit = card
+        return {
+            "type": "Card",
+            "id": rank,
+            "suit": suit,
+            "effect": "Base",
+            "cost": 1,
+            "sell_cost": 1,
+            "seal": "None",
+        }
+
+    # --- actions ---
+
+    def do_start_run(self, stake=None, deck="Red Deck", seed=None, challenge=None):
+        if seed in (None, "", "None"):
+            seed = "".join(self.rng.choices("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ", k=7))
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.deck_suits = DECK_SUITS.get(deck, SUITS)
+        self.dollars = 4
+        self.round = 0
+        self.ante = 1
+        self.blind = 0
+        self.chips = 0
+        self.hands_played = 0
+        self.skips = 0
+        self.won = False
+        self.hand = []
+        self.state = BLIND_SELECT
+
+    def do_return_to_menu(self):
+        self.state = MENU
+
+    def do_select_blind(self):
+        if self.state != BLIND_SELECT:
+            return "Error: Invalid action SELECT_BLIND"
+        self.round += 1
+        self.chips = 0
+        self.hands_left = self.hands
+        self.discards_left = self.discards
+        self.deck = [(rank, suit) for suit in self.deck_suits for rank in range(2, 15)]
+        self.rng.shuffle(self.deck)
+        self.hand = []
+        self.draw()
+        self.state = SELECTING_HAND
+
+    def do_skip_blind(self):
+        if self.state != BLIND_SELECT or self.blind == 2:
+            return "Error: Invalid action SKIP_BLIND"
+        self.skips += 1
+        self.blind += 1
+
+    def do_play_hand(self, indices=""):
+        error = self.check_selection(indices, self.hands_left)
+        if error:
+            return "Error: Invalid action PLAY_HAND"
+        played = self.take(indices)
+        name, scoring = classify_hand(played)
+        chips, mult = HAND_VALUES[name]
+        chips += sum(card_chips(played[i][0]) for i in scoring)
+        self.chips += chips*mult
+        self.current_hand = name
+        self.hands_left -= 1
+        self.hands_played += 1
+
+        if self.chips >= self.blind_chips():
+            self.state = ROUND_EVAL
+        elif self.hands_left == 0 or (not self.hand and not self.deck):
+            self.state = GAME_OVER
+        else:
+            self.draw()
+
+    def do_discard_hand(self, indices=""):
+        error = self.check_selection(indices, self.discards_left)
+        if error:
+            return "Error: Invalid action DISCARD_HAND"
+        self.take(indices)
+        self.discards_left -= 1
+        self.draw()
+        if not self.hand:
+            self.state = GAME_OVER
+
+    def do_cash_out(self):
+        if self.state != ROUND_EVAL:
+            return "Error: Invalid action CASH_OUT"
+        self.dollars += BLINDS[self.blind][2] + self.hands_left + min(self.dollars // 5, 5)
+        self.hand = []
+        if self.blind == 2:
+            if self.ante == self.max_ante:
+                self.won = True
+                self.state = GAME_OVER
+                return
+            self.ante += 1
+        self.blind = (self.blind + 1) % 3
+        self.state = SHOP
+
+    def do_end_shop(self):
+        if self.state != SHOP:
+            return "Error: Invalid action END_SHOP"
+        self.state = BLIND_SELECT
+
+    def do_buy_card(self, index=""):
+        return "Error: Invalid action BUY_CARD"
+
+    def do_pass(self, *args):
+        pass
+
+    # --- helpers ---
+
+    def blind_chips(self):
+        return int(ANTE_CHIPS[min(self.ante, len(ANTE_CHIPS)) - 1]*BLINDS[self.blind][1])
+
+    def check_selection(self, indices, uses_left):
+        if self.state != SELECTING_HAND or uses_left <= 0:
+            return True
+        try:
+            indices = [int(i) for i in indices.split(",") if i]
+        except ValueError:
+            return True
+        if not 1 <= len(indices) <= 5 or len(set(indices)) != len(indices):
+            return True
+        return any(i < 1 or i > len(self.hand) for i in indices)
+
+    def take(self, indices):
+        indices = [int(i) - 1 for i in indices.split(",") if i]
+        cards = [self.hand[i] for i in indices]
+        self.hand = [card for i, card in enumerate(self.hand) if i not in indices]
+        return cards
+
+    def draw(self):
+        while len(self.hand) < self.hand_size and self.deck:
+            self.hand.append(self.deck.pop())
+        # The game keeps the hand sorted by rank, highest first
+        self.hand.sort(key=lambda card: -card[0])
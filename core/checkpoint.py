@@ -0,0 +1,272 @@
+import atexit
+import contextlib
+import os
+import queue
+import re
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+import torch
+
+
+def snapshot(obj):
+    """Detached CPU copy of every tensor in a (nested) state dict."""
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(value) for value in obj)
+    return obj
+
+
+def atomic_write(path, write):
+    """Calls write(file) on a temporary file and renames it over `path` once complete."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def new_run_id():
+    """Identifier of one training run, naming its checkpoints and replay segments."""
+    return uuid.uuid4().hex[:8]
+
+
+def run_part(run):
+    # Files of checkpoints written before runs were named carry no run id
+    return "" if run is None else f"{run}_"
+
+
+def replay_segments(prefix, run=None):
+    """Replay segment files written by `run` for `prefix`, as sorted (start, end, path) tuples."""
+    prefix = Path(prefix)
+    pattern = re.compile(re.escape(f"{prefix.name}_replay_{run_part(run)}") + r"(\d+)_(\d+)\.npz$")
+    segments = []
+    if prefix.parent.exists():
+        for path in prefix.parent.iterdir():
+            match = pattern.match(path.name)
+            if match:
+                segments.append((int(match.group(1)), int(match.group(2)), path))
+    return sorted(segments)
+
+
+def segment_path(prefix, run, start, end):
+    return prefix.with_name(f"{prefix.name}_replay_{run_part(run)}{start:012d}_{end:012d}.npz")
+
+
+def checkpoint_path(prefix, run, steps):
+    return prefix.with_name(f"{prefix.name}_{run_part(run)}{steps}.pth")
+
+
+def replay_runs(prefix):
+    """Runs with replay segments on disk for `prefix`; None stands for segments named without one."""
+    prefix = Path(prefix)
+    pattern = re.compile(re.escape(f"{prefix.name}_replay_") + r"(?:([0-9a-f]{8})_)?\d+_\d+\.npz$")
+    runs = set()
+    if prefix.parent.exists():
+        for path in prefix.parent.iterdir():
+            match = pattern.match(path.name)
+            if match:
+                runs.add(match.group(1))
+    return runs
+
+
+def checkpoint_files(prefix):
+    """Checkpoints written for `prefix` by any run, as (steps, path) tuples sorted by steps."""
+    prefix = Path(prefix)
+    pattern = re.compile(re.escape(prefix.name) + r"_(?:[0-9a-f]{8}_)?(\d+)\.pth$")
+    checkpoints = []
+    if prefix.parent.exists():
+        for path in prefix.parent.iterdir():
+            match = pattern.match(path.name)
+            if match:
+                checkpoints.append((int(match.group(1)), path))
+    return sorted(checkpoints)
+
+
+def replay_window(checkpoint):
+    """Global index of the first replay transition `checkpoint` restores, None if it needs no segments."""
+    if "replay_total" not in checkpoint or "replay_path" in checkpoint:
+        return None
+    return max(checkpoint["replay_total"] - checkpoint["replay_capacity"], 0)
+
+
+def load_replay(prefix, total, capacity, run=None):
+    """Rebuilds the last `capacity` transitions before the `total`-th push from `run`'s replay segments.
+
+    Raises FileNotFoundError when the segments leave part of that window uncovered.
+    """
+    first = max(total - capacity, 0)
+    cursor = first
+    columns = {}
+    for start, end, path in replay_segments(prefix, run):
+        if end <= cursor or start >= total:
+            continue
+        if start > cursor:
+            break
+        with np.load(path) as segment:
+            lo = max(cursor, start) - start
+            hi = min(total, end) - start
+            for name in segment.files:
+                columns.setdefault(name, []).append(torch.from_numpy(segment[name][lo:hi]))
+        cursor = min(total, end)
+    if cursor < total:
+        raise FileNotFoundError(f"Replay segments of {prefix} cover transitions {first} to {cursor}, "
+                                f"the checkpoint needs {first} to {total}")
+    return {name: torch.cat(parts) for name, parts in columns.items()}
+
+
+class CheckpointWriter:
+    """Writes agent checkpoints on a background thread.
+
+    The training thread only copies the weights to CPU and exports the replay
+    transitions pushed since the previous checkpoint. The writer thread saves
+    those transitions as a `<prefix>_replay_<run>_<start>_<end>.npz` segment and
+    the weights as `<prefix>_<run>_<steps>.pth`, each through a rename so a crash
+    never leaves a partial file. Every writer starts a new run id, so a fresh run
+    sharing the prefix with earlier ones neither overwrites their checkpoints nor
+    mixes its replay into theirs. Only the newest `keep` checkpoints are retained,
+    counting those already on disk from earlier runs, together with the replay
+    segments they still need.
+    """
+
+    def __init__(self, prefix="weights/checkpoint", keep=5):
+        self.prefix = Path(prefix)
+        self.keep = keep
+        self.run_id = new_run_id()
+        # Global index of the first replay transition not yet written to a segment
+        self.replay_saved = 0
+        self.written = self.scan()
+
+        # One checkpoint in flight at most: if the writer falls behind, checkpoints are
+        # skipped rather than stalling training
+        self.jobs = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, steps, checkpoint, memory, lock=None):
+        """Queues `checkpoint` (a dict of state dicts) together with the new replay transitions.
+
+        `lock` guards `memory` against concurrent pushes; it is held only while the new
+        transitions are copied out, not for the weight copy or the hand-off to the writer.
+        """
+        checkpoint = snapshot(checkpoint)
+        with lock if lock is not None else contextlib.nullcontext():
+            if getattr(memory, "persistent", False):
+                # A memory-mapped replay is its own persistent copy; only its pages need flushing
+                memory.flush()
+                start, replay = memory.total, {}
+                checkpoint["replay_path"] = str(memory.path)
+            else:
+                start, replay = memory.export_since(self.replay_saved)
+            total = memory.total
+        checkpoint["replay_total"] = total
+        checkpoint["replay_capacity"] = memory.capacity
+        checkpoint["replay_prefix"] = self.prefix.name
+        checkpoint["replay_run"] = self.run_id
+        try:
+            self.jobs.put_nowait((steps, checkpoint, start, total, replay))
+        except queue.Full:
+            print(f"Checkpoint writer busy, skipping checkpoint at step {steps}")
+            return False
+        self.replay_saved = total
+        return True
+
+    def scan(self):
+        """(path, run, replay window start, replay total) of the checkpoints already on disk, oldest first."""
+        written = []
+        for steps, path in checkpoint_files(self.prefix):
+            try:
+                checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+                mtime = path.stat().st_mtime_ns
+            except Exception as e:
+                print(f"Ignoring unreadable checkpoint {path}: {e}")
+                continue
+            entry = (path, checkpoint.get("replay_run"), replay_window(checkpoint), checkpoint.get("replay_total", 0))
+            written.append((mtime, steps, entry))
+        return [entry for _, _, entry in sorted(written, key=lambda item: item[:2])]
+
+    def resume(self, total, prefix=None, run=None):
+        """Continues `run` from its checkpoint restored at the `total`-th push, writing next to it.
+
+        `prefix` is the one the checkpoint was loaded from. Checkpoints and segments the run
+        wrote after it were abandoned and are dropped (segments are cut back to `total`), so
+        they cannot shadow the new ones. Other runs' files are left alone.
+        """
+        self.flush()
+        if prefix is not None and Path(prefix) != self.prefix:
+            self.prefix = Path(prefix)
+            self.written = self.scan()
+        self.run_id = run
+        self.replay_saved = total
+        for path, saved_run, _, saved_total in self.written:
+            if saved_run == run and saved_total > total:
+                path.unlink(missing_ok=True)
+        self.written = [entry for entry in self.written if entry[1] != run or entry[3] <= total]
+        for start, end, path in replay_segments(self.prefix, run):
+            if start >= total:
+                path.unlink(missing_ok=True)
+            elif end > total:
+                with np.load(path) as segment:
+                    arrays = {name: segment[name][:total - start] for name in segment.files}
+                atomic_write(segment_path(self.prefix, run, start, total), lambda f: np.savez(f, **arrays))
+                path.unlink(missing_ok=True)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                self.write(*job)
+            finally:
+                self.jobs.task_done()
+
+    def write(self, steps, checkpoint, start, end, replay):
+        self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        run = checkpoint["replay_run"]
+        if end > start:
+            # NumPy has no bfloat16; those columns are widened and cast back on load
+            arrays = {
+                name: (value.float() if value.dtype == torch.bfloat16 else value).numpy()
+                for name, value in replay.items()
+            }
+            atomic_write(segment_path(self.prefix, run, start, end), lambda f: np.savez(f, **arrays))
+
+        savepath = checkpoint_path(self.prefix, run, steps)
+        atomic_write(savepath, lambda f: torch.save(checkpoint, f))
+        # A resumed run may save again at the step of a checkpoint it abandoned
+        self.written = [entry for entry in self.written if entry[0] != savepath]
+        self.written.append((savepath, run, replay_window(checkpoint), checkpoint["replay_total"]))
+        print(f"Checkpoint saved at step {steps} to {savepath}")
+        self.prune()
+
+    def prune(self):
+        while len(self.written) > self.keep:
+            path, _, _, _ = self.written.pop(0)
+            path.unlink(missing_ok=True)
+
+        # Segments entirely older than what a run's oldest retained checkpoint restores are
+        # dead, and so are all segments of earlier runs with no checkpoint left
+        for run in replay_runs(self.prefix):
+            windows = [first for _, saved_run, first, _ in self.written if saved_run == run and first is not None]
+            if not windows and run == self.run_id:
+                continue
+            oldest_needed = min(windows, default=None)
+            for start, end, path in replay_segments(self.prefix, run):
+                if oldest_needed is None or end <= oldest_needed:
+                    path.unlink(missing_ok=True)
+
+    def flush(self):
+        self.jobs.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.jobs.put(None)
+            self.thread.join()
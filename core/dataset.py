@@ -0,0 +1,258 @@
+import atexit
+import queue
+import random
+import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from core.checkpoint import atomic_write
+from core.encoders import RAW_GAME_FIELDS, RAW_HAND_SLOTS, encode_raw_into
+from core.rlutils import TransitionBatch
+
+# Shard columns, in TransitionBatch order. `state` holds the encode_game features, selection flags
+# included; a transition is done where `non_final` is False.
+COLUMNS = {
+    "state": np.float32,
+    "action": np.int64,
+    "next_state": np.float32,
+    "reward": np.float32,
+    "non_final": np.bool_,
+    "next_mask": np.bool_,
+}
+
+# Raw gamestate columns of both ends of a transition, see core.encoders.encode_raw_into: the whole
+# hand as (id, suit, selected) and the round fields. A network with another encoding trains on them
+# through ShardDataset's `encode`. Rows without a gamestate (final next states) are -1 and NaN.
+RAW_COLUMNS = {
+    "hand": np.int16,
+    "game": np.float64,
+    "next_hand": np.int16,
+    "next_game": np.float64,
+}
+
+
+def shard_paths(directory):
+    """Shard files in `directory`, as sorted (index, path) tuples."""
+    directory = Path(directory)
+    pattern = re.compile(r"shard_(\d+)\.npz$")
+    shards = []
+    if directory.exists():
+        for path in directory.iterdir():
+            match = pattern.match(path.name)
+            if match:
+                shards.append((int(match.group(1)), path))
+    return sorted(shards)
+
+
+def load_shard(path, columns=COLUMNS):
+    with np.load(path) as shard:
+        return {name: shard[name] for name in columns}
+
+
+def shard_rows(path):
+    """Number of transitions in a shard, from the header of its reward array alone."""
+    with zipfile.ZipFile(path) as archive, archive.open("reward.npy") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, _ = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(f)
+    return shape[0]
+
+
+class TransitionRecorder:
+    """Appends every transition to compressed columnar shards on disk.
+
+    Each row holds the COLUMNS of a TransitionBatch and, when the gamestates
+    are passed to `record`, their RAW_COLUMNS. The training thread copies each transition into a preallocated shard
+    buffer; every `shard_size` transitions the buffer is handed to a writer
+    thread, which saves it as `shard_<index>.npz` through a rename. Unlike
+    checkpoints, shards are never skipped: a writer that falls `backlog`
+    shards behind blocks the caller. Recording into an existing directory
+    continues its shard sequence.
+    """
+
+    def __init__(self, directory, shard_size=4096, state_dim=24, n_actions=10, compress=True, backlog=4):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.state_dim = state_dim
+        self.n_actions = n_actions
+        self.compress = compress
+        shards = shard_paths(self.directory)
+        self.next_index = shards[-1][0] + 1 if shards else 0
+        self.recorded = 0
+
+        self.buffer = self.new_buffer()
+        self.rows = 0
+        self.jobs = queue.Queue(maxsize=backlog)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def new_buffer(self):
+        shapes = {
+            "state": (self.shard_size, self.state_dim),
+            "action": (self.shard_size, 1),
+            "next_state": (self.shard_size, self.state_dim),
+            "reward": (self.shard_size,),
+            "non_final": (self.shard_size,),
+            "next_mask": (self.shard_size, self.n_actions),
+            "hand": (self.shard_size, RAW_HAND_SLOTS, 3),
+            "game": (self.shard_size, len(RAW_GAME_FIELDS)),
+            "next_hand": (self.shard_size, RAW_HAND_SLOTS, 3),
+            "next_game": (self.shard_size, len(RAW_GAME_FIELDS)),
+        }
+        return {name: np.zeros(shapes[name], dtype=dtype) for name, dtype in {**COLUMNS, **RAW_COLUMNS}.items()}
+
+    def record(self, state, action, next_state, reward, next_mask=None, gamestate=None, selected=(),
+               next_gamestate=None, next_selected=()):
+        """Records one transition, in the arguments of ReplayMemory.push plus the raw gamestates."""
+        i = self.rows
+        buffer = self.buffer
+        buffer["state"][i] = state.reshape(-1).float().cpu().numpy()
+        buffer["action"][i] = int(action.reshape(-1)[0]) if torch.is_tensor(action) else action
+        if next_state is None:
+            buffer["next_state"][i] = 0
+            buffer["non_final"][i] = False
+        else:
+            buffer["next_state"][i] = next_state.reshape(-1).float().cpu().numpy()
+            buffer["non_final"][i] = True
+        buffer["reward"][i] = float(reward) if not torch.is_tensor(reward) else float(reward.reshape(-1)[0])
+        buffer["next_mask"][i] = False if next_mask is None else next_mask.cpu().numpy()
+        encode_raw_into(buffer["hand"][i], buffer["game"][i], gamestate, selected)
+        encode_raw_into(buffer["next_hand"][i], buffer["next_game"][i], next_gamestate, next_selected)
+
+        self.rows += 1
+        self.recorded += 1
+        if self.rows == self.shard_size:
+            self.flush_buffer()
+
+    def flush_buffer(self):
+        if self.rows == 0:
+            return
+        shard = {name: column[:self.rows] for name, column in self.buffer.items()}
+        self.jobs.put((self.next_index, shard))
+        self.next_index += 1
+        self.buffer = self.new_buffer()
+        self.rows = 0
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                self.write(*job)
+            finally:
+                self.jobs.task_done()
+
+    def write(self, index, shard):
+        path = self.directory / f"shard_{index:08d}.npz"
+        save = np.savez_compressed if self.compress else np.savez
+        atomic_write(path, lambda f: save(f, **shard))
+
+    def flush(self):
+        """Writes out the partial shard and waits until every shard is on disk."""
+        self.flush_buffer()
+        self.jobs.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.flush_buffer()
+            self.jobs.put(None)
+            self.thread.join()
+
+
+class ShardDataset:
+    """Streams shuffled minibatches out of the shards of a TransitionRecorder.
+
+    Each epoch visits the shards in random order and keeps `window` of them
+    in memory at a time; rows are shuffled across the window, and whatever
+    does not fill a minibatch is carried into the next one. The next shard
+    is read and decompressed on a background thread while the current
+    window is being consumed. Iterating yields TransitionBatch minibatches
+    on `device`.
+
+    `encode`, if given, maps the columns of a shard (RAW_COLUMNS included)
+    to new `state` and `next_state` arrays, so a network with another input
+    encoding trains on the recorded gamestates.
+    """
+
+    def __init__(self, directory, batch_size=256, window=4, device="cpu", dtype=torch.float, seed=None,
+                 drop_last=True, encode=None):
+        self.shards = [path for _, path in shard_paths(directory)]
+        if not self.shards:
+            raise FileNotFoundError(f"No transition shards in {directory}")
+        self.batch_size = batch_size
+        self.window = window
+        self.device = torch.device(device)
+        self.dtype = dtype
+        self.drop_last = drop_last
+        self.encode = encode
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        """Number of transitions across all shards (reads only the array headers)."""
+        return sum(shard_rows(path) for path in self.shards)
+
+    def load(self, path):
+        if self.encode is None:
+            return load_shard(path)
+        shard = load_shard(path, {**COLUMNS, **RAW_COLUMNS})
+        shard["state"], shard["next_state"] = self.encode(shard)
+        return {name: shard[name] for name in COLUMNS}
+
+    def to_batch(self, columns):
+        return TransitionBatch(
+            torch.from_numpy(columns["state"]).to(self.device, self.dtype),
+            torch.from_numpy(columns["action"]).to(self.device),
+            torch.from_numpy(columns["next_state"]).to(self.device, self.dtype),
+            torch.from_numpy(columns["reward"]).to(self.device, torch.float32),
+            torch.from_numpy(columns["non_final"]).to(self.device),
+            torch.from_numpy(columns["next_mask"]).to(self.device),
+        )
+
+    def __iter__(self):
+        order = list(self.shards)
+        self.rng.shuffle(order)
+        carry = None
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            pending = [prefetch.submit(self.load, path) for path in order[:self.window]]
+            loaded = len(pending)
+            while pending:
+                window = [future.result() for future in pending]
+                pending = [prefetch.submit(self.load, path) for path in order[loaded:loaded + self.window]]
+                loaded += len(pending)
+
+                if carry is not None:
+                    window.append(carry)
+                columns = {name: np.concatenate([shard[name] for shard in window]) for name in COLUMNS}
+                permutation = self.np_rng.permutation(len(columns["reward"]))
+                full = len(permutation) - len(permutation) % self.batch_size
+                for start in range(0, full, self.batch_size):
+                    rows = permutation[start:start + self.batch_size]
+                    yield self.to_batch({name: column[rows] for name, column in columns.items()})
+                rest = permutation[full:]
+                carry = {name: column[rest] for name, column in columns.items()} if len(rest) else None
+
+        if carry is not None and not self.drop_last:
+            yield self.to_batch(carry)
+
+
+def train_offline(agent, dataset, epochs=1, max_updates=None):
+    """Runs agent.learn_batch over `dataset` for `epochs` passes. Returns the number of updates."""
+    updates = 0
+    for _ in range(epochs):
+        for batch in dataset:
+            if max_updates is not None and updates >= max_updates:
+                return updates
+            agent.learn_batch(batch)
+            updates += 1
+    return updates
@@ -1,5 +1,9 @@
+import numpy as np
 import torch
 
+from core.profiling import PROFILER
+from core.wire import decode_hand_into
+
 joker_names = [
     "8 Ball",
     "Abstract Joker",
@@ -196,17 +200,29 @@ effects = ["Base","Bonus Card","Glass Card","Gold Card",
                "Stone Card","Wild Card"
                ]
 
+joker_ids = {name: i for i, name in enumerate(joker_names)}
+voucher_ids = {name: i for i, name in enumerate(vouchers_names)}
+suit_ids = {name: i for i, name in enumerate(suits)}
+
+HAND_SLOTS = 8
+STATE_SIZE = HAND_SLOTS*2 + HAND_SLOTS # (id, suit) per hand card + selected flags
+
+# Raw features kept by the transition recorder, so other encodings can be trained offline
+RAW_HAND_SLOTS = 16
+RAW_GAME_FIELDS = (("game", "round"), ("current_round", "hands_left"), ("current_round", "discards_left"),
+                   ("game", "dollars"), ("game", "chips"))
+
 
 def encode_joker(joker):
     if(joker == None):
         return [-1, -1]
-    return [joker_names.index(joker["ability"]), joker["cost"]]
+    return [joker_ids[joker["ability"]], joker["cost"]]
 
 def encode_card(card):
     if(card == None):
         return [-1, -1]
     
-    return [card["id"], suits.index(card["suit"])] #, effects.index(card["effect"])
+    return [card["id"], suit_ids[card["suit"]]] #, effects.index(card["effect"])
 
 
 def encode_shop(shop):
@@ -219,7 +235,7 @@ def encode_shop(shop):
     
         if(len(shop["vouchers"]) > 0):
             voucher = shop["vouchers"][0]
-            shop_data.append([vouchers_names.index(voucher["ability"]), voucher["cost"]])
+            shop_data.append([voucher_ids[voucher["ability"]], voucher["cost"]])
         else:
             shop_data.append([-1,-1])
 
@@ -236,56 +252,62 @@ def encode_shop(shop):
         return shop_data
 
 
-def encode_game(G, selected, device = "cuda"):
-    if(len(G) == 0):
-        return torch.tensor([-1 for _ in range(24)], device = device, dtype=torch.float)
-    # jokers = G["jokers"][:5]
-    # jokers_data = []
-    # for i in range(len(jokers)):
-    #     jkr_data = encode_joker(jokers[i])
-    #     jokers_data.append(jkr_data)
-
-    # for i in range(5-len(jokers_data)):
-    #     jokers_data.append(encode_joker(None))
-
-
-    hand_data = []
-    if(len(G["hand"]) == 0):
-        hand_data = [encode_card(None) for _ in range(8)]
-    else:
-        hand = G["hand"][:8]
-        for i in range(len(hand)):
-            card_data = encode_card(hand[i])
-            hand_data.append(card_data)
-
-        for i in range(8-len(hand_data)):
-            hand_data.append(encode_card(None))
+@PROFILER.timed("encode")
+def encode_games_into(out, Gs, selections):
+    """Write the encode_game layout of every (G, selected) pair into the rows of `out`.
 
+    `out` is a preallocated (N, STATE_SIZE) array; rows are overwritten in place.
+    """
+    out[:, :HAND_SLOTS*2] = -1
+    out[:, HAND_SLOTS*2:] = 0
+    for row, (G, selected) in enumerate(zip(Gs, selections)):
+        if(len(G) == 0):
+            out[row, :] = -1
+            continue
 
-
-    # general_data = [G["game"]["dollars"],G["game"]["round"], G["game"]["chips"], G["current_round"]["hands_left"], G["current_round"]["discards_left"]]
-    # shop_data = encode_shop(G["shop"])
-    
-    
-    selected_vector = []
-    for i in range(1,9):
-        if(i in selected):
-            selected_vector.append(1)
+        packed = G.get("packed")
+        if packed is not None:
+            decode_hand_into(out[row], packed, HAND_SLOTS)
         else:
-            selected_vector.append(0)
+            for i, card in enumerate(G["hand"][:HAND_SLOTS]):
+                if card["suit"] not in suit_ids:
+                    raise ValueError(f"Unknown card suit {card['suit']!r}")
+                out[row, 2*i] = card["id"]
+                out[row, 2*i+1] = suit_ids[card["suit"]]
 
+        for i in selected:
+            if(1 <= i <= HAND_SLOTS):
+                out[row, HAND_SLOTS*2 + i-1] = 1
+    return out
 
+def encode_raw_into(hand, game, G, selected):
+    """Write the raw features of one gamestate for the transition recorder.
 
-    data_vector = []
-    #for d in jokers_data:
-    #    data_vector.extend(d) # 5*2 = 16
-    for d in hand_data:
-        data_vector.extend(d) # 8*2 =16
-    #for d in shop_data:
-    #    data_vector.extend(d) # 4*2+2 =10
-    #data_vector.extend(general_data)  #2 
-    data_vector.extend(selected_vector) # 8
+    `hand` is a (RAW_HAND_SLOTS, 3) row of card id, suit index and selected flag, -1 padded;
+    `game` holds RAW_GAME_FIELDS, NaN where the gamestate lacks one.
+    """
+    hand[:] = -1
+    game[:] = np.nan
+    if not G:
+        return
+    for i, card in enumerate(G.get("hand", [])[:RAW_HAND_SLOTS]):
+        hand[i] = (card.get("id") or 0, suit_ids.get(card.get("suit"), -1), 0)
+    for i in selected:
+        if 1 <= i <= RAW_HAND_SLOTS:
+            hand[i-1, 2] = 1
+    for j, (group, field) in enumerate(RAW_GAME_FIELDS):
+        value = (G.get(group) or {}).get(field)
+        if value is not None:
+            game[j] = value
+
+def encode_games(Gs, selections):
+    """Encode many game states at once into a (N, STATE_SIZE) float32 array."""
+    out = np.empty((len(Gs), STATE_SIZE), dtype=np.float32)
+    return encode_games_into(out, Gs, selections)
 
-    
 
-    return torch.tensor(data_vector, device = device,dtype=torch.float)
\ No newline at end of file
+def encode_game(G, selected, device = "cpu", dtype = torch.float):
+    # Layout: 8 hand cards as (id, suit) pairs, -1 padded, then 8 selected flags.
+    # An empty game state encodes as all -1.
+    data_vector = encode_games([G], [selected])[0]
+    return torch.from_numpy(data_vector).to(device, dtype)
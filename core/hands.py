@@ -0,0 +1,272 @@
+"""Poker hand classification from precomputed tables.
+
+Cards are small integers: a rank 2..14 (0 for an empty slot) and a suit index
+into SUITS (NO_SUIT when unknown). A hand of up to five cards is classified
+from its rank multiplicities, a flush flag and a rank-bitmask straight lookup.
+Single hands go through RANK_PATTERNS, a table keyed by the prime product of
+their ranks; `evaluate` runs the same rules as array operations, which
+`evaluate_subsets` uses to score every subset of many 8-card hands at once.
+
+The categories, scoring cards and base scores reproduce balsim.classify_hand
+and HAND_VALUES; REWARD_BY_CATEGORY reproduces BasicBalatro.evaluate_hand.
+"""
+from itertools import combinations, combinations_with_replacement
+
+import numpy as np
+
+SUITS = ["Hearts", "Diamonds", "Spades", "Clubs"]
+NO_SUIT = len(SUITS)
+SUIT_IDS = {suit: i for i, suit in enumerate(SUITS)}
+
+HAND_SLOTS = 8
+MAX_PLAYED = 5
+
+# Weakest to strongest
+HAND_NAMES = [
+    "High Card", "Pair", "Two Pair", "Three of a Kind", "Straight", "Flush", "Full House",
+    "Four of a Kind", "Straight Flush", "Five of a Kind", "Flush House", "Flush Five",
+]
+HAND_IDS = {name: i for i, name in enumerate(HAND_NAMES)}
+(HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH, FULL_HOUSE,
+ FOUR_OF_A_KIND, STRAIGHT_FLUSH, FIVE_OF_A_KIND, FLUSH_HOUSE, FLUSH_FIVE) = range(len(HAND_NAMES))
+
+# (base chips, base mult) per category, as balsim.HAND_VALUES
+BASE_CHIPS = np.array([5, 10, 20, 30, 30, 35, 40, 60, 100, 120, 140, 160], dtype=np.int64)
+BASE_MULT = np.array([1, 2, 2, 3, 4, 4, 4, 7, 8, 12, 14, 16], dtype=np.int64)
+
+# Chips a scoring card adds, by rank (index 0 is an empty slot)
+CARD_CHIPS = np.array([0, 0] + [min(rank, 10) for rank in range(2, 14)] + [11], dtype=np.int64)
+
+# Hand bonus of BasicBalatro.evaluate_hand: any flush is 40, otherwise by category.
+# Four and five of a kind and straights fall through its checks to -15.
+REWARD_FLUSH = 40
+REWARD_BY_CATEGORY = np.array([-15, 10, 20, 30, -15, 40, 40, -15, 40, -15, 40, 40], dtype=np.int64)
+
+
+def build_straight_table():
+    """True for the 13-bit rank masks (bit rank-2) of five consecutive ranks, ace-low included."""
+    table = np.zeros(1 << 13, dtype=bool)
+    for low in range(2, 11):
+        table[sum(1 << (rank - 2) for rank in range(low, low + 5))] = True
+    table[sum(1 << (rank - 2) for rank in (14, 2, 3, 4, 5))] = True
+    return table
+
+
+def build_category_table():
+    """Category keyed by (largest rank group, second group has 2+ cards, flush, straight).
+
+    Follows the precedence of balsim.classify_hand.
+    """
+    table = np.zeros((MAX_PLAYED + 1, 2, 2, 2), dtype=np.int64)
+    for top in range(MAX_PLAYED + 1):
+        for second in range(2):
+            for flush in range(2):
+                for straight in range(2):
+                    if top == 5:
+                        category = FLUSH_FIVE if flush else FIVE_OF_A_KIND
+                    elif flush and top == 3 and second:
+                        category = FLUSH_HOUSE
+                    elif flush and straight:
+                        category = STRAIGHT_FLUSH
+                    elif top == 4:
+                        category = FOUR_OF_A_KIND
+                    elif top == 3 and second:
+                        category = FULL_HOUSE
+                    elif flush:
+                        category = FLUSH
+                    elif straight:
+                        category = STRAIGHT
+                    elif top == 3:
+                        category = THREE_OF_A_KIND
+                    elif top == 2 and second:
+                        category = TWO_PAIR
+                    elif top == 2:
+                        category = PAIR
+                    else:
+                        category = HIGH_CARD
+                    table[top, second, flush, straight] = category
+    return table
+
+
+def build_rank_patterns():
+    """Rank multiset of up to five cards, keyed by the product of its RANK_PRIMES, to
+    (largest group, second group has 2+ cards, straight, {rank: multiplicity})."""
+    patterns = {}
+    for size in range(1, MAX_PLAYED + 1):
+        for ranks in combinations_with_replacement(range(2, 15), size):
+            key = 1
+            counts = {}
+            for rank in ranks:
+                key *= RANK_PRIMES[rank]
+                counts[rank] = counts.get(rank, 0) + 1
+            groups = sorted(counts.values(), reverse=True) + [0]
+            straight = size == MAX_PLAYED and groups[0] == 1 and \
+                bool(STRAIGHT_TABLE[sum(1 << (rank - 2) for rank in ranks)])
+            patterns[key] = (groups[0], int(groups[1] >= 2), int(straight), counts)
+    return patterns
+
+
+def build_subsets(slots=HAND_SLOTS):
+    """Every non-empty subset of at most five of `slots` cards as an (S, 5) index array.
+
+    Short subsets are padded with `slots`, the index of an always-empty card.
+    """
+    subsets = []
+    for size in range(1, MAX_PLAYED + 1):
+        for combo in combinations(range(slots), size):
+            subsets.append(list(combo) + [slots] * (MAX_PLAYED - size))
+    return np.array(subsets, dtype=np.int64)
+
+
+# A distinct prime per rank 2..14, so a product identifies a multiset of ranks
+RANK_PRIMES = [0, 0, 2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+
+STRAIGHT_TABLE = build_straight_table()
+CATEGORY_TABLE = build_category_table()
+CATEGORY_LISTS = CATEGORY_TABLE.tolist() # plain-list copy for the scalar path
+RANK_PATTERNS = build_rank_patterns()
+SUBSETS = build_subsets() # 218 subsets of an 8-card hand
+SUBSET_SIZES = (SUBSETS < HAND_SLOTS).sum(1)
+
+# Which cards of a category score: everything, or only the cards of the named group size
+SCORES_ALL = np.array([False, False, False, False, True, True, True, False, True, True, True, True])
+SCORING_GROUP = np.array([0, 2, 2, 3, 0, 0, 0, 4, 0, 0, 0, 0], dtype=np.int64)
+
+
+def encode_cards(cards, slots=None):
+    """(ranks, suits) int64 arrays of card dicts, padded with empty slots up to `slots`."""
+    count = len(cards) if slots is None else slots
+    ranks = np.zeros(count, dtype=np.int64)
+    suits = np.full(count, NO_SUIT, dtype=np.int64)
+    for i, card in enumerate(cards[:count]):
+        ranks[i] = card["id"]
+        suits[i] = SUIT_IDS.get(card["suit"], NO_SUIT)
+    return ranks, suits
+
+
+def encode_hands(hands, slots=HAND_SLOTS):
+    """(N, slots) rank and suit arrays for a list of card-dict lists."""
+    ranks = np.zeros((len(hands), slots), dtype=np.int64)
+    suits = np.full((len(hands), slots), NO_SUIT, dtype=np.int64)
+    for row, hand in enumerate(hands):
+        for i, card in enumerate(hand[:slots]):
+            ranks[row, i] = card["id"]
+            suits[row, i] = SUIT_IDS.get(card["suit"], NO_SUIT)
+    return ranks, suits
+
+
+def evaluate(ranks, suits):
+    """Classifies hands of up to five cards given as (..., 5) rank and suit arrays (rank 0 = no card).
+
+    Returns (category, flush, scoring card mask, score), where score is the
+    base chips plus the scoring cards' chips, times the base mult.
+    """
+    ranks = np.asarray(ranks)
+    suits = np.asarray(suits)
+    present = ranks > 0
+    size = present.sum(-1)
+
+    # Multiplicity of each card's rank within its hand
+    same = (ranks[..., :, None] == ranks[..., None, :]) & present[..., :, None] & present[..., None, :]
+    multiplicity = same.sum(-1)
+    top = multiplicity.max(-1)
+    pair_cards = (multiplicity == 2).sum(-1)
+    second = np.where(top == 3, pair_cards >= 2, pair_cards >= 4)
+
+    first_suit = np.take_along_axis(suits, np.argmax(present, -1)[..., None], -1)
+    # Unknown suits compare equal to each other, as the dict-based checks did
+    flush = (size == MAX_PLAYED) & ((suits == first_suit) | ~present).all(-1)
+    rank_bits = np.bitwise_or.reduce(np.where(present, 1 << np.clip(ranks - 2, 0, 12), 0), axis=-1)
+    straight = (size == MAX_PLAYED) & (top == 1) & STRAIGHT_TABLE[rank_bits]
+
+    category = CATEGORY_TABLE[top, second.astype(np.int64), flush.astype(np.int64), straight.astype(np.int64)]
+
+    group = SCORING_GROUP[category][..., None]
+    high = (ranks == ranks.max(-1, keepdims=True)) & present
+    scoring = np.where(
+        SCORES_ALL[category][..., None], present,
+        np.where(category[..., None] == HIGH_CARD, high, multiplicity == group),
+    )
+    chips = BASE_CHIPS[category] + (CARD_CHIPS[ranks] * scoring).sum(-1)
+    score = np.where(size > 0, chips * BASE_MULT[category], 0)
+    return category, flush, scoring, score
+
+
+def classify_scalar(ranks, suits):
+    """Category and per-rank multiplicities of up to five cards, from RANK_PATTERNS.
+
+    The scalar path: plain Python lookups, no array allocation.
+    """
+    key = 1
+    for rank in ranks:
+        key *= RANK_PRIMES[rank]
+    top, second, straight, counts = RANK_PATTERNS[key]
+    flush = len(ranks) == MAX_PLAYED and len(set(suits)) == 1
+    return CATEGORY_LISTS[top][second][flush][straight], flush, counts
+
+
+def classify(cards):
+    """(hand name, scoring indices) for up to five (rank, suit name) pairs, like balsim.classify_hand."""
+    ranks = [rank for rank, _ in cards]
+    category, _, counts = classify_scalar(ranks, [suit for _, suit in cards])
+    if SCORES_ALL[category]:
+        scoring = list(range(len(cards)))
+    elif category == HIGH_CARD:
+        scoring = [ranks.index(max(ranks))]
+    else:
+        group = SCORING_GROUP[category]
+        scoring = [i for i, rank in enumerate(ranks) if counts[rank] == group]
+    return HAND_NAMES[category], scoring
+
+
+def hand_reward(cards):
+    """BasicBalatro.evaluate_hand bonus of up to five card dicts."""
+    if not cards:
+        return int(REWARD_BY_CATEGORY[HIGH_CARD])
+    category, flush, _ = classify_scalar([card["id"] for card in cards], [card["suit"] for card in cards])
+    return REWARD_FLUSH if flush else int(REWARD_BY_CATEGORY[category])
+
+
+def hand_rewards(ranks, suits):
+    """BasicBalatro.evaluate_hand bonus for (..., 5) arrays of played cards."""
+    category, flush, _, _ = evaluate(ranks, suits)
+    return np.where(flush, REWARD_FLUSH, REWARD_BY_CATEGORY[category])
+
+
+def evaluate_subsets(ranks, suits):
+    """Evaluates all 218 subsets of (N, 8) hands in one call.
+
+    Returns (category, score) arrays of shape (N, 218), aligned with SUBSETS;
+    subsets that use an empty slot get category -1 and score 0.
+    """
+    ranks = np.asarray(ranks)
+    suits = np.asarray(suits)
+    n = ranks.shape[0]
+    # Column HAND_SLOTS is the empty card that pads short subsets
+    padded_ranks = np.concatenate([ranks, np.zeros((n, 1), dtype=ranks.dtype)], 1)
+    padded_suits = np.concatenate([suits, np.full((n, 1), NO_SUIT, dtype=suits.dtype)], 1)
+    subset_ranks = padded_ranks[:, SUBSETS]
+    subset_suits = padded_suits[:, SUBSETS]
+
+    category, _, _, score = evaluate(subset_ranks, subset_suits)
+    valid = (subset_ranks > 0).sum(-1) == SUBSET_SIZES
+    return np.where(valid, category, -1), np.where(valid, score, 0)
+
+
+def best_hands(ranks, suits):
+    """Best subset of each (N, 8) hand by base score: (category, score, subset index into SUBSETS)."""
+    category, score = evaluate_subsets(ranks, suits)
+    best = score.argmax(1)
+    rows = np.arange(len(best))
+    return category[rows, best], score[rows, best], best
+
+
+def best_hand_features(Gs):
+    """(N, 2) float32 features of the best playable hand in each gamestate:
+    its category / FLUSH_FIVE and log1p of its base score."""
+    ranks, suits = encode_hands([G["hand"] for G in Gs])
+    category, score, _ = best_hands(ranks, suits)
+    features = np.zeros((len(Gs), 2), dtype=np.float32)
+    features[:, 0] = np.maximum(category, 0) / FLUSH_FIVE
+    features[:, 1] = np.log1p(score)
+    return features
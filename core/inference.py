@@ -0,0 +1,97 @@
+import copy
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from core.dataset import load_shard, shard_paths
+
+BACKENDS = ("int8", "compile")
+
+# Deprecation notices recent torch raises on every trace, freeze and quantization. The calls still
+# work, and each refresh would repeat them; any other warning from building is let through.
+BUILD_WARNINGS = [
+    (FutureWarning, r"`torch\.jit\.(trace|trace_method|freeze)` is deprecated"),
+    (DeprecationWarning, r"torch\.ao\.quantization is deprecated"),
+    (UserWarning, r"torch\.quantize_per_tensor, torch\.quantize_per_channel and other quantized tensor creation"),
+]
+
+
+class InferenceEngine:
+    """Acting-only copy of a float32 CPU network, behind the same call as the network.
+
+    "int8" quantizes the Linear layers of a copy of the network dynamically
+    to int8, then traces and freezes it into a TorchScript graph. It is a
+    snapshot, rebuilt after every `refresh_every` gradient steps reported
+    through `updated()`. (Tracing alone, without int8, runs no faster than
+    the eager network at any batch size.) "compile" wraps the live
+    network with torch.compile, so it always sees the current weights and
+    never needs a refresh; it needs a working C++ compiler.
+    """
+
+    def __init__(self, net, backend="int8", refresh_every=100):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend {backend}, expected one of {', '.join(BACKENDS)}")
+        parameter = next(net.parameters())
+        if parameter.device.type != "cpu" or parameter.dtype != torch.float32:
+            raise ValueError(f"Inference backends need a float32 CPU network, got {parameter.dtype} on "
+                             f"{parameter.device}")
+        self.net = net
+        self.backend = backend
+        self.refresh_every = refresh_every
+        self.n_observations = next(m for m in net.modules() if isinstance(m, nn.Linear)).in_features
+        self.updates = 0
+        self.module = None
+        self.refresh()
+
+    def build(self):
+        if self.backend == "compile":
+            return torch.compile(self.net, dynamic=True)
+        model = copy.deepcopy(self.net).eval()
+        with warnings.catch_warnings(), torch.no_grad():
+            for category, message in BUILD_WARNINGS:
+                warnings.filterwarnings("ignore", message, category)
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            traced = torch.jit.trace(model, torch.zeros((1, self.n_observations)))
+            return torch.jit.freeze(traced)
+
+    def refresh(self):
+        """Rebuilds the snapshot from the network's current weights."""
+        if self.module is None or self.backend != "compile":
+            self.module = self.build()
+        self.updates = 0
+
+    def updated(self):
+        """Counts one gradient step on the network."""
+        self.updates += 1
+
+    def __call__(self, x):
+        if self.updates >= self.refresh_every:
+            self.refresh()
+        return self.module(x)
+
+    def agreement(self, states):
+        """Fraction of the rows of `states` whose argmax matches that of the float network."""
+        states = torch.as_tensor(states, dtype=torch.float32)
+        with torch.inference_mode():
+            if self.updates:
+                self.refresh()
+            expected = self.net(states).argmax(1)
+            actual = self(states).argmax(1)
+        return (expected == actual).float().mean().item()
+
+
+def recorded_states(directory, limit=10000):
+    """Up to `limit` encoded states from the shards of a TransitionRecorder, as an (N, STATE_SIZE) tensor."""
+    parts = []
+    count = 0
+    for _, path in shard_paths(directory):
+        states = load_shard(path)["state"][:limit - count]
+        parts.append(states)
+        count += len(states)
+        if count >= limit:
+            break
+    if not parts:
+        raise FileNotFoundError(f"No transition shards in {directory}")
+    return torch.from_numpy(np.concatenate(parts))
@@ -0,0 +1,80 @@
+import threading
+
+
+class BackgroundLearner:
+    """Runs a DQNAgent's gradient steps on a thread of their own.
+
+    The learner aims at `replay_ratio` updates per transition pushed once the
+    replay holds a minibatch. It waits while it is ahead of the actors, and
+    `transition_pushed` blocks the pushing thread while the learner is more
+    than `max_lag` updates behind (None never blocks). Every `publish_every`
+    updates the agent's acting network is swapped for a snapshot of the
+    policy network, so acting never waits on a backward pass. Torch releases
+    the GIL inside its kernels, which lets updates run while the env sleeps
+    or waits on the game.
+    """
+
+    def __init__(self, agent, replay_ratio=1.0, min_size=1, publish_every=100, save_every=None, max_lag=1000):
+        if replay_ratio <= 0:
+            raise ValueError(f"replay_ratio must be positive, got {replay_ratio}")
+        self.agent = agent
+        self.replay_ratio = replay_ratio
+        self.min_size = min_size
+        self.publish_every = publish_every
+        self.save_every = save_every
+        self.max_lag = max_lag
+
+        self.pushes = 0
+        self.updates = 0
+        self.saved_at = 0
+        self.error = None
+        self.stopping = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="learner", daemon=True)
+        self.thread.start()
+
+    def due(self):
+        """Updates owed to the transitions pushed so far."""
+        return self.replay_ratio * self.pushes - self.updates
+
+    def transition_pushed(self):
+        if len(self.agent.memory) < self.min_size:
+            return # Warming up: inline training would not have stepped either
+        with self.cond:
+            self.pushes += 1
+            self.cond.notify_all()
+            if self.max_lag is not None:
+                self.cond.wait_for(lambda: self.stopping or self.due() <= self.max_lag)
+            if self.error is not None:
+                raise RuntimeError("Background learner failed") from self.error
+
+    def run(self):
+        try:
+            while True:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.stopping or self.due() >= 1)
+                    if self.stopping:
+                        return
+                self.agent.sample_and_learn()
+                with self.cond:
+                    self.updates += 1
+                    self.cond.notify_all()
+
+                if self.updates % self.publish_every == 0:
+                    self.agent.publish_policy()
+                # The acting thread counts decisions in steps_done; checkpoints keep following it
+                if self.save_every is not None and self.agent.steps_done - self.saved_at >= self.save_every:
+                    self.saved_at = self.agent.steps_done
+                    self.agent.save_checkpoint()
+        except BaseException as error:
+            with self.cond:
+                self.error = error
+                self.stopping = True
+                self.cond.notify_all()
+            raise
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.thread.join()
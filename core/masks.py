@@ -0,0 +1,106 @@
+import numpy as np
+import torch
+
+from core.hands import SUBSETS
+
+N_ACTIONS = 10 # select card 1..8, play, discard
+HAND_SLOTS = 8
+PLAY = 8
+DISCARD = 9
+MAX_SELECTED = 5
+
+# Table dimensions: selected counts 0..8, hand sizes 0..9 (anything larger masks like 9)
+SELECTED_COUNTS = HAND_SLOTS + 1
+HAND_SIZES = HAND_SLOTS + 2
+
+
+def build_rule_table():
+    """Illegal actions keyed by (number selected, hand size, discards_left == 0)."""
+    table = np.zeros((SELECTED_COUNTS, HAND_SIZES, 2, N_ACTIONS), dtype=bool)
+    for n_selected in range(SELECTED_COUNTS):
+        for hand_size in range(HAND_SIZES):
+            for no_discards in range(2):
+                mask = table[n_selected, hand_size, no_discards]
+                if n_selected == MAX_SELECTED:
+                    mask[:HAND_SLOTS] = True
+                if n_selected == 0:
+                    mask[PLAY] = True
+                    mask[DISCARD] = True
+                if no_discards:
+                    mask[DISCARD] = True
+                for i in range(1, HAND_SLOTS + 1):
+                    if i + 1 > hand_size:
+                        mask[i-1] = True
+    return table
+
+
+def build_selected_table():
+    """Card-select actions made illegal by the selection bitmask (bit i-1 set when card i is selected)."""
+    table = np.zeros((1 << HAND_SLOTS, N_ACTIONS), dtype=bool)
+    for bits in range(1 << HAND_SLOTS):
+        for i in range(HAND_SLOTS):
+            table[bits, i] = bool(bits >> i & 1)
+    return table
+
+
+RULE_TABLE = build_rule_table()
+SELECTED_TABLE = build_selected_table()
+
+# Subset action mode: every play/discard candidate of 1-5 cards, as 1-based selections,
+# and as selected flags in the encode_game layout
+SUBSET_SELECTIONS = [[int(i) + 1 for i in subset if i < HAND_SLOTS] for subset in SUBSETS]
+SUBSET_FLAGS = np.zeros((len(SUBSETS), HAND_SLOTS), dtype=np.float32)
+for row, selection in enumerate(SUBSET_SELECTIONS):
+    SUBSET_FLAGS[row, [i - 1 for i in selection]] = 1
+
+
+def legal_subsets(G):
+    """Indices into SUBSET_SELECTIONS of the subsets whose every card the card mode may select.
+
+    The card slots come from RULE_TABLE, so both action modes agree on which cards are playable.
+    """
+    illegal_slots = RULE_TABLE[0, min(len(G["hand"]), HAND_SIZES - 1), 0, :HAND_SLOTS]
+    return np.flatnonzero(~SUBSET_FLAGS[:, illegal_slots].any(axis=1))
+
+
+def mask_features(Gs, selections):
+    """Compact integer features the masks depend on, as an (N, 4) int64 array:
+    number selected, hand size, discards_left == 0, selection bitmask."""
+    features = np.zeros((len(Gs), 4), dtype=np.int64)
+    for row, (G, selected) in enumerate(zip(Gs, selections)):
+        bits = 0
+        for i in selected:
+            if 1 <= i <= HAND_SLOTS:
+                bits |= 1 << (i-1)
+        features[row, 0] = min(len(selected), SELECTED_COUNTS - 1)
+        features[row, 1] = min(len(G["hand"]), HAND_SIZES - 1)
+        features[row, 2] = G["current_round"]["discards_left"] == 0
+        features[row, 3] = bits
+    return features
+
+
+class ActionMasker:
+    """Legal-action masks for the card selection policy, looked up from precomputed tables.
+
+    Masks are True for illegal actions. Only the "Hand" context is masked.
+    """
+    def __init__(self, device="cpu"):
+        self.device = torch.device(device)
+        self.rule_table = torch.from_numpy(RULE_TABLE).to(self.device)
+        self.selected_table = torch.from_numpy(SELECTED_TABLE).to(self.device)
+
+    def masks_from_features(self, features):
+        """(N, 10) bool masks from an (N, 4) tensor of mask_features."""
+        return (
+            self.rule_table[features[:, 0], features[:, 1], features[:, 2]]
+            | self.selected_table[features[:, 3]]
+        )
+
+    def masks(self, Gs, selections, context):
+        if context != "Hand":
+            return torch.zeros((len(Gs), N_ACTIONS), dtype=torch.bool, device=self.device)
+        features = torch.from_numpy(mask_features(Gs, selections)).to(self.device)
+        return self.masks_from_features(features)
+
+    def mask(self, G, selected, context):
+        return self.masks([G], [selected], context)[0]
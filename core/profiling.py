@@ -0,0 +1,278 @@
+import bisect
+import contextlib
+import functools
+import cProfile
+import json
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import torch
+
+# Histogram bucket upper bounds in seconds: 1 us .. ~1000 s, four buckets per doubling
+BUCKET_BOUNDS = [1e-6 * 2 ** (k / 4) for k in range(4 * 30 + 1)]
+
+# Returned by timer() while disabled, so an instrumented block costs one call and an empty with
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    """Log-bucketed latency histogram; percentiles are read from the bucket bounds."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "p50_s": self.percentile(0.5),
+            "p99_s": self.percentile(0.99),
+            "max_s": self.max,
+        }
+
+
+class _Timer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Process-wide timers and counters for the training hot path.
+
+    Instrumented code calls `timer(name)` / `count(name)` unconditionally;
+    both are no-ops until `configure(enabled=True)`. Timers named `*.sleep`
+    are summed as sleep time in the report, everything else under the
+    `env.step` timer counts as work. `step()` marks one env step: it drives
+    the periodic report and the on-demand trace window.
+
+    Reports are appended to `report_path` every `report_every` seconds, as
+    JSON lines (.jsonl), CSV (.csv) or a Prometheus text file (.prom, rewritten
+    each time). Setting BALATRO_PROFILE=<report path> enables profiling at import.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.report_path = None
+        self.report_every = 10.0
+        self.lock = threading.Lock()
+        self.reset()
+
+        self.trace_kind = None
+        self.trace_steps = 0
+        self.trace_path = None
+        self.trace = None
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+        self.steps = 0
+        self.window_start = time.monotonic()
+        self.last_report = self.window_start
+
+    def configure(self, enabled=True, report_path=None, report_every=10.0):
+        self.enabled = enabled
+        self.report_path = Path(report_path) if report_path else None
+        self.report_every = report_every
+        if self.report_path is not None:
+            self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        self.reset()
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """Decorator form of timer()."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return wrap
+
+    def record(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def step(self, n=1):
+        if not self.enabled and self.trace is None and self.trace_kind is None:
+            return
+        with self.lock:
+            self.steps += n
+        self.advance_trace(n)
+        if self.enabled and self.report_path is not None and time.monotonic() - self.last_report >= self.report_every:
+            self.write_report()
+
+    # Reports
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.window_start
+            histograms = {name: h.summary() for name, h in self.histograms.items()}
+            counters = dict(self.counters)
+            steps = self.steps
+        sleep = sum(h["total_s"] for name, h in histograms.items() if name.endswith(".sleep"))
+        step_time = histograms.get("env.step", {}).get("total_s", 0.0)
+        return {
+            "time": time.time(),
+            "elapsed_s": elapsed,
+            "steps": steps,
+            "steps_per_s": steps / elapsed if elapsed > 0 else 0.0,
+            "sleep_s": sleep,
+            "work_s": max(step_time - sleep, 0.0),
+            "counters": counters,
+            "timers": histograms,
+        }
+
+    def write_report(self):
+        report = self.snapshot()
+        self.last_report = time.monotonic()
+        suffix = self.report_path.suffix
+        if suffix == ".prom":
+            text = self.format_prometheus(report)
+            tmp_path = self.report_path.with_name(self.report_path.name + ".tmp")
+            tmp_path.write_text(text)
+            os.replace(tmp_path, self.report_path)
+        elif suffix == ".csv":
+            new_file = not self.report_path.exists()
+            with open(self.report_path, "a") as f:
+                if new_file:
+                    f.write("time,elapsed_s,metric,count,total_s,mean_s,p50_s,p99_s,max_s\n")
+                for name, h in sorted(report["timers"].items()):
+                    f.write(f"{report['time']:.3f},{report['elapsed_s']:.3f},{name},{h['count']},"
+                            f"{h['total_s']:.6f},{h['mean_s']:.6g},{h['p50_s']:.6g},{h['p99_s']:.6g},{h['max_s']:.6g}\n")
+                for name, value in sorted(report["counters"].items()):
+                    f.write(f"{report['time']:.3f},{report['elapsed_s']:.3f},{name},{value},,,,,\n")
+                # Steps and their work and sleep seconds; the rate is count / elapsed_s
+                steps = report["steps"]
+                f.write(f"{report['time']:.3f},{report['elapsed_s']:.3f},steps,{steps},{report['work_s']:.6f},"
+                        f"{report['work_s'] / steps if steps else 0.0:.6g},,,\n")
+                f.write(f"{report['time']:.3f},{report['elapsed_s']:.3f},sleep,,{report['sleep_s']:.6f},,,,\n")
+        else:
+            with open(self.report_path, "a") as f:
+                f.write(json.dumps(report) + "\n")
+        return report
+
+    def format_prometheus(self, report):
+        def metric(name):
+            return "balatro_" + name.replace(".", "_").replace("-", "_")
+
+        lines = [
+            f"balatro_steps_total {report['steps']}",
+            f"balatro_steps_per_second {report['steps_per_s']:.6g}",
+            f"balatro_sleep_seconds_total {report['sleep_s']:.6f}",
+            f"balatro_work_seconds_total {report['work_s']:.6f}",
+        ]
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"{metric(name)}_total {value}")
+        for name, h in sorted(report["timers"].items()):
+            base = metric(name) + "_seconds"
+            lines.append(f"# TYPE {base} summary")
+            lines.append(f'{base}{{quantile="0.5"}} {h["p50_s"]:.6g}')
+            lines.append(f'{base}{{quantile="0.99"}} {h["p99_s"]:.6g}')
+            lines.append(f"{base}_sum {h['total_s']:.6f}")
+            lines.append(f"{base}_count {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    # On-demand traces
+
+    def request_trace(self, steps=100, kind="cprofile", path="profiles"):
+        """Profiles the next `steps` env steps with cProfile or torch.profiler and dumps the trace under `path`."""
+        if kind not in ("cprofile", "torch"):
+            raise ValueError(f"Unknown trace kind {kind}, expected 'cprofile' or 'torch'")
+        self.trace_kind = kind
+        self.trace_steps = steps
+        self.trace_path = Path(path)
+
+    def install_signal(self, signum=getattr(signal, "SIGUSR1", None), steps=100, kind="cprofile", path="profiles"):
+        """Starts a trace window whenever the process receives `signum` (main thread only)."""
+        if signum is None:
+            return
+        signal.signal(signum, lambda *_: self.request_trace(steps, kind, path))
+
+    def advance_trace(self, n):
+        if self.trace is None:
+            if self.trace_kind is None:
+                return
+            if self.trace_kind == "cprofile":
+                self.trace = cProfile.Profile()
+                self.trace.enable()
+            else:
+                self.trace = torch.profiler.profile(
+                    activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+                )
+                self.trace.__enter__()
+            return
+
+        self.trace_steps -= n
+        if self.trace_steps > 0:
+            return
+        self.trace_path.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.trace_kind == "cprofile":
+            self.trace.disable()
+            path = self.trace_path / f"trace_{stamp}_{os.getpid()}.prof"
+            self.trace.dump_stats(path)
+        else:
+            self.trace.__exit__(None, None, None)
+            path = self.trace_path / f"trace_{stamp}_{os.getpid()}.json"
+            self.trace.export_chrome_trace(str(path))
+        print(f"Profiler trace written to {path}")
+        self.trace = None
+        self.trace_kind = None
+
+
+PROFILER = Profiler()
+
+if os.environ.get("BALATRO_PROFILE"):
+    PROFILER.configure(enabled=True, report_path=os.environ["BALATRO_PROFILE"])
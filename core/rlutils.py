@@ -1,19 +1,422 @@
-import random
-from collections import namedtuple, deque
+import warnings
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import torch
 
 Transition = namedtuple("Transition", ("state", "action", "next_state", "reward"))
+TransitionBatch = namedtuple("TransitionBatch", ("state", "action", "next_state", "reward", "non_final", "next_mask"))
+
 class ReplayMemory(object):
-    def __init__(self, capacity):
-        self.memory = deque([], maxlen=capacity)
-        
-    def push(self, *args):
+    """Fixed-capacity ring buffer backed by preallocated tensors.
+
+    Every column lives in one contiguous tensor, so a minibatch is a single
+    index gather instead of a list of per-transition objects.
+    """
+    def __init__(self, capacity, state_dim=24, device="cpu", dtype=torch.float, n_actions=10):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.device = torch.device(device)
+        self.dtype = dtype
+
+        self.states = torch.zeros((capacity, state_dim), dtype=dtype, device=self.device)
+        self.next_states = torch.zeros((capacity, state_dim), dtype=dtype, device=self.device)
+        self.actions = torch.zeros((capacity, 1), dtype=torch.long, device=self.device)
+        # Only states follow `dtype`; bfloat16 would round rewards to about three significant digits
+        self.rewards = torch.zeros(capacity, dtype=torch.float32, device=self.device)
+        self.non_final = torch.zeros(capacity, dtype=torch.bool, device=self.device)
+        # Illegal actions in the next state, for the masked max of the TD target
+        self.next_masks = torch.zeros((capacity, n_actions), dtype=torch.bool, device=self.device)
+
+        self.position = 0
+        self.size = 0
+        # Number of transitions ever pushed; the i-th push lives at i % capacity
+        self.total = 0
+
+    def push(self, state, action, next_state, reward, next_mask=None):
         """Save a transition"""
-        self.memory.append(Transition(*args))
+        i = self.position
+        self.states[i] = state.reshape(-1)
+        self.actions[i] = action.reshape(-1) if torch.is_tensor(action) else action
+        if next_state is None:
+            self.next_states[i] = 0
+            self.non_final[i] = False
+        else:
+            self.next_states[i] = next_state.reshape(-1)
+            self.non_final[i] = True
+        self.rewards[i] = reward.reshape(-1) if torch.is_tensor(reward) else reward
+        if next_mask is None:
+            self.next_masks[i] = False
+        else:
+            self.next_masks[i] = next_mask
+
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total += 1
 
     def sample(self, batch_size):
-        return random.sample(self.memory, batch_size)
+        indices = torch.randint(0, self.size, (batch_size,), device=self.device)
+        return self.gather(indices)
+
+    def sample_weighted(self, batch_size):
+        """Returns (batch, importance-sampling weights, indices); uniform replay has no weights."""
+        return self.sample(batch_size), None, None
+
+    def update_priorities(self, indices, td_errors, pushed=None):
+        pass
+
+    def gather(self, indices):
+        return TransitionBatch(
+            self.states[indices],
+            self.actions[indices],
+            self.next_states[indices],
+            self.rewards[indices],
+            self.non_final[indices],
+            self.next_masks[indices],
+        )
+
+    def export_since(self, start):
+        """Returns the transitions pushed since the `start`-th push that are still stored.
+
+        Result is (global index of the first exported transition, dict of CPU tensors),
+        oldest first.
+        """
+        first = max(start, self.total - self.size)
+        positions = torch.arange(first, self.total, device=self.device) % self.capacity
+        batch = self.gather(positions)
+        return first, {name: value.cpu() for name, value in batch._asdict().items()}
+
+    def state_dict(self):
+        return self.export_since(0)[1]
+
+    def load_state_dict(self, state_dict, total=None):
+        if isinstance(state_dict, list):
+            # Checkpoints written before the ring buffer stored a list of Transitions
+            self.position = 0
+            self.size = 0
+            self.total = 0
+            for transition in state_dict:
+                self.push(*transition)
+            return
+
+        if len(state_dict) == 0:
+            self.size = 0
+            self.total = total or 0
+            self.position = self.total % self.capacity
+            return
+
+        stored = len(state_dict["state"])
+        count = min(stored, self.capacity)
+        self.total = stored if total is None else total
+        # Keep the i-th push at i % capacity so export_since stays valid after a restore
+        positions = torch.arange(self.total - count, self.total, device=self.device) % self.capacity
+        self.states[positions] = state_dict["state"][stored - count:].to(self.device, self.states.dtype)
+        self.actions[positions] = state_dict["action"][stored - count:].to(self.device, self.actions.dtype)
+        self.next_states[positions] = state_dict["next_state"][stored - count:].to(self.device, self.next_states.dtype)
+        self.rewards[positions] = state_dict["reward"][stored - count:].to(self.device, self.rewards.dtype)
+        self.non_final[positions] = state_dict["non_final"][stored - count:].to(self.device, self.non_final.dtype)
+        if "next_mask" in state_dict:
+            self.next_masks[positions] = state_dict["next_mask"][stored - count:].to(self.device)
+        else:
+            self.next_masks[positions] = False
+        self.size = count
+        self.position = self.total % self.capacity
 
     def __len__(self):
-        return len(self.memory)
-    
+        return self.size
+
+
+class MmapReplayMemory(ReplayMemory):
+    """ReplayMemory whose columns are memory-mapped .npy files in the `path` directory.
+
+    A small int64 header file holds the layout and the write cursors, so the
+    buffer is reopened after a restart without reading it back, and capacity
+    is bounded by disk rather than RAM. Pushes write the row before advancing
+    the cursors, which lets other processes open the same directory with
+    `readonly=True` and sample while a writer is appending. Opening an existing
+    buffer keeps its capacity and contents. Columns are float32 on the CPU.
+    """
+    HEADER_FIELDS = ("version", "capacity", "state_dim", "n_actions", "position", "size", "total")
+    VERSION = 1
+    persistent = True
+
+    def __init__(self, path, capacity=None, state_dim=24, n_actions=10, readonly=False):
+        self.path = Path(path)
+        self.readonly = readonly
+        self.device = torch.device("cpu")
+        self.dtype = torch.float
+        header_path = self.path / "header.bin"
+
+        if self.exists(self.path):
+            self.header = np.memmap(header_path, dtype=np.int64, mode="r" if readonly else "r+",
+                                    shape=(len(self.HEADER_FIELDS),))
+            version, stored_capacity, stored_dim, stored_actions = (int(v) for v in self.header[:4])
+            if version != self.VERSION:
+                raise ValueError(f"Unsupported replay store version {version} in {self.path}")
+            if (capacity is not None and capacity != stored_capacity) or stored_dim != state_dim \
+                    or stored_actions != n_actions:
+                raise ValueError(
+                    f"Replay store {self.path} holds capacity={stored_capacity}, state_dim={stored_dim}, "
+                    f"n_actions={stored_actions}; asked for capacity={capacity}, state_dim={state_dim}, "
+                    f"n_actions={n_actions}"
+                )
+            created = False
+        else:
+            if readonly:
+                raise FileNotFoundError(f"No replay store at {self.path}")
+            if capacity is None:
+                raise ValueError("capacity is required to create a replay store")
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.header = np.memmap(header_path, dtype=np.int64, mode="w+", shape=(len(self.HEADER_FIELDS),))
+            created = True
+
+        self.capacity = int(self.header[1]) if not created else capacity
+        self.state_dim = state_dim
+        columns = {
+            "state": (np.float32, (self.capacity, state_dim)),
+            "next_state": (np.float32, (self.capacity, state_dim)),
+            "action": (np.int64, (self.capacity, 1)),
+            "reward": (np.float32, (self.capacity,)),
+            "non_final": (np.bool_, (self.capacity,)),
+            "next_mask": (np.bool_, (self.capacity, n_actions)),
+        }
+        self.arrays = {}
+        for name, (dtype, shape) in columns.items():
+            file = self.path / f"{name}.npy"
+            if created:
+                self.arrays[name] = np.lib.format.open_memmap(file, mode="w+", dtype=dtype, shape=shape)
+            else:
+                self.arrays[name] = np.lib.format.open_memmap(file, mode="r" if readonly else "r+")
+
+        with warnings.catch_warnings():
+            # Read-only maps become read-only tensors; torch warns about any non-writable array
+            warnings.simplefilter("ignore", UserWarning)
+            self.states = torch.from_numpy(self.arrays["state"])
+            self.next_states = torch.from_numpy(self.arrays["next_state"])
+            self.actions = torch.from_numpy(self.arrays["action"])
+            self.rewards = torch.from_numpy(self.arrays["reward"])
+            self.non_final = torch.from_numpy(self.arrays["non_final"])
+            self.next_masks = torch.from_numpy(self.arrays["next_mask"])
+
+        if created:
+            self.header[:4] = (self.VERSION, capacity, state_dim, n_actions)
+            self.header[4:] = 0
+            self.flush()
+
+    @staticmethod
+    def exists(path):
+        return (Path(path) / "header.bin").exists()
+
+    @property
+    def position(self):
+        return int(self.header[4])
+
+    @position.setter
+    def position(self, value):
+        self.header[4] = value
+
+    @property
+    def size(self):
+        return int(self.header[5])
+
+    @size.setter
+    def size(self, value):
+        self.header[5] = value
+
+    @property
+    def total(self):
+        return int(self.header[6])
+
+    @total.setter
+    def total(self, value):
+        self.header[6] = value
+
+    def push(self, state, action, next_state, reward, next_mask=None):
+        if self.readonly:
+            raise PermissionError(f"Replay store {self.path} was opened read-only")
+        super().push(
+            state.to("cpu", torch.float), action.cpu() if torch.is_tensor(action) else action,
+            None if next_state is None else next_state.to("cpu", torch.float),
+            reward.cpu() if torch.is_tensor(reward) else reward,
+            None if next_mask is None else next_mask.cpu(),
+        )
+
+    def load_state_dict(self, state_dict, total=None):
+        if self.readonly:
+            raise PermissionError(f"Replay store {self.path} was opened read-only")
+        super().load_state_dict(state_dict, total)
+
+    def flush(self):
+        """Writes the mapped pages to disk; the columns go first so the header never runs ahead of them."""
+        if self.readonly:
+            return
+        for array in self.arrays.values():
+            array.flush()
+        self.header.flush()
+
+
+class SegmentTree(object):
+    """Array-backed binary segment tree over `capacity` leaves.
+
+    Updates and queries take whole index/value arrays and walk the tree one
+    level at a time, so a minibatch costs O(log n) NumPy operations rather
+    than a Python loop per sample.
+    """
+    def __init__(self, capacity, operation, neutral):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.operation = operation
+        self.tree = np.full(2 * self.leaves, neutral, dtype=np.float64)
+
+    def update(self, indices, values):
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaves
+        if len(nodes) == 0:
+            return
+        self.tree[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while nodes[0] > 0:
+            self.tree[nodes] = self.operation(self.tree[2 * nodes], self.tree[2 * nodes + 1])
+            nodes = np.unique(nodes // 2)
+
+    def __getitem__(self, indices):
+        return self.tree[np.asarray(indices, dtype=np.int64) + self.leaves]
+
+    def root(self):
+        return self.tree[1]
+
+
+class SumSegmentTree(SegmentTree):
+    def __init__(self, capacity):
+        super().__init__(capacity, np.add, 0.0)
+
+    def find_prefixsum(self, prefixsums):
+        """For each value, the leaf whose cumulative sum first exceeds it."""
+        values = np.asarray(prefixsums, dtype=np.float64).copy()
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves:
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values >= left_sum
+            values = np.where(go_right, values - left_sum, values)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self.leaves
+
+
+class MinSegmentTree(SegmentTree):
+    def __init__(self, capacity):
+        super().__init__(capacity, np.minimum, np.inf)
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """Proportional prioritized replay on top of the ring buffer.
+
+    Transitions are sampled with probability p_i^alpha / sum p^alpha from a
+    sum tree; a min tree gives the largest importance-sampling weight for
+    normalization. beta is annealed linearly to 1 over `beta_steps` samples.
+    """
+    def __init__(self, capacity, state_dim=24, device="cpu", dtype=torch.float, n_actions=10,
+                 alpha=0.6, beta=0.4, beta_steps=100000, eps=1e-6):
+        super().__init__(capacity, state_dim, device, dtype, n_actions)
+        self.alpha = alpha
+        self.beta_start = beta
+        self.beta = beta
+        self.beta_steps = beta_steps
+        self.eps = eps
+        self.sampled = 0
+        self.max_priority = 1.0
+        self.sum_tree = SumSegmentTree(capacity)
+        self.min_tree = MinSegmentTree(capacity)
+
+    def set_priorities(self, indices, priorities):
+        scaled = np.asarray(priorities, dtype=np.float64) ** self.alpha
+        self.sum_tree.update(indices, scaled)
+        self.min_tree.update(indices, scaled)
+
+    def push(self, *args, **kwargs):
+        i = self.position
+        super().push(*args, **kwargs)
+        # New transitions get the highest priority seen so far, so each is replayed at least once
+        self.set_priorities([i], [self.max_priority])
+
+    def sample_weighted(self, batch_size):
+        total = self.sum_tree.root()
+        # Stratified: one uniform draw from each of batch_size equal slices of the total mass
+        prefixsums = (np.arange(batch_size) + np.random.random_sample(batch_size)) * (total / batch_size)
+        indices = self.sum_tree.find_prefixsum(prefixsums)
+        # Rounding can walk past the last stored leaf into an empty one. Stored slots are not
+        # [0, size) after a restore, so fall back to the newest transition rather than clamping.
+        empty = self.sum_tree[indices] <= 0
+        indices[empty] = (self.total - 1) % self.capacity
+
+        probabilities = self.sum_tree[indices] / total
+        min_probability = self.min_tree.root() / total
+        weights = (probabilities / min_probability) ** (-self.beta)
+
+        self.sampled += batch_size
+        fraction = min(self.sampled / self.beta_steps, 1.0)
+        self.beta = self.beta_start + fraction * (1.0 - self.beta_start)
+
+        batch = self.gather(torch.from_numpy(indices).to(self.device))
+        weights = torch.from_numpy(weights).to(self.device, torch.float32)
+        return batch, weights, indices
+
+    def sample(self, batch_size):
+        return self.sample_weighted(batch_size)[0]
+
+    def update_priorities(self, indices, td_errors, pushed=None):
+        """Sets the priorities of sampled transitions from their TD errors.
+
+        `pushed` is `total` at sampling time. Slots overwritten by pushes since then hold
+        new transitions, which keep the max priority they were pushed with.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.eps
+        if pushed is not None and self.total > pushed:
+            fresh = (indices - pushed) % self.capacity >= self.total - pushed
+            indices, priorities = indices[fresh], priorities[fresh]
+            if len(indices) == 0:
+                return
+        self.set_priorities(indices, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+    def load_state_dict(self, state_dict, total=None):
+        super().load_state_dict(state_dict, total)
+        self.sum_tree = SumSegmentTree(self.capacity)
+        self.min_tree = MinSegmentTree(self.capacity)
+        # Priorities are not checkpointed: restored transitions start at the max priority
+        stored = (torch.arange(self.total - self.size, self.total) % self.capacity).numpy()
+        self.set_priorities(stored, np.full(len(stored), self.max_priority))
+
+
+class SoftUpdater(object):
+    """In-place Polyak averaging of a target network towards a source network.
+
+    All parameters are blended with one fused foreach lerp instead of a
+    state_dict round trip. With `every` > 1 the update only runs every K-th
+    step, using the tau that K consecutive updates would have compounded to.
+    """
+    def __init__(self, target, source, tau, every=1):
+        self.target_tensors = self._tensors(target)
+        self.source_tensors = self._tensors(source)
+        self.every = every
+        self.tau = 1 - (1 - tau) ** every
+        self.steps = 0
+
+    def _tensors(self, module):
+        tensors = [p.data for p in module.parameters()]
+        tensors.extend(b for b in module.buffers() if b.is_floating_point())
+        return tensors
 
+    @torch.no_grad()
+    def step(self):
+        self.steps += 1
+        if self.steps % self.every != 0:
+            return False
+        if hasattr(torch, "_foreach_lerp_"):
+            torch._foreach_lerp_(self.target_tensors, self.source_tensors, self.tau)
+        else:
+            for target, source in zip(self.target_tensors, self.source_tensors):
+                target.lerp_(source, self.tau)
+        return True
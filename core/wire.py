@@ -0,0 +1,101 @@
+import json
+import struct
+
+import numpy as np
+
+from core.profiling import PROFILER
+
+# Packed gamestate layout, must match Utils.packGamestate in botmod/src/utils.lua
+PACKED_MAGIC = b"BG"
+PACKED_VERSION = 2
+HEADER = struct.Struct("<2sBBIBbbBHidH")
+CARD = struct.Struct("<BB")
+SHOP_CARD = struct.Struct("<BH")
+HAND_COUNT_OFFSET = struct.calcsize("<2sBBIBbb")
+
+suits = ["Hearts", "Diamonds", "Spades", "Clubs"]
+
+
+def is_packed(data):
+    return data[:2] == PACKED_MAGIC
+
+
+@PROFILER.timed("wire.decode")
+def decode_message(data):
+    """Decodes a datagram from the mod, packed or JSON."""
+    if is_packed(data):
+        return unpack_gamestate(data)
+    return json.loads(data)
+
+
+def pack_gamestate(G):
+    """Packs a Utils.getGamestate-shaped dict the way Utils.packGamestate does."""
+    game = G.get("game") or {}
+    current_round = G.get("current_round") or {}
+    hand = G.get("hand") or []
+    shop_cards = (G.get("shop") or {}).get("cards") or []
+
+    parts = [HEADER.pack(
+        PACKED_MAGIC, PACKED_VERSION, G.get("state") or 0, G.get("action_no") or 0,
+        1 if G.get("waitingForAction") else 0,
+        current_round.get("hands_left") or 0, current_round.get("discards_left") or 0, len(hand),
+        game.get("round") or 0, game.get("dollars") or 0, game.get("chips") or 0, game.get("hands_played") or 0,
+    )]
+    for card in hand:
+        suit = suits.index(card["suit"]) if card.get("suit") in suits else 255
+        parts.append(CARD.pack(card.get("id") or 0, suit))
+    parts.append(bytes([len(shop_cards)]))
+    for card in shop_cards:
+        parts.append(SHOP_CARD.pack(1 if card.get("type") == "Joker" else 0, card.get("cost") or 0))
+    return b"".join(parts)
+
+
+def unpack_gamestate(data):
+    """Rebuilds the subset of the Utils.getGamestate dict carried by the packed format.
+
+    The raw datagram is kept under "packed" so the encoders can read the hand
+    straight from it.
+    """
+    (magic, version, state, action_no, waiting, hands_left, discards_left,
+     hand_count, round, dollars, chips, hands_played) = HEADER.unpack_from(data)
+    if version != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed gamestate version {version}")
+
+    offset = HEADER.size
+    hand = []
+    for _ in range(hand_count):
+        card_id, suit = CARD.unpack_from(data, offset)
+        offset += CARD.size
+        hand.append({"id": card_id, "suit": suits[suit] if suit < len(suits) else None})
+
+    shop_count = data[offset]
+    offset += 1
+    shop_cards = []
+    for _ in range(shop_count):
+        is_joker, cost = SHOP_CARD.unpack_from(data, offset)
+        offset += SHOP_CARD.size
+        shop_cards.append({"type": "Joker" if is_joker else "Other", "cost": cost})
+
+    return {
+        "state": state,
+        "action_no": action_no,
+        "waitingForAction": bool(waiting),
+        "game": {"round": round, "dollars": dollars, "chips": chips, "hands_played": hands_played},
+        "hand": hand,
+        "shop": {"cards": shop_cards},
+        "current_round": {"hands_left": hands_left, "discards_left": discards_left},
+        "packed": bytes(data),
+    }
+
+
+def decode_hand_into(row, data, slots=8):
+    """Writes the (id, suit) pairs of the first `slots` hand cards of a packed gamestate into `row`.
+
+    Raises ValueError on an unknown suit, like the JSON path of encode_games_into.
+    """
+    hand_count = min(data[HAND_COUNT_OFFSET], slots)
+    cards = np.frombuffer(data, dtype=np.uint8, count=2*hand_count, offset=HEADER.size)
+    if hand_count and cards[1::2].max() >= len(suits):
+        raise ValueError("Unknown card suit in packed gamestate")
+    row[:2*hand_count] = cards
+    return hand_count
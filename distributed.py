@@ -0,0 +1,182 @@
+import time
+
+import torch
+import torch.multiprocessing as mp
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+from core.balsim import BalatroSim
+from core.rlutils import ReplayMemory
+from dqn_agent import ActingAgent, DQNAgent
+from env import BasicBalatro, get_available_port
+
+
+class SharedReplayMemory(ReplayMemory):
+    """ReplayMemory whose columns and cursors live in shared memory.
+
+    Any number of actor processes push under one lock; the learner samples
+    without taking it. A sample may rarely catch a row mid-write, which
+    replay learning tolerates.
+    """
+    def __init__(self, capacity, state_dim=24, n_actions=10, lock=None):
+        # position, size, total
+        self.counters = torch.zeros(3, dtype=torch.long).share_memory_()
+        super().__init__(capacity, state_dim, "cpu", torch.float, n_actions)
+        for column in (self.states, self.next_states, self.actions, self.rewards, self.non_final, self.next_masks):
+            column.share_memory_()
+        self.lock = lock if lock is not None else mp.get_context("spawn").Lock()
+
+    @property
+    def position(self):
+        return int(self.counters[0])
+
+    @position.setter
+    def position(self, value):
+        self.counters[0] = value
+
+    @property
+    def size(self):
+        return int(self.counters[1])
+
+    @size.setter
+    def size(self, value):
+        self.counters[1] = value
+
+    @property
+    def total(self):
+        return int(self.counters[2])
+
+    @total.setter
+    def total(self, value):
+        self.counters[2] = value
+
+    def push(self, *args, **kwargs):
+        with self.lock:
+            super().push(*args, **kwargs)
+
+
+class WeightBroadcast:
+    """Versioned shared-memory copy of a network's parameters.
+
+    The single writer bumps the version to odd, copies, then bumps it to even
+    (a seqlock). Readers never lock: they copy and keep the result only if
+    the version was even and unchanged around the copy.
+    """
+    def __init__(self, net):
+        self.buffer = parameters_to_vector(net.parameters()).detach().to("cpu", torch.float).share_memory_()
+        self.version = torch.zeros(1, dtype=torch.long).share_memory_()
+
+    def publish(self, net):
+        self.version += 1
+        self.buffer.copy_(parameters_to_vector(net.parameters()).detach())
+        self.version += 1
+
+    def poll(self, net, last_version):
+        """Loads newer weights into `net`. Returns the version now held by `net`."""
+        version = int(self.version)
+        if version == last_version or version % 2 == 1:
+            return last_version
+        snapshot = self.buffer.clone()
+        if int(self.version) != version:
+            return last_version # Overwritten while copying, try again next poll
+        vector_to_parameters(snapshot.to(next(net.parameters()).device), net.parameters())
+        return version
+
+
+class ActorAgent(ActingAgent):
+    """Acting-only agent: pushes into the shared replay and never trains.
+
+    optimize_model, called by BasicBalatro after each push, instead picks up
+    the latest weights published by the learner.
+    """
+    def __init__(self, replay, weights, inference_backend=None):
+        super().__init__(device="cpu", num_threads=1, inference_backend=inference_backend)
+        self.memory = replay
+        self.weights = weights
+        self.weights_version = self.weights.poll(self.policy_net, -1)
+
+    def memory_push(self, gamestate, selected, action, next_gamestate, next_selected, reward, next_context="Hand"):
+        state, next_state, next_mask = self.encode_transition(gamestate, selected, next_gamestate, next_selected,
+                                                              next_context)
+        self.memory.push(state, action, next_state, reward, next_mask)
+
+    def optimize_model(self):
+        version = self.weights.poll(self.policy_net, self.weights_version)
+        if version != self.weights_version and self.inference is not None:
+            self.inference.refresh()
+        self.weights_version = version
+
+
+def actor_main(actor_id, replay, weights, stop, port=None, seed=None, inference_backend=None):
+    agent = ActorAgent(replay, weights, inference_backend)
+    if port is None:
+        env = BasicBalatro(simulator=BalatroSim(seed=seed), agent=agent)
+    else:
+        env = BasicBalatro(agent=agent, port=port)
+    try:
+        while not stop.is_set():
+            env.run_step()
+    finally:
+        env.close()
+
+
+def learner_main(agent, weights, stop, publish_interval=10, max_updates=None, actors=(), save_interval=100):
+    """Runs gradient updates back to back, publishing weights every `publish_interval` updates.
+
+    A checkpoint follows every `save_interval` updates, stamped with the transitions the
+    actors have pushed, which is what steps_done counts in an acting agent. Raises
+    RuntimeError once any of the `actors` processes has exited.
+    """
+    updates = 0
+    while not stop.is_set() and (max_updates is None or updates < max_updates):
+        dead = [actor for actor in actors if actor.exitcode is not None]
+        if dead:
+            raise RuntimeError(f"{dead[0].name} exited with code {dead[0].exitcode}")
+        if len(agent.memory) < agent.minibatch_size:
+            time.sleep(0.01)
+            continue
+        agent.sample_and_learn()
+        updates += 1
+        if updates % publish_interval == 0:
+            weights.publish(agent.policy_net)
+        if save_interval is not None and updates % save_interval == 0:
+            agent.steps_done = agent.memory.total
+            agent.save_checkpoint()
+    return updates
+
+
+def run_actor_learner(num_actors, simulated=True, device=None, publish_interval=10, max_updates=None,
+                      replay_size=100000, inference_backend=None):
+    """Trains with `num_actors` actor processes feeding one learner in this process.
+
+    inference_backend selects the core.inference engine the actors act through.
+    """
+    ctx = mp.get_context("spawn")
+    replay = SharedReplayMemory(replay_size, lock=ctx.Lock())
+    agent = DQNAgent(device=device, memory=replay)
+    weights = WeightBroadcast(agent.policy_net)
+    weights.publish(agent.policy_net)
+    stop = ctx.Event()
+
+    actors = []
+    port = None
+    for actor_id in range(num_actors):
+        if not simulated:
+            port = get_available_port() if port is None else get_available_port(start=port + 1)
+        actor = ctx.Process(target=actor_main, name=f"actor-{actor_id}", daemon=True,
+                            args=(actor_id, replay, weights, stop, port, actor_id, inference_backend))
+        actor.start()
+        actors.append(actor)
+
+    try:
+        learner_main(agent, weights, stop, publish_interval, max_updates, actors)
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join(timeout=10)
+            if actor.is_alive():
+                actor.terminate()
+    return agent
+
+
+if __name__ == '__main__':
+    run_actor_learner(num_actors=max(mp.cpu_count() - 1, 1))
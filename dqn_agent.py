@@ -1,5 +1,7 @@
 
+import copy
 import random
+import threading
 
 import numpy as np
 import pandas as pd
@@ -9,36 +11,254 @@ import math
 from collections import deque
 from pathlib import Path
 from core.encoders import *
-from core.rlutils import ReplayMemory
+from core.rlutils import ReplayMemory, PrioritizedReplayMemory, MmapReplayMemory, SoftUpdater, TransitionBatch
 from core.balnetworks import SimpleDQN
-from core.rlutils import Transition
+from core.checkpoint import CheckpointWriter, load_replay
+from core.dataset import TransitionRecorder
+from core.inference import InferenceEngine
+from core.learner import BackgroundLearner
+from core.masks import ActionMasker, PLAY, DISCARD, SUBSET_FLAGS, SUBSET_SELECTIONS, HAND_SLOTS, legal_subsets
+from core.profiling import PROFILER
+
+class ActingAgent:
+    """Picks actions with the policy network, epsilon-greedy over the legal actions.
+
+    Holds only what acting needs: the network, an optional core.inference
+    engine and the action masker. Subclasses define what the env's
+    memory_push and optimize_model calls do: DQNAgent adds the replay memory,
+    the optimizer and checkpoints, actor processes push into a shared replay
+    and evaluation drops them.
+    """
+    __EPSILON_START = 0.9
+    __EPSILON_END = 0.05
+    __EPSILON_DECAY = 1000
+
+    # Q-value written over illegal actions when acting
+    __ANTI_VALUE = -100
+    def __init__(self, device=None, dtype=torch.float32, num_threads=None, inference_backend=None,
+                 refresh_every=100):
+        """
+        device: torch device for the policy network, defaults to CUDA when available.
+        dtype: parameter and state precision, torch.float32 or torch.bfloat16.
+        num_threads: intra-op CPU threads; leave None to keep torch's default.
+        inference_backend: act through a core.inference engine ("int8" or "compile") instead of
+            the eager policy network; float32 CPU only.
+        refresh_every: gradient steps between rebuilds of the inference engine's snapshot.
+        """
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device(device)
+        self.dtype = dtype
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        self.policy_net = SimpleDQN(24, 10, device=self.device, dtype=self.dtype)
+        self.inference = None
+        if inference_backend is not None:
+            self.inference = InferenceEngine(self.policy_net, inference_backend, refresh_every=refresh_every)
+        # Network used to pick actions; training always goes through policy_net
+        self.act_net = self.inference if self.inference is not None else self.policy_net
+        self.masker = ActionMasker(self.device)
+
+        self.steps_done = 0
+        self.sync_steps = 0
+        self.epsilon = self.__EPSILON_START
+        # Epsilon-greedy exploration; evaluation turns it off to act greedily
+        self.explore = True
+        self.epsilon_history = []
+
+    def load_policy(self, state_dict):
+        """Loads policy network weights, e.g. a checkpoint's policy_net_state_dict, and acts with them."""
+        self.policy_net.load_state_dict(state_dict)
+        if self.inference is not None:
+            self.inference.refresh()
+
+    def encode_transition(self, gamestate, selected, next_gamestate, next_selected, next_context="Hand"):
+        """Encoded state, next state (None when final) and next-state action mask of a transition."""
+        next_mask = None
+        if(next_gamestate != None):
+            encoded = torch.from_numpy(
+                encode_games([gamestate, next_gamestate], [selected, next_selected])
+            ).to(self.device, self.dtype)
+            state, next_state = encoded[0], encoded[1]
+            next_mask = self.masker.mask(next_gamestate, next_selected, next_context)
+        else:
+            state = encode_game(gamestate, selected, self.device, self.dtype)
+            next_state = None
+        return state, next_state, next_mask
+
+    def epsilon_threshold(self):
+        """Probability of a random action at the current step; zero once exploration is switched off."""
+        if not self.explore:
+            return 0.0
+        return self.__EPSILON_END + (self.__EPSILON_START - self.__EPSILON_END) * \
+        math.exp(-1. * self.steps_done / self.__EPSILON_DECAY)
+
+    @PROFILER.timed("agent.select")
+    def select_action(self, game_state, selected, context):
+
+        eps_threshold = self.epsilon_threshold()
+        
+        self.steps_done += 1
+        self.sync_steps += 1
+        action = None
+        with torch.inference_mode():
+            if( random.random() < eps_threshold ):
+                action = self.get_random_action(game_state, selected, context)  
+                print("[RANDOM]")
+            else:
+                action = self.get_policy_action(game_state, selected, context)
+                print("[POLICY]")
 
-class DQNAgent:
-    __DEVICE = "cuda"
+        return action
+
+    @PROFILER.timed("agent.select")
+    def select_actions(self, game_states, selections, context):
+        """Batched select_action: one epsilon draw per row and one forward pass for all greedy rows."""
+        eps_threshold = self.epsilon_threshold()
+
+        count = len(game_states)
+        self.steps_done += count
+        self.sync_steps += count
+
+        with torch.inference_mode():
+            actions = torch.empty((count, 1), dtype=torch.long, device=self.device)
+            explore = [random.random() < eps_threshold for _ in range(count)]
+            greedy = [i for i in range(count) if not explore[i]]
+            if greedy:
+                actions[greedy] = self.get_policy_actions(
+                    [game_states[i] for i in greedy], [selections[i] for i in greedy], context
+                )
+            for i in range(count):
+                if explore[i]:
+                    actions[i] = self.get_random_action(game_states[i], selections[i], context).view(-1)
+        return actions
+
+
+    @PROFILER.timed("agent.select")
+    def select_subset_action(self, game_state):
+        """Picks a whole play or discard at once for the subset action mode.
+
+        Every legal (subset, play/discard) candidate is scored in one forward pass
+        as Q(state with the subset selected)[PLAY or DISCARD]. Returns the
+        1-based selection and the (1, 1) action tensor, or None when no subset is legal.
+        """
+        legal = legal_subsets(game_state)
+        if len(legal) == 0:
+            return None
+        eps_threshold = self.epsilon_threshold()
+        can_discard = game_state["current_round"]["discards_left"] > 0
+
+        with torch.inference_mode():
+            if( random.random() < eps_threshold ):
+                subset = random.choice(legal)
+                action = DISCARD if can_discard and random.random() < 0.5 else PLAY
+                print("[RANDOM]")
+            else:
+                subset, action = self.get_subset_policy_action(game_state, legal, can_discard)
+                print("[POLICY]")
+        # Count the card picks this stands for too, so epsilon decays at the card mode's pace
+        decisions = len(SUBSET_SELECTIONS[subset]) + 1
+        self.steps_done += decisions
+        self.sync_steps += decisions
+        return SUBSET_SELECTIONS[subset], torch.tensor([[action]], device=self.device)
+
+    def get_subset_policy_action(self, G, legal, can_discard):
+        states = np.repeat(encode_games([G], [[]]), len(legal), axis=0)
+        states[:, 2*HAND_SLOTS:] = SUBSET_FLAGS[legal]
+        output = self.act_net(torch.from_numpy(states).to(self.device, self.dtype))
+        scores = output[:, PLAY:DISCARD+1].clone()
+        if not can_discard:
+            scores[:, 1] = float("-inf")
+        best = int(torch.argmax(scores))
+        return legal[best // 2], PLAY + best % 2
+
+    def leave_correct_actions(self, output, G, selected, context):
+        output.masked_fill_(self.masker.mask(G, selected, context), self.__ANTI_VALUE)
+
+    def get_random_action(self, G, selected, context):
+        output = torch.randint(-1, 10, (10,), device=self.device)
+        self.leave_correct_actions(output, G, selected, context)
+        return torch.argmax(output).view(1,1)
+       
+    def get_policy_action(self, G, selected, context):
+        state_vector = encode_game(G, selected, self.device, self.dtype)
+        output = self.act_net(state_vector.unsqueeze(0))[0]
+        self.leave_correct_actions(output,G, selected, context)
+        return torch.argmax(output).view(1,1)
+
+    def get_policy_actions(self, game_states, selections, context):
+        state_batch = torch.from_numpy(encode_games(game_states, selections)).to(self.device, self.dtype)
+        output = self.act_net(state_batch)
+        output.masked_fill_(self.masker.masks(game_states, selections, context), self.__ANTI_VALUE)
+        return torch.argmax(output, dim=1, keepdim=True)
+
+
+class DQNAgent(ActingAgent):
     __CHECKPOINT_PATH = "weights/checkpoint"
     __CHECKPOINT_STEPS = 2500
+    __CHECKPOINT_KEEP = 5
 
     __REPLAY_SIZE = 2500
     __LEARNING_RATE = 1e-4
 
-    __EPSILON_START = 0.9
-    __EPSILON_END = 0.05
-    __EPSILON_DECAY = 1000
-
     __MINIBATCH_SIZE = 256
     __SYNC_RATE = 100
     __SAVE_RATE = 100
 
     __DISCOUNT_FACTOR =  0.99
     __TAU = 0.005
-    def __init__(self):
-        self.policy_net = SimpleDQN(24, 10).to(self.__DEVICE)
-        self.target_net = SimpleDQN(24, 10).to(self.__DEVICE)
+    __TARGET_UPDATE_EVERY = 1
+    def __init__(self, device=None, dtype=torch.float32, num_threads=None, prioritized_replay=False,
+                 replay_path=None, replay_capacity=None, record_path=None,
+                 inference_backend=None, replay_ratio=None, memory=None):
+        """
+        device, dtype, num_threads and inference_backend: see ActingAgent; device also holds the replay memory.
+        prioritized_replay: sample the replay memory by TD error instead of uniformly.
+        replay_path: directory of a memory-mapped replay store, created or reopened there.
+        replay_capacity: replay size, defaults to __REPLAY_SIZE (or the size of an existing store).
+        record_path: directory to also record every transition to, for offline training with core.dataset.
+        replay_ratio: train on a core.learner background thread at this many updates per transition,
+            instead of one update inline in every optimize_model call.
+        memory: replay memory to train from instead of building one, e.g. a distributed.SharedReplayMemory.
+        """
+        super().__init__(device, dtype, num_threads, inference_backend, refresh_every=self.__SYNC_RATE)
+        self.minibatch_size = self.__MINIBATCH_SIZE
+
+        self.target_net = SimpleDQN(24, 10, device=self.device, dtype=self.dtype)
         self.target_net.load_state_dict(self.policy_net.state_dict())
+        self.target_updater = SoftUpdater(self.target_net, self.policy_net, self.__TAU, every=self.__TARGET_UPDATE_EVERY)
 
 
         self.optimizer = optim.AdamW(self.policy_net.parameters(), lr=self.__LEARNING_RATE, amsgrad=True)
-        self.memory = ReplayMemory(capacity=self.__REPLAY_SIZE)
+        if memory is not None:
+            self.memory = memory
+        elif replay_path is not None:
+            if prioritized_replay:
+                raise ValueError("Prioritized replay is not supported with a memory-mapped replay store")
+            if replay_capacity is None and not MmapReplayMemory.exists(replay_path):
+                replay_capacity = self.__REPLAY_SIZE
+            self.memory = MmapReplayMemory(replay_path, capacity=replay_capacity, state_dim=24)
+        else:
+            memory_class = PrioritizedReplayMemory if prioritized_replay else ReplayMemory
+            self.memory = memory_class(capacity=replay_capacity or self.__REPLAY_SIZE, state_dim=24,
+                                       device=self.device, dtype=self.dtype)
+        self.checkpoint_writer = CheckpointWriter(self.__CHECKPOINT_PATH, keep=self.__CHECKPOINT_KEEP)
+        self.recorder = TransitionRecorder(record_path) if record_path is not None else None
+        # Guards the replay memory when a background learner samples it while the env pushes
+        self.memory_lock = threading.Lock()
+
+        self.learner = None
+        if replay_ratio is not None:
+            if self.inference is not None:
+                if inference_backend == "compile":
+                    raise ValueError("The compile backend reads the live weights; use int8 with replay_ratio")
+                # Only the learner thread may snapshot the policy network
+                self.inference.refresh_every = float("inf")
+            else:
+                self.act_net = self.snapshot_policy()
+            self.learner = BackgroundLearner(self, replay_ratio, min_size=self.minibatch_size,
+                                             publish_every=self.__SYNC_RATE, save_every=self.__SAVE_RATE)
 
 
         self.last_state = None
@@ -46,115 +266,158 @@ class DQNAgent:
         self.last_action = None
         
         self.last_score = 0
-        self.steps_done = 0
-        self.sync_steps = 0
         self.reward_list = []
-        self.epsilon = self.__EPSILON_START
-        self.epsilon_history = []
+        self.saved_at = 0
 
 
         self.loss_fn = torch.nn.MSELoss()
+    @PROFILER.timed("agent.checkpoint")
     def save_checkpoint(self):
+        # Weights are copied here; the files and the replay delta are written in the background
         checkpoint = {
             "steps_done": self.steps_done,
             "policy_net_state_dict": self.policy_net.state_dict(),
             "target_net_state_dict": self.target_net.state_dict(),
             "optimizer_state_dict": self.optimizer.state_dict(),
-            "replay_memory": list(self.memory.memory),
         }
-        savepath = f"{self.__CHECKPOINT_PATH}_{self.steps_done}.pth"
-        Path(savepath).parent.mkdir(parents=True, exist_ok=True)
-        torch.save(checkpoint, savepath)
-        print(f"Checkpoint saved at step {self.steps_done} to {savepath}")
+        self.checkpoint_writer.submit(self.steps_done, checkpoint, self.memory, lock=self.memory_lock)
+
+    def load_checkpoint(self, checkpoint_path, resume=False):
+        """Restores weights, optimizer and replay from `checkpoint_path`.
 
-    def load_checkpoint(self, checkpoint_path):
+        With `resume`, training continues that run: later checkpoints go next to it, and the
+        checkpoints and replay segments it had written after this one are dropped.
+        """
         checkpoint = torch.load(
-            checkpoint_path, map_location=self.__DEVICE, weights_only=False
+            checkpoint_path, map_location=self.device, weights_only=False
         )
         self.steps_done = checkpoint.get("steps_done", 0)
+        self.saved_at = self.steps_done
         self.policy_net.load_state_dict(checkpoint["policy_net_state_dict"])
         self.target_net.load_state_dict(checkpoint["target_net_state_dict"])
         self.optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
-        replay_memory_list = checkpoint.get("replay_memory", [])
-        self.memory.memory = deque(replay_memory_list, maxlen=self.memory.memory.maxlen)
-        print(f"Checkpoint loaded from {checkpoint_path}")
-
-
-    def select_action(self, game_state, selected, context):
-
-        eps_threshold = self.__EPSILON_END + (self.__EPSILON_START - self.__EPSILON_END) * \
-        math.exp(-1. * self.steps_done / self.__EPSILON_DECAY)
-        
-        self.steps_done += 1
-        self.sync_steps += 1
-        action = None
-        if( random.random() < eps_threshold ):
-            action = self.get_random_action(game_state, selected, context)  
-            print("[RANDOM]")
+        self.publish_policy()
+        if "replay_path" in checkpoint:
+            # A memory-mapped replay store persists on its own and is opened by __init__
+            if Path(checkpoint["replay_path"]) != getattr(self.memory, "path", None):
+                print(f"Checkpoint replay lives in {checkpoint['replay_path']}, open it with replay_path")
+        elif "replay_total" in checkpoint:
+            prefix = Path(checkpoint_path).parent / checkpoint["replay_prefix"]
+            total = checkpoint["replay_total"]
+            run = checkpoint.get("replay_run")
+            self.memory.load_state_dict(load_replay(prefix, total, self.memory.capacity, run), total=total)
+            if resume:
+                self.checkpoint_writer.resume(total, prefix, run)
         else:
-            with torch.no_grad():
-                action = self.get_policy_action(game_state, selected, context)
-                print("[POLICY]")
-
-        return action
-
-    
-
-    def memory_push(self, gamestate, selected, action, next_gamestate, next_selected, reward):
-        state = encode_game(gamestate,selected).unsqueeze(0)
-        next_state = None
-        if(next_gamestate != None):
-            next_state = encode_game(next_gamestate, next_selected).unsqueeze(0)
+            self.memory.load_state_dict(checkpoint.get("replay_memory", []))
+        print(f"Checkpoint loaded from {checkpoint_path}")
 
-        reward = torch.tensor([reward], device=self.__DEVICE)
 
-        self.memory.push(state, action, next_state, reward)
+    def close(self):
+        """Stops the background learner after its current update, then finishes pending checkpoint and recorder writes."""
+        if self.learner is not None:
+            self.learner.stop()
+            self.learner = None
+        self.checkpoint_writer.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    @PROFILER.timed("agent.push")
+    def memory_push(self, gamestate, selected, action, next_gamestate, next_selected, reward, next_context="Hand"):
+        state, next_state, next_mask = self.encode_transition(gamestate, selected, next_gamestate, next_selected,
+                                                              next_context)
+        with self.memory_lock:
+            self.memory.push(state, action, next_state, reward, next_mask)
+        if self.recorder is not None:
+            self.recorder.record(state, action, next_state, reward, next_mask, gamestate, selected,
+                                 next_gamestate, next_selected)
+        if self.learner is not None:
+            self.learner.transition_pushed()
         
 
 
+    @PROFILER.timed("agent.optimize")
     def optimize_model(self):
-        if len(self.memory) < self.__MINIBATCH_SIZE:
+        if self.learner is not None:
+            return # Updates run on the background learner
+        if len(self.memory) < self.minibatch_size:
             return
         
-        transitions = self.memory.sample(self.__MINIBATCH_SIZE)
-        batch = Transition(*zip(*transitions))
-        non_final_mask = torch.tensor(
-            tuple(map(lambda s: s is not None, batch.next_state)),
-            device=self.__DEVICE,
-            dtype=torch.bool,
-        )
-        non_final_next_states = torch.cat(
-            [s for s in batch.next_state if s is not None]
-        )
-        state_batch = torch.cat(batch.state)
-        action_batch = torch.cat(batch.action)
-        reward_batch = torch.cat(batch.reward)
-        state_action_values = self.policy_net(state_batch).gather(1, action_batch)
+        self.sample_and_learn()
+
+        # steps_done may advance by more than one per call (batched or subset decisions)
+        if(self.steps_done - self.saved_at >= self.__SAVE_RATE):
+            self.saved_at = self.steps_done
+            self.save_checkpoint()
+
+    def sample_and_learn(self):
+        with self.memory_lock:
+            batch, weights, indices = self.memory.sample_weighted(self.minibatch_size)
+            pushed = self.memory.total
+        self.learn_batch(batch, weights, indices, pushed)
+
+    def snapshot_policy(self):
+        """Gradient-free copy of the policy network for acting."""
+        net = copy.deepcopy(self.policy_net)
+        for parameter in net.parameters():
+            parameter.grad = None
+        return net.requires_grad_(False)
+
+    def publish_policy(self):
+        """Brings the acting network up to date with the policy network."""
+        if self.inference is not None:
+            self.inference.refresh()
+        elif self.learner is not None:
+            # Swapped by one assignment: acting picks up either the old or the new copy, never a mix
+            self.act_net = self.snapshot_policy()
+
+    def learn_batch(self, batch, weights=None, indices=None, pushed=None):
+        """One gradient step on a TransitionBatch, from the replay memory or a recorded dataset.
+
+        `pushed` is the replay's push count when `indices` were sampled; a background learner
+        passes it so priorities are not written over slots the actor has refilled since.
+        """
+        if batch.state.device != self.device:
+            # A replay memory shared between processes lives on the CPU
+            batch = TransitionBatch(*(column.to(self.device, non_blocking=True) for column in batch))
+            if weights is not None:
+                weights = weights.to(self.device)
+        state_action_values = self.policy_net(batch.state).gather(1, batch.action)
 
-        next_state_values = torch.zeros(self.__MINIBATCH_SIZE, device=self.__DEVICE)
-     
         with torch.no_grad():
-            next_state_values[non_final_mask] = self.target_net(non_final_next_states).max(1).values
+            # Final transitions store a zero next state; their value is masked out here
+            next_state_values = self.masked_max(self.target_net(batch.next_state), batch.next_mask) * batch.non_final
        
-        expected_state_action_values = (next_state_values * self.__DISCOUNT_FACTOR) + reward_batch
-
-        criterion = torch.nn.SmoothL1Loss()
-        loss = criterion(state_action_values, expected_state_action_values.unsqueeze(1))
+        # Targets and loss in float32, whatever the network dtype; rewards are stored in float32
+        expected_state_action_values = (next_state_values.float() * self.__DISCOUNT_FACTOR) + batch.reward.float()
+
+        criterion = torch.nn.SmoothL1Loss(reduction="none")
+        elementwise_loss = criterion(state_action_values.float(),
+                                     expected_state_action_values.unsqueeze(1)).squeeze(1)
+        if weights is None:
+            loss = elementwise_loss.mean()
+        else:
+            # Importance-sampling correction for prioritized replay
+            loss = (elementwise_loss * weights).mean()
+            td_errors = (expected_state_action_values - state_action_values.squeeze(1)).detach()
+            with self.memory_lock:
+                self.memory.update_priorities(indices, td_errors.float().cpu().numpy(), pushed)
 
         self.optimizer.zero_grad()
         loss.backward()
         torch.nn.utils.clip_grad_value_(self.policy_net.parameters(), 100)
         self.optimizer.step()
 
-        target_net_state_dict = self.target_net.state_dict()
-        policy_net_state_dict = self.policy_net.state_dict()
-        for key in policy_net_state_dict:
-            target_net_state_dict[key] = policy_net_state_dict[key]*self.__TAU + target_net_state_dict[key]*(1-self.__TAU)
-        self.target_net.load_state_dict(target_net_state_dict)
-
-        if(self.steps_done % self.__SAVE_RATE == 0):
-            self.save_checkpoint()
+        with PROFILER.timer("agent.target_update"):
+            self.target_updater.step()
+        if self.inference is not None:
+            self.inference.updated()
             
+    def masked_max(self, q_values, masks):
+        """Row-wise max over the legal actions; rows with no legal action fall back to the plain max."""
+        values = q_values.masked_fill(masks, float("-inf")).max(1).values
+        return torch.where(torch.isinf(values), q_values.max(1).values, values)
+
     def optimize(self, mini_batch):
         current_q_list = []
         target_q_list = []
@@ -181,55 +444,3 @@ class DQNAgent:
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
-
-    def leave_correct_actions(self, output, G, selected, context):
-        anti_value = -100
-
-        if(context=="Hand"):
-            
-            if(len(selected) == 5):
-                no_select_mask = torch.tensor([
-                True, True, True, True, 
-                True, True, True, True,  
-                False, False
-            ])
-                output[no_select_mask] = anti_value
-            if(len(selected) == 0):
-                no_select_mask = torch.tensor([
-                False, False, False, False, 
-                False, False, False, False, 
-                True, True, 
-            ])
-                output[no_select_mask] = anti_value
-            if(G["current_round"]["discards_left"] == 0):
-                only_play_mask = torch.tensor([
-                    False, False, False, False, 
-                    False, False, False, False, 
-                    False, True, 
-                ])
-                output[only_play_mask] = anti_value
-
-
-            selected_mask_array=[]
-            for i in range(1,8+1):
-                if( i in selected or (i+1 > len(G["hand"]) ) ):
-                    selected_mask_array.append(True)
-                else:
-                    selected_mask_array.append(False)
-            selected_mask_array.extend([False, False])
-            selected_mask = torch.tensor(selected_mask_array)
-            output[selected_mask] = anti_value
-
-        
-        
-    def get_random_action(self, G, selected, context):
-        output = torch.randint(-1, 10, (10,)).cuda()
-        self.leave_correct_actions(output, G, selected, context)
-        return torch.argmax(output).view(1,1).cuda()
-       
-    def get_policy_action(self, G, selected, context):
-        state_vector = encode_game(G, selected)
-        output = self.policy_net(state_vector)
-        self.leave_correct_actions(output,G, selected, context)
-        return torch.argmax(output).view(1,1)
-    
\ No newline at end of file
@@ -8,9 +8,9 @@ from enum import Enum
 #from gamestates import cache_state
 import subprocess
 import random
-import multiprocessing
-import socket
-from collections import Counter
+from core.wire import decode_message
+from core.profiling import PROFILER
+from core.hands import hand_reward
 def is_port_available(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         try:
@@ -19,10 +19,80 @@ def is_port_available(port):
         except socket.error:
             return False
         
-def get_available_port():
-    with multiprocessing.Pool(processes=1) as pool:
-        available_port = next(port for port in range(12346, 65536) if pool.apply(is_port_available, (port,)))
-    return available_port
+def get_available_port(start=None):
+    """Returns a free port for a game instance. Without `start` the OS assigns one."""
+    if start is None:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+    return next(port for port in range(start, 65536) if is_port_available(port))
+
+def balatro_command(port, verbose=False):
+    """Builds the command line that launches the game (or fakemod.py) listening on `port`."""
+    # Get Balatro executable path from environment variable
+    balatro_exec_path = os.getenv('BALATRO_EXEC_PATH')
+    
+    if not balatro_exec_path:
+        # Fallback to default paths based on platform
+        if platform.system() == "Windows":
+            balatro_exec_path = r"E:\Program Files\Steam\steamapps\common\Balatro\Balatro.exe"
+        elif platform.system() == "Linux":
+            balatro_exec_path = os.path.expanduser("~/.steam/steam/steamapps/common/Balatro/Balatro")
+        elif platform.system() == "Darwin":  # macOS
+            balatro_exec_path = os.path.expanduser("~/Library/Application Support/Steam/steamapps/common/Balatro/Balatro.app/Contents/MacOS/Balatro")
+        else:
+            raise Exception(f"Unsupported platform: {platform.system()}")
+    
+    # Check if the executable exists
+    if not os.path.exists(balatro_exec_path):
+        raise FileNotFoundError(f"Balatro executable not found at: {balatro_exec_path}")
+    
+    # Build the command
+    cmd = [balatro_exec_path, str(port)]
+    # A Python script (fakemod.py) stands in for the game: no display needed
+    stand_in = balatro_exec_path.endswith(".py")
+    if stand_in:
+        cmd = [sys.executable] + cmd
+    
+    # On Linux, check if we need to use xvfb for headless operation
+    if platform.system() == "Linux" and not stand_in:
+        # Check if DISPLAY is set, if not, use xvfb
+        if not os.getenv('DISPLAY'):
+            if verbose:
+                print("No DISPLAY environment variable found. Using xvfb for headless operation.")
+            # Check if xvfb-run is available
+            try:
+                subprocess.run(['which', 'xvfb-run'], check=True, capture_output=True)
+                cmd = ['xvfb-run', '-a', '-s', '-screen 0 1024x768x24'] + cmd
+            except subprocess.CalledProcessError:
+                print("Warning: xvfb-run not found. Install xvfb package for headless operation.")
+                print("On Ubuntu/Debian: sudo apt-get install xvfb")
+                print("On RHEL/CentOS: sudo yum install xorg-x11-server-Xvfb")
+    return cmd
+
+# Mod options for the fastest game, see botmod/config.lua. The game starts at the 8/60 s frame time known
+# to be stable and lets adaptive_dt push further.
+TURBO_CONFIG = {
+    "dt": 8.0/60.0,
+    "adaptive_dt": True,
+    "instant_move": True,
+    "disable_card_eval_status_text": True,
+    "skip_animations": True,
+    "frame_ratio": 0,
+}
+
+# Gamestate fields BasicBalatro, evaluate.EvalBalatro and the encoders read, for the FIELDS projection of the mod
+AGENT_FIELDS = ["hand", "game.round", "game.dollars", "game.chips", "game.hands_played", "current_round",
+                "shop.cards"]
+
+def config_command(options):
+    """Formats a dict of mod options as a CONFIG command."""
+    pairs = []
+    for key, value in options.items():
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        pairs.append(f"{key}={value}")
+    return "CONFIG|" + ",".join(pairs)
 
 class State(Enum): # these enums are lifted from the game code so DO NOT CHANGE THEM
     SELECTING_HAND = 1
@@ -74,9 +144,24 @@ class BalatroEnvBase:
         self,
         verbose = False,
         policy_states = [],
+        simulator = None,
+        port = None,
+        subscribe = False,
+        event_timeout = 5.0,
+        wire_format = "json",
+        instance = None,
+        game_config = None,
+        fields = None,
     ):
         self.G = None
-        self.port = get_available_port()
+        self.simulator = simulator
+        # A warm game handed out by an InstancePool: already running, restarted by the pool's supervisor
+        self.instance = instance
+        if instance is not None:
+            port = instance.port
+        if port is None and simulator is None:
+            port = get_available_port()
+        self.port = port
         self.addr = ("localhost", self.port)
         self.balatro_instance = None
         self.sock = None
@@ -84,6 +169,30 @@ class BalatroEnvBase:
         self.policy_states = policy_states
         self.first_run = True
 
+        # Seconds to wait for the game to settle after each step, and after a BUSY status.
+        # An in-process simulator answers immediately, so it needs neither.
+        self.step_delay = 0.7 if simulator is None else 0
+        self.busy_delay = 1 if simulator is None else 0
+
+        # Subscribe mode: the mod pushes the gamestate as soon as it becomes READY,
+        # so run_step blocks on that datagram instead of sleeping and polling STATUS.
+        self.subscribe = subscribe and simulator is None
+        self.event_timeout = event_timeout
+        self.pushed_state = None
+        self.last_action_no = -1
+        # Launch generation of the pooled instance our FORMAT, FIELDS, CONFIG and SUBSCRIBE were sent to
+        self.instance_generation = None
+
+        # "json" keeps the full, human-readable gamestate; "packed" asks the mod for the
+        # compact binary layout of core.wire, which only carries what the agent consumes.
+        self.wire_format = wire_format
+
+        # Mod options sent with CONFIG on every (re)connect, e.g. TURBO_CONFIG; None leaves botmod/config.lua alone
+        self.game_config = dict(game_config) if game_config else {}
+        # Gamestate fields to ask the mod for, e.g. AGENT_FIELDS; None receives the full gamestate.
+        # state, action_no and waitingForAction always come along.
+        self.fields = fields
+
         # State handlers are now expected to be populated by subclasses
         self.state_handlers = {}
         #init state handlers for non-interactive states
@@ -91,7 +200,12 @@ class BalatroEnvBase:
         self.state_handlers[State.DRAW_TO_HAND] = self.pass_action
         self.state_handlers[State.NEW_ROUND] = self.pass_action
         self.connected = False
-        self.start_balatro_instance()
+        if self.instance is not None:
+            self.connect_socket()
+        elif self.simulator is None:
+            self.start_balatro_instance()
+        else:
+            self.connected = True
 
     def pass_action(self, state):
         """
@@ -100,22 +214,33 @@ class BalatroEnvBase:
         """
         return [Actions.PASS]
 
+    @PROFILER.timed("env.status")
     def get_status(self):
         if not self.connected:
             raise ConnectionError("Not connected to Balatro instance.")
-        self.sock.sendto(bytes("STATUS", "utf-8"), self.addr)
-        starttime = time.time()
-        wait_sec = 0.5
-        data = None
-        while starttime + wait_sec > time.time():
-            try:
-                data, _ = self.sock.recvfrom(65536)
-                break
-            except socket.timeout:
-                time.sleep(0.1)
-        if not data:
-            raise ConnectionError("No response from Balatro instance.")
-        data = json.loads(data)
+        if self.simulator is not None:
+            data = self.simulator.handle("STATUS")
+        else:
+            self.sock.sendto(bytes("STATUS", "utf-8"), self.addr)
+            starttime = time.time()
+            wait_sec = 0.5
+            data = None
+            while starttime + wait_sec > time.time():
+                try:
+                    data, _ = self.sock.recvfrom(65536)
+                    data = decode_message(data)
+                    response = data.get('response')
+                    if isinstance(response, dict) and ('status' in response or 'error' in response):
+                        break
+                    if 'state' in data:
+                        # A gamestate pushed to a subscriber arrived before the STATUS reply
+                        self.pushed_state = data
+                    # Anything else acknowledges an earlier command (action, FORMAT, SUBSCRIBE, CONFIG, FIELDS)
+                    data = None
+                except socket.timeout:
+                    time.sleep(0.1)
+            if not data:
+                raise ConnectionError("No response from Balatro instance.")
         #print(f"Received data: {data}") if self.verbose else None
         response = data.get('response')
         if response:
@@ -128,50 +253,65 @@ class BalatroEnvBase:
         
         raise ConnectionError("Invalid response from Balatro instance. Expected 'status' field.")
 
+    @PROFILER.timed("env.state")
     def get_state(self):
         if not self.connected:
             raise ConnectionError("Not connected to Balatro instance.")
+        if self.simulator is not None:
+            return self.simulator.handle("GET_STATE")
 
-        self.sock.sendto(bytes("GET_STATE", "utf-8"), self.addr)
-        data, _ = self.sock.recvfrom(65536)
-        return json.loads(data)
+        # A lost request or reply is re-sent after a short wait rather than stalling on the socket timeout
+        wait_sec = 0.5
+        try:
+            for attempt in range(5):
+                if attempt:
+                    PROFILER.count("env.state.retry")
+                self.sock.sendto(bytes("GET_STATE", "utf-8"), self.addr)
+                deadline = time.monotonic() + wait_sec
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.sock.settimeout(remaining)
+                    try:
+                        data, _ = self.sock.recvfrom(65536)
+                    except socket.timeout:
+                        break
+                    data = decode_message(data)
+                    # A gamestate pushed to a subscriber is as current as the reply; acknowledgements are skipped
+                    if 'state' in data:
+                        return data
+        finally:
+            self.sock.settimeout(10)
+        raise ConnectionError("No gamestate from Balatro instance.")
+
+    @PROFILER.timed("env.wait_push")
+    def wait_for_state(self):
+        """Blocks until the mod pushes a new READY gamestate. Returns None after event_timeout."""
+        if self.pushed_state is not None:
+            data, self.pushed_state = self.pushed_state, None
+            if data.get('action_no', 0) > self.last_action_no:
+                return data
+
+        deadline = time.monotonic() + self.event_timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.sock.settimeout(remaining)
+                data, _ = self.sock.recvfrom(65536)
+                data = decode_message(data)
+                # Skip command acknowledgements and pushes we have already acted on
+                if 'state' in data and data.get('action_no', 0) > self.last_action_no:
+                    return data
+        except socket.timeout:
+            return None
+        finally:
+            self.sock.settimeout(10)
 
     def start_balatro_instance(self):
-        # Get Balatro executable path from environment variable
-        balatro_exec_path = os.getenv('BALATRO_EXEC_PATH')
-        
-        if not balatro_exec_path:
-            # Fallback to default paths based on platform
-            if platform.system() == "Windows":
-                balatro_exec_path = r"E:\Program Files\Steam\steamapps\common\Balatro\Balatro.exe"
-            elif platform.system() == "Linux":
-                balatro_exec_path = os.path.expanduser("~/.steam/steam/steamapps/common/Balatro/Balatro")
-            elif platform.system() == "Darwin":  # macOS
-                balatro_exec_path = os.path.expanduser("~/Library/Application Support/Steam/steamapps/common/Balatro/Balatro.app/Contents/MacOS/Balatro")
-            else:
-                raise Exception(f"Unsupported platform: {platform.system()}")
-        
-        # Check if the executable exists
-        if not os.path.exists(balatro_exec_path):
-            raise FileNotFoundError(f"Balatro executable not found at: {balatro_exec_path}")
-        
-        # Build the command
-        cmd = [balatro_exec_path, str(self.port)]
-        
-        # On Linux, check if we need to use xvfb for headless operation
-        if platform.system() == "Linux":
-            # Check if DISPLAY is set, if not, use xvfb
-            if not os.getenv('DISPLAY'):
-                if self.verbose:
-                    print("No DISPLAY environment variable found. Using xvfb for headless operation.")
-                # Check if xvfb-run is available
-                try:
-                    subprocess.run(['which', 'xvfb-run'], check=True, capture_output=True)
-                    cmd = ['xvfb-run', '-a', '-s', '-screen 0 1024x768x24'] + cmd
-                except subprocess.CalledProcessError:
-                    print("Warning: xvfb-run not found. Install xvfb package for headless operation.")
-                    print("On Ubuntu/Debian: sudo apt-get install xvfb")
-                    print("On RHEL/CentOS: sudo yum install xorg-x11-server-Xvfb")
+        cmd = balatro_command(self.port, self.verbose)
         
         if self.verbose:
             print(f"Starting Balatro with command: {' '.join(cmd)}")
@@ -209,6 +349,9 @@ class BalatroEnvBase:
         if self.verbose:
             pass
             #print(f"Sending command: {cmd}")
+        if self.simulator is not None:
+            self.simulator.handle(cmd)
+            return
         msg = bytes(cmd, "utf-8")
         self.sock.sendto(msg, self.addr)
 
@@ -246,65 +389,129 @@ class BalatroEnvBase:
 
     
 
+    @PROFILER.timed("env.step")
     def run_step(self):
-        if not self.connected:
+        PROFILER.step()
+        if self.instance is not None and self.instance.generation != self.instance_generation:
+            # The pool relaunched the game: it forgot our registrations and counts actions from zero again
+            self.connected = False
+            self.last_action_no = -1
+            self.pushed_state = None
+        if not self.connected and self.simulator is None:
             try:
                 self.connect_socket()
             except Exception as e:
                 return False
 
         try:
-            time.sleep(0.7)
+            if self.subscribe:
+                G = self.wait_for_state()
+                if G is not None:
+                    self.G = G
+                    return self.handle_ready_state()
+                # The push may have been lost: subscribe again and fall back to one poll
+                if self.verbose:
+                    print("run_step: No state pushed before timeout, polling.")
+                self.sendcmd("SUBSCRIBE")
+
+            if self.step_delay and not self.subscribe:
+                with PROFILER.timer("env.sleep"):
+                    time.sleep(self.step_delay)
             status = self.get_status()
 
             if status == 'READY':
                 self.G = self.get_state()
-                state = self.G.get('state', None)
-                if not state:
-                    return False # Should not happen if READY
-
-                if self.verbose:
-                    pass
-                    #print(f"run_step: Current game state: {State(state).name}")
-
-                for ps in self.policy_states:
-                    if state == ps.value:
-                        return True # Escalate to policy
-                
-                action = self.handle_state(self.G)
-                if action:
-                    cmdstr = self.actionToCmd(action)
-                    if self.verbose:
-                        pass
-                        #print(f"run_step: Sending action command: {cmdstr}")
-                    self.sendcmd(cmdstr)
-                    # We don't wait for a response here, the next loop will check status
-                else:
-                    if self.verbose:
-                        pass
-                        #print("run_step: No action returned by handler.")
-                    pass
+                if self.G.get('action_no', 0) < self.last_action_no:
+                    # The game restarted under us without a new generation, e.g. a RemoteInstance
+                    PROFILER.count("env.relaunch")
+                    self.connect_socket()
+                return self.handle_ready_state()
             else: # Status is BUSY
-                time.sleep(1) # Wait before checking status again
+                PROFILER.count("env.busy")
+                if self.busy_delay:
+                    with PROFILER.timer("env.busy.sleep"):
+                        time.sleep(self.busy_delay) # Wait before checking status again
 
         except socket.timeout:
             raise ConnectionError("Socket timed out. Is Balatro running?")
         except (socket.error, ConnectionError) as e:
-            time.sleep(1) # Wait before trying to reconnect
+            PROFILER.count("env.reconnect")
+            with PROFILER.timer("env.reconnect.sleep"):
+                time.sleep(1) # Wait before trying to reconnect
             self.connected = False # Mark as disconnected
-            if self.sock:
-                self.sock.close()
-                self.sock = None
+            self.close_socket()
+        
+        return False
+
+    def handle_ready_state(self):
+        """Answers the READY gamestate in self.G. Returns True when it must be escalated to the policy."""
+        state = self.G.get('state', None)
+        if not state:
+            return False # Should not happen if READY
+        self.last_action_no = self.G.get('action_no', self.last_action_no)
+
+        if self.verbose:
+            pass
+            #print(f"run_step: Current game state: {State(state).name}")
+
+        for ps in self.policy_states:
+            if state == ps.value:
+                return True # Escalate to policy
         
+        action = self.handle_state(self.G)
+        if action:
+            cmdstr = self.actionToCmd(action)
+            if self.verbose:
+                pass
+                #print(f"run_step: Sending action command: {cmdstr}")
+            self.sendcmd(cmdstr)
+            # We don't wait for a response here, the next loop will check status
+        else:
+            if self.verbose:
+                pass
+                #print("run_step: No action returned by handler.")
+            pass
         return False
 
+    def close_socket(self):
+        """Closes the socket, first telling the mod to forget its SUBSCRIBE, FORMAT and FIELDS.
+
+        Every socket gets a fresh port, so the mod would otherwise keep serving the old one.
+        """
+        if self.sock is None:
+            return
+        try:
+            self.sock.sendto(b"BYE", self.addr)
+        except OSError:
+            pass # The game is gone; it forgets nothing it still remembers
+        self.sock.close()
+        self.sock = None
+
     def connect_socket(self):
-        if self.sock:
-            self.sock.close()
+        self.close_socket()
+        if self.instance is not None:
+            # The pool may have relaunched a crashed instance on another port
+            self.port = self.instance.port
+            self.addr = ("localhost", self.port)
+            self.instance_generation = self.instance.generation
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.settimeout(10)
         self.sock.connect(self.addr)
         self.connected = True
+        if self.wire_format != "json":
+            self.sendcmd(f"FORMAT|{self.wire_format.upper()}")
+        if self.game_config:
+            self.sendcmd(config_command(self.game_config))
+        if self.fields:
+            self.sendcmd("FIELDS|" + ",".join(self.fields))
+        if self.subscribe:
+            self.sendcmd("SUBSCRIBE")
+
+    def configure_game(self, **options):
+        """Changes mod options at runtime, e.g. configure_game(dt=0.1, frame_ratio=0). Kept across reconnects."""
+        self.game_config.update(options)
+        if self.connected and self.simulator is None:
+            self.sendcmd(config_command(options))
 
     def run_until_policy(self):
         escalate = False
@@ -320,7 +527,8 @@ class BalatroEnvBase:
         try:
             if self.verbose:
                 print("do_policy_action: Getting status before sending action.")
-            status = self.get_status()
+            # A subscriber only escalates on a pushed READY state, so there is nothing to poll
+            status = 'READY' if self.subscribe else self.get_status()
             if self.verbose:
                 print(f"do_policy_action: Current status: {status}")
             if status == 'READY':
@@ -341,14 +549,16 @@ class BalatroEnvBase:
             return self.G
 
     def close(self):
+        # Close the socket connection if it's open, while the game can still hear the BYE
+        self.close_socket()
+
         # Stop the Balatro instance if it's running
         if self.balatro_instance:
             self.stop_balatro_instance()
-        
-        # Close the socket connection if it's open
-        if self.sock:
-            self.sock.close()
-            self.sock = None
+        # A pooled instance keeps running for the next env
+        if self.instance is not None:
+            self.instance.release()
+            self.instance = None
         
         # Reset the bot's running state and connection status
         self.connected = False
@@ -406,9 +616,20 @@ import numpy as np
 
 
 class BasicBalatro(BalatroEnvBase):
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, simulator=None, agent=None, policy_states=[], port=None, subscribe=False,
+                 wire_format="json", action_mode="card", instance=None, game_config=None, fields=None,
+                 replay_ratio=None):
         # The policy is only invoked when the game is in the SELECTING_HAND state.
-        super().__init__(verbose=verbose, policy_states=[])
+        # VecBalatroEnv escalates SELECTING_HAND instead and acts for many envs at once.
+        # action_mode "card" asks the policy for one card (or play/discard) at a time;
+        # "subset" scores every play/discard candidate in one pass and learns once per game action.
+        # replay_ratio is passed to the DQNAgent created when no agent is given, see DQNAgent.
+        if action_mode not in ("card", "subset"):
+            raise ValueError(f"Unknown action_mode {action_mode}, expected 'card' or 'subset'")
+        self.action_mode = action_mode
+        super().__init__(verbose=verbose, policy_states=policy_states, simulator=simulator, port=port,
+                         subscribe=subscribe, wire_format=wire_format, instance=instance,
+                         game_config=game_config, fields=fields)
 
         # Define handlers for states that should be automated.
         self.state_handlers[State.MENU] = self.handle_menu
@@ -418,7 +639,9 @@ class BasicBalatro(BalatroEnvBase):
         self.state_handlers[State.SHOP] = self.handle_shop
         self.state_handlers[State.SELECTING_HAND] = self.handle_selecting_hand
 
-        self.agent = DQNAgent()
+        # An agent created here is closed with the env; a given one belongs to the caller
+        self.owns_agent = agent is None
+        self.agent = agent if agent is not None else DQNAgent(replay_ratio=replay_ratio)
         self.is_start = True
 
         self.selected = []
@@ -451,9 +674,13 @@ class BasicBalatro(BalatroEnvBase):
 
     def scfh(self, gamestate):
         self.learn(gamestate, "Hand")
-        action = self.last_action.item()
-
+        command = self.apply_hand_action(self.last_action.item())
+        if command is None:
+            return self.scfh(gamestate)
+        return command
 
+    def apply_hand_action(self, action):
+        """Applies one card-level action. Returns the game command, or None while cards are still being selected."""
         if(action < 8):
             
             self.last_selected = self.selected.copy()
@@ -461,7 +688,7 @@ class BasicBalatro(BalatroEnvBase):
             self.selected.append(action+1)
             
             print(f"Select: ", action+1)
-            return self.scfh(gamestate)
+            return None
         elif(action == 8): 
             command = [Actions.PLAY_HAND, self.selected]
 
@@ -486,7 +713,34 @@ class BasicBalatro(BalatroEnvBase):
 
 
     def handle_selecting_hand(self, state):
+        if self.action_mode == "subset":
+            return self.subset_action(state)
         return self.scfh(state)
+
+    def subset_action(self, gamestate):
+        """Chooses a whole play or discard with one policy call.
+
+        The choice is stored as the card-level transitions the card mode would
+        have produced: one select per card (pushed now, while this gamestate is
+        current) and the play/discard itself, completed by the next observe.
+        """
+        choice = self.agent.select_subset_action(gamestate)
+        if choice is None:
+            # No subset passes the card mask, so choose card by card like the card mode does
+            return self.scfh(gamestate)
+        if not self.observe(gamestate, "Hand"):
+            return None
+        selected, action = choice
+
+        for j, card in enumerate(selected):
+            before, after = selected[:j], selected[:j+1]
+            reward = self.calculate_reward(gamestate, before, "Hand", gamestate, after, "Hand")
+            self.agent.memory_push(gamestate, before, torch.tensor([[card-1]], device=action.device),
+                                   gamestate, after, reward, next_context="Hand")
+
+        self.selected = selected
+        self.remember_action(gamestate, "Hand", action)
+        return self.apply_hand_action(action.item())
     
     def count_nominals(self, stage,selected):
         nominals = [0,0,0,0,0 
@@ -530,23 +784,8 @@ class BasicBalatro(BalatroEnvBase):
             return 0
         
     def evaluate_hand(self, hand):
-        ranks = [card["id"] for card in hand]
-        suits = [card["suit"] for card in hand]
-        rank_counts = Counter(ranks)
-        suit_counts = Counter(suits)
-        
-        if any(count >= 5 for count in suit_counts.values()):
-            return 40
-        elif all(count in rank_counts.values() for count in [2, 3]):
-            return 40
-        elif 3 in rank_counts.values():
-            return 30
-        elif list(rank_counts.values()).count(2) >= 2:
-            return 20
-        elif 2 in rank_counts.values():
-            return 10
-        else:
-            return -15
+        # Flush or full house 40, three of a kind 30, two pair 20, pair 10, anything else -15
+        return hand_reward(hand)
 
     
     
@@ -580,35 +819,50 @@ class BasicBalatro(BalatroEnvBase):
 
     
     def learn(self, gamestate, context, is_game_over = False):
-        if(self.is_start):
-            self.last_action = self.agent.select_action(gamestate, self.selected, context)
-            self.last_gamestate = gamestate
-            self.last_context =  context
-            self.is_start = False
+        if not self.observe(gamestate, context, is_game_over):
             return
-        else:
+        action = self.agent.select_action(gamestate, self.selected, context)
+        self.remember_action(gamestate, context, action)
 
-        
-            reward = self.calculate_reward(self.last_gamestate, self.last_selected, self.last_context, 
-                                           gamestate, self.selected, context )
+    def observe(self, gamestate, context, is_game_over = False, optimize = True):
+        """Stores the transition that led to `gamestate`.
 
-            if(is_game_over):
-                gamestate = None
-            
-            self.agent.memory_push(self.last_gamestate,self.last_selected, self.last_action, gamestate,self.selected, reward)
+        Returns False when the episode ended and no further action is needed.
+        """
+        if(self.is_start):
+            return True
+
+        reward = self.calculate_reward(self.last_gamestate, self.last_selected, self.last_context, 
+                                       gamestate, self.selected, context )
+
+        if(is_game_over):
+            gamestate = None
+        
+        self.agent.memory_push(self.last_gamestate,self.last_selected, self.last_action, gamestate,self.selected, reward,
+                               next_context=context)
+        if optimize:
             self.agent.optimize_model()
 
-            if is_game_over:
-                self.is_start = True
-                self.selected = []
-                self.last_gamestate = None
-                self.last_selected = []
-                self.last_context =  None
-                self.last_action = None
-            else:
-                self.last_gamestate = gamestate
-                self.last_context =  context
-                self.last_action = self.agent.select_action(gamestate, self.selected, context)
+        if is_game_over:
+            self.is_start = True
+            self.selected = []
+            self.last_gamestate = None
+            self.last_selected = []
+            self.last_context =  None
+            self.last_action = None
+            return False
+        return True
+
+    def remember_action(self, gamestate, context, action):
+        self.last_gamestate = gamestate
+        self.last_context =  context
+        self.last_action = action
+        self.is_start = False
+
+    def close(self):
+        super().close()
+        if self.owns_agent:
+            self.agent.close()
 
 
 
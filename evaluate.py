@@ -0,0 +1,256 @@
+"""Greedy evaluation of a trained policy over a fixed list of run seeds.
+
+    python evaluate.py weights/checkpoint_3f9c01ab_2500.pth --episodes 200
+    python evaluate.py weights/checkpoint_3f9c01ab_2500.pth --instances 8 --out eval.json
+
+Each worker process holds a frozen copy of the policy network and plays
+whole runs, one seed at a time, against its own simulator or against one
+instance of an InstancePool. Exploration is off, nothing is learned, and
+workers run at a lower priority, so an evaluation can run beside training
+without stalling the learner.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import torch
+import torch.multiprocessing as mp
+
+from core.balsim import BalatroSim
+from core.checkpoint import snapshot
+from dqn_agent import ActingAgent
+from env import Actions, BasicBalatro
+from instance_pool import InstancePool, RemoteInstance
+
+METRICS = ("rounds", "chips", "hands_played", "decisions")
+
+
+def eval_seeds(count, base=0):
+    """`count` run seeds in the format of BasicBalatro.random_seed, the same for the same `base`."""
+    rng = random.Random(base)
+    return ["".join(rng.choices("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ", k=7)) for _ in range(count)]
+
+
+class GreedyAgent(ActingAgent):
+    """ActingAgent with exploration off and fixed weights."""
+
+    def __init__(self, policy_state, inference_backend=None):
+        super().__init__(device="cpu", num_threads=1, inference_backend=inference_backend)
+        self.load_policy(policy_state)
+        self.policy_net.requires_grad_(False)
+        self.explore = False
+
+    def memory_push(self, gamestate, selected, action, next_gamestate, next_selected, reward, next_context="Hand"):
+        pass # Evaluation learns nothing from its transitions
+
+    def optimize_model(self):
+        pass
+
+
+class EvalBalatro(BasicBalatro):
+    """BasicBalatro that starts each run with the seed given to `start_episode` and records how it ended.
+
+    Between episodes it leaves the game idle in the menu or on the game over screen.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.seed = None
+        self.next_seed = None
+        self.result = None
+
+    def start_episode(self, seed):
+        self.next_seed = seed
+        self.result = None
+
+    def random_seed(self):
+        self.seed, self.next_seed = self.next_seed, None
+        return self.seed
+
+    def start_run(self):
+        if self.next_seed is None:
+            return None
+        return [Actions.START_RUN, 1, "Checkered Deck", self.random_seed(), None]
+
+    def handle_menu(self, state):
+        return self.start_run()
+
+    def abandon_run(self):
+        """Gives up on the current run and goes back to the menu, without learning from it."""
+        game = self.G["game"] if self.G else {}
+        self.result = {"seed": self.seed, "rounds": game.get("round", 0), "chips": game.get("chips", 0),
+                       "hands_played": game.get("hands_played", 0), "truncated": True}
+        self.seed = None
+        self.is_start = True
+        self.selected = []
+        self.sendcmd(self.actionToCmd([Actions.RETURN_TO_MENU]))
+
+    def handle_game_over(self, gamestate):
+        if self.seed is not None:
+            game = gamestate["game"]
+            self.result = {"seed": self.seed, "rounds": game["round"], "chips": game["chips"],
+                           "hands_played": game["hands_played"]}
+            self.seed = None
+            self.learn(gamestate, "GAMEOVER", True)
+        return self.start_run()
+
+
+_worker = {}
+
+
+def init_worker(policy_state, ports, action_mode, inference_backend, nice):
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    torch.set_num_threads(1)
+    # BasicBalatro and the agent print every decision
+    sys.stdout = open(os.devnull, "w")
+    port = ports.get() if ports is not None else None
+    _worker["agent"] = GreedyAgent(policy_state, inference_backend)
+    _worker["env"] = EvalBalatro(agent=_worker["agent"], action_mode=action_mode,
+                                 simulator=BalatroSim() if port is None else None,
+                                 instance=RemoteInstance(port) if port is not None else None)
+
+
+def worker_ready(_):
+    return True
+
+
+def play_episode(seed, max_decisions=10000):
+    """Plays one run with `seed` in this worker's env. Returns its result dict."""
+    env = _worker["env"]
+    agent = _worker["agent"]
+    env.start_episode(seed)
+    first_step = agent.steps_done
+    start = time.perf_counter()
+    while env.result is None:
+        env.run_step()
+        if env.result is None and agent.steps_done - first_step > max_decisions:
+            # A policy stuck in a loop, e.g. always selecting and deselecting the same card
+            env.abandon_run()
+    result = dict(env.result)
+    result["decisions"] = agent.steps_done - first_step
+    result["elapsed_s"] = time.perf_counter() - start
+    result.setdefault("truncated", False)
+    return result
+
+
+def summarize(episodes, elapsed):
+    """Means with normal-approximation 95% confidence intervals, and throughput."""
+    count = len(episodes)
+    report = {
+        "episodes": count,
+        "elapsed_s": elapsed,
+        "episodes_per_s": count / elapsed if elapsed else 0.0,
+        "decisions_per_s": sum(e["decisions"] for e in episodes) / elapsed if elapsed else 0.0,
+        "truncated": sum(e["truncated"] for e in episodes),
+    }
+    for metric in METRICS:
+        values = [e[metric] for e in episodes]
+        mean = sum(values) / count if count else 0.0
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / (count - 1)) if count > 1 else 0.0
+        half = 1.96 * std / math.sqrt(count) if count else 0.0
+        report[metric] = {"mean": mean, "std": std, "ci95": [mean - half, mean + half],
+                          "min": min(values, default=0), "max": max(values, default=0)}
+    return report
+
+
+def evaluate(policy_state, seeds, workers=None, pool=None, action_mode="card", inference_backend=None, nice=10,
+             max_decisions=10000):
+    """Plays every seed once with the greedy policy given by `policy_state` (a policy_net state dict).
+
+    With a started InstancePool, one worker plays on each of its instances for the duration;
+    otherwise `workers` processes (default: every core) play on their own simulators.
+    Returns the summarize() report with the per-episode results under "results", in seed order.
+    """
+    policy_state = snapshot(policy_state)
+    ctx = mp.get_context("spawn")
+    ports = None
+    instances = []
+    if pool is not None:
+        instances = pool.acquire_many(workers or len(pool))
+        ports = ctx.Queue()
+        for instance in instances:
+            ports.put(instance.port)
+        workers = len(instances)
+    elif workers is None:
+        workers = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=init_worker,
+                                 initargs=(policy_state, ports, action_mode, inference_backend, nice)) as executor:
+            # Spawning workers and importing torch takes seconds; keep it out of the throughput
+            list(executor.map(worker_ready, range(workers)))
+            started = time.perf_counter()
+            episodes = list(executor.map(play_episode, seeds, [max_decisions] * len(seeds)))
+            elapsed = time.perf_counter() - started
+    finally:
+        for instance in instances:
+            instance.release()
+    report = summarize(episodes, elapsed)
+    report["startup_s"] = started - start
+    report["workers"] = workers
+    report["results"] = episodes
+    return report
+
+
+def evaluate_checkpoint(path, seeds, **kwargs):
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    return evaluate(checkpoint["policy_net_state_dict"], seeds, **kwargs)
+
+
+def evaluate_in_background(agent, seeds, **kwargs):
+    """Snapshots `agent`'s policy network now and evaluates it on a thread. Returns a Future of the report.
+
+    Only the weight copy happens on the caller's thread; the thread just waits on the worker processes.
+    """
+    policy_state = snapshot(agent.policy_net.state_dict())
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(evaluate, policy_state, seeds, **kwargs)
+    executor.shutdown(wait=False)
+    return future
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("checkpoint", help="a weights/checkpoint_*.pth file")
+    parser.add_argument("--episodes", type=int, default=100, help="number of fixed seeds to play")
+    parser.add_argument("--seed-base", type=int, default=0, help="picks the fixed seed list")
+    parser.add_argument("--workers", type=int, help="simulator worker processes, default one per core")
+    parser.add_argument("--instances", type=int, help="play on a pool of this many game instances instead")
+    parser.add_argument("--action-mode", default="card", choices=["card", "subset"])
+    parser.add_argument("--inference-backend", choices=["int8"])
+    parser.add_argument("--max-decisions", type=int, default=10000, help="per episode, before it is cut short")
+    parser.add_argument("--out", help="write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    seeds = eval_seeds(args.episodes, args.seed_base)
+    pool = InstancePool(args.instances).start() if args.instances else None
+    try:
+        report = evaluate_checkpoint(args.checkpoint, seeds, workers=args.workers, pool=pool,
+                                     action_mode=args.action_mode, inference_backend=args.inference_backend,
+                                     max_decisions=args.max_decisions)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    print(f"{report['episodes']} episodes on {report['workers']} workers in {report['elapsed_s']:.2f} s "
+          f"(+{report['startup_s']:.2f} s startup): {report['episodes_per_s']:.2f} episodes/s, "
+          f"{report['decisions_per_s']:.1f} decisions/s, {report['truncated']} truncated")
+    for metric in METRICS:
+        m = report[metric]
+        print(f"{metric:<14} {m['mean']:10.2f}  95% CI [{m['ci95'][0]:.2f}, {m['ci95'][1]:.2f}]  "
+              f"min {m['min']}  max {m['max']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Stand-in for the Balatro bot mod: speaks the UDP protocol of botmod/src/api.lua
+on top of the in-process BalatroSim, so the env can be exercised without the game.
+
+Launch it in place of the game with BALATRO_EXEC_PATH=/path/to/fakemod.py, or by hand:
+
+    python fakemod.py 12346 --busy 0.2 --loss 0.01 --reorder 0.01
+
+Every option can also be set through its BALATRO_FAKE_* environment variable,
+which is how options reach an instance started by the env.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import time
+
+from core.balsim import BalatroSim
+from core.wire import pack_gamestate
+from env import Actions
+
+
+# Top-level fields of Utils.GAMESTATE_FIELDS that a FIELDS projection may name
+GAMESTATE_FIELDS = ("waiting_for", "game", "hand", "jokers", "consumables", "shop", "current_round", "used_vouchers",
+                    "handsData", "current_hand")
+
+
+def project(G, fields):
+    """Utils.getGamestate with a projection: keeps the named fields, "top" or "top.sub", plus the bookkeeping."""
+    out = {key: G[key] for key in ("state", "waitingForAction", "action_no")}
+    for field in fields:
+        top, _, sub = field.partition(".")
+        if not sub:
+            out[top] = G.get(top)
+        elif top not in fields:
+            # A whole field wins over picks from it
+            out.setdefault(top, {})[sub] = (G.get(top) or {}).get(sub)
+    return out
+
+
+class FakeBalatroMod:
+    """Single-threaded UDP server with the READY/BUSY semantics of the mod.
+
+    After every accepted action the mod is BUSY for `busy` seconds (plus up to
+    `busy_jitter`), then turns READY, bumps action_no and pushes the gamestate
+    to subscribers. Outgoing datagrams are dropped with probability `loss`,
+    and with probability `reorder` held back until the next one has been sent.
+    `pad_bytes` inflates JSON gamestates to the size of real ones. Clients
+    silent for `client_timeout` seconds are forgotten, as after a BYE.
+    """
+
+    def __init__(self, port, seed=None, busy=0.0, busy_jitter=0.0, startup=0.0, loss=0.0, reorder=0.0,
+                 pad_bytes=0, verbose=False, client_timeout=600.0):
+        self.sim = BalatroSim(seed=seed)
+        self.busy = busy
+        self.busy_jitter = busy_jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.padding = "x" * pad_bytes
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", port))
+
+        # Mirrors BalatrobotAPI: not ready until the game has loaded
+        self.waiting_for_action = False
+        self.action_no = 0
+        self.ready_at = time.monotonic() + startup
+        self.subscribers = {}
+        self.formats = {}
+        self.fields = {}
+        self.client_timeout = client_timeout
+        self.last_seen = {}
+        self.last_sweep = time.monotonic()
+        # Encoded gamestates of the current READY state, keyed by (format, fields), like BalatrobotAPI.snapshots
+        self.snapshots = {}
+        self.snapshot_action_no = -1
+        self.held = None
+        # Options set with CONFIG; accepted and echoed like the mod does, the simulation ignores them
+        self.config = {"dt": 0, "instant_move": False, "disable_card_eval_status_text": False, "frame_ratio": 1,
+                       "skip_animations": False, "adaptive_dt": False, "dt_min": 1 / 60, "dt_max": 0.5, "dt_step": 1.25,
+                       "dt_backoff": 0.5, "dt_successes": 20, "dt_stall": 2.0}
+
+    # --- transport ---
+
+    def sendto(self, payload, addr):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if self.loss and self.rng.random() < self.loss:
+            return
+        if self.held is None and self.reorder and self.rng.random() < self.reorder:
+            self.held = (payload, addr)
+            return
+        self.sock.sendto(payload, addr)
+        if self.held is not None:
+            held, self.held = self.held, None
+            self.sock.sendto(*held)
+
+    def respond(self, response, addr):
+        self.sendto(json.dumps({"response": response}) + "\n", addr)
+
+    def notify(self, addr):
+        format = self.formats.get(addr, "JSON")
+        fields = self.fields.get(addr)
+        key = (format, fields)
+        if self.snapshot_action_no != self.action_no:
+            self.snapshot_action_no = self.action_no
+            self.snapshots = {}
+        payload = self.snapshots.get(key) if self.waiting_for_action else None
+
+        if payload is None:
+            G = self.sim.gamestate()
+            G["waitingForAction"] = self.waiting_for_action
+            G["action_no"] = self.action_no
+            if format == "PACKED":
+                payload = pack_gamestate(G)
+            else:
+                if fields is not None:
+                    G = project(G, fields)
+                elif self.padding:
+                    # Padding stands for the fields a projection leaves out
+                    G["padding"] = self.padding
+                payload = json.dumps(G)
+            if self.waiting_for_action:
+                self.snapshots[key] = payload
+        self.sendto(payload, addr)
+
+    # --- api.lua ---
+
+    def forget(self, addr):
+        self.subscribers.pop(addr, None)
+        self.formats.pop(addr, None)
+        self.fields.pop(addr, None)
+        self.last_seen.pop(addr, None)
+
+    def expire_clients(self):
+        now = time.monotonic()
+        if now - self.last_sweep < self.client_timeout / 10:
+            return
+        self.last_sweep = now
+        for addr, seen in list(self.last_seen.items()):
+            if now - seen > self.client_timeout:
+                self.forget(addr)
+
+    def update_readiness(self):
+        if not self.waiting_for_action and time.monotonic() >= self.ready_at:
+            self.waiting_for_action = True
+            self.action_no += 1
+            for addr in list(self.subscribers):
+                self.notify(addr)
+
+    def handle(self, data, addr):
+        data = data.decode("utf-8", errors="replace").strip()
+        command = data.split("|", 1)[0]
+        self.last_seen[addr] = time.monotonic()
+
+        if command == "STATUS":
+            self.respond({"status": "READY" if self.waiting_for_action else "BUSY"}, addr)
+        elif command == "SUBSCRIBE":
+            self.subscribers[addr] = True
+            self.respond({"subscribed": True}, addr)
+            if self.waiting_for_action:
+                self.notify(addr)
+        elif command == "UNSUBSCRIBE":
+            self.subscribers.pop(addr, None)
+            self.respond({"subscribed": False}, addr)
+        elif command == "BYE":
+            self.forget(addr)
+            self.respond({"bye": True}, addr)
+        elif command == "FORMAT":
+            format = data.split("|", 1)[1] if "|" in data else None
+            if format in ("JSON", "PACKED"):
+                self.formats[addr] = format
+                self.respond({"format": format}, addr)
+            else:
+                self.respond({"error": f"Error: Unknown format {format}"}, addr)
+        elif command == "FIELDS":
+            spec = data.split("|", 1)[1] if "|" in data else ""
+            fields = tuple(field.strip() for field in spec.split(",") if field.strip())
+            unknown = [field for field in fields if field.split(".", 1)[0] not in GAMESTATE_FIELDS]
+            if unknown:
+                self.respond({"error": f"Error: Unknown gamestate field {unknown[0]}"}, addr)
+            elif fields:
+                self.fields[addr] = fields
+                self.respond({"fields": spec}, addr)
+            else:
+                self.fields.pop(addr, None)
+                self.respond({"fields": "ALL"}, addr)
+        elif command == "CONFIG":
+            updates = {}
+            for pair in filter(None, (data.split("|", 1)[1] if "|" in data else "").split(",")):
+                key, _, value = pair.strip().partition("=")
+                if key not in self.config:
+                    self.respond({"error": f"Error: Unknown config option {key}"}, addr)
+                    return
+                if isinstance(self.config[key], bool):
+                    if value not in ("true", "false"):
+                        self.respond({"error": f"Error: Config option {key} expects true or false"}, addr)
+                        return
+                    updates[key] = value == "true"
+                else:
+                    try:
+                        updates[key] = float(value)
+                    except ValueError:
+                        self.respond({"error": f"Error: Config option {key} expects a number"}, addr)
+                        return
+            self.config.update(updates)
+            self.respond({"config": self.config}, addr)
+        elif command == "GET_STATE":
+            if self.waiting_for_action:
+                self.notify(addr)
+            else:
+                self.respond({"error": "Bot is busy"}, addr)
+        else:
+            if not self.waiting_for_action:
+                self.respond({"error": "Bot is not ready for actions"}, addr)
+                return
+            if command not in Actions.__members__:
+                self.respond({"error": f"Error: Invalid action {command}"}, addr)
+                return
+            response = self.sim.handle(data)["response"]
+            if "error" in response:
+                self.respond(response, addr)
+                return
+            self.respond({"response": f"Action received: {Actions[command].value}"}, addr)
+            self.waiting_for_action = False
+            self.ready_at = time.monotonic() + self.busy + self.rng.random() * self.busy_jitter
+
+    def serve_forever(self):
+        if self.verbose:
+            print(f"Fake Balatro mod listening on 127.0.0.1:{self.sock.getsockname()[1]}")
+        while True:
+            self.update_readiness()
+            self.expire_clients()
+            # Wake up in time for the next READY transition, like a frame of the game loop would
+            timeout = 0.05 if self.waiting_for_action else max(min(self.ready_at - time.monotonic(), 0.05), 0.0005)
+            self.sock.settimeout(timeout)
+            try:
+                data, addr = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except ConnectionResetError:
+                continue
+            self.update_readiness()
+            self.handle(data, addr)
+
+
+def main(argv=None):
+    def env(name, default, type=float):
+        value = os.getenv(f"BALATRO_FAKE_{name}")
+        return default if value is None else type(value)
+
+    parser = argparse.ArgumentParser(description="Fake Balatro bot mod speaking the UDP protocol")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--seed", type=int, default=env("SEED", None, int))
+    parser.add_argument("--busy", type=float, default=env("BUSY", 0.0), help="seconds BUSY after each action")
+    parser.add_argument("--busy-jitter", type=float, default=env("BUSY_JITTER", 0.0), help="extra random BUSY seconds")
+    parser.add_argument("--startup", type=float, default=env("STARTUP", 0.0), help="seconds before the first READY")
+    parser.add_argument("--loss", type=float, default=env("LOSS", 0.0), help="probability of dropping a datagram")
+    parser.add_argument("--reorder", type=float, default=env("REORDER", 0.0), help="probability of delaying a datagram")
+    parser.add_argument("--pad-bytes", type=int, default=env("PAD_BYTES", 0, int), help="padding added to JSON gamestates")
+    parser.add_argument("--client-timeout", type=float, default=env("CLIENT_TIMEOUT", 600.0),
+                        help="seconds of silence before a client's registrations are forgotten")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    mod = FakeBalatroMod(args.port, seed=args.seed, busy=args.busy, busy_jitter=args.busy_jitter,
+                         startup=args.startup, loss=args.loss, reorder=args.reorder, pad_bytes=args.pad_bytes,
+                         verbose=args.verbose, client_timeout=args.client_timeout)
+    try:
+        mod.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Warm pool of Balatro instances shared by the envs of a training job.
+
+    pool = InstancePool(16)
+    pool.start()
+    env = BasicBalatro(instance=pool.acquire())
+    ...
+    env.close()  # hands the instance back to the pool
+    pool.close()
+
+All instances are launched at once on OS-assigned ports and polled with
+STATUS until they answer, so warming 16 costs about as long as starting one.
+A supervisor thread keeps health-checking them and relaunches any process
+that exited or stopped answering. Envs reconnect on their own once their
+instance is back.
+"""
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+from core.profiling import PROFILER
+from core.wire import decode_message
+from env import balatro_command, get_available_port
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class BalatroInstance:
+    """One game process listening on its own port, optionally pinned to a CPU core."""
+
+    def __init__(self, pool, index, core=None):
+        self.pool = pool
+        self.index = index
+        self.core = core
+        self.port = None
+        self.process = None
+        self.in_use = False
+        self.healthy = False
+        self.restarts = 0
+        # Bumped on every launch; an env seeing it change re-sends its FORMAT, FIELDS, CONFIG and SUBSCRIBE
+        self.generation = 0
+        self.failed_launches = 0
+        self.launched_at = 0.0
+        self.last_ok = 0.0
+
+    def launch(self):
+        # Relaunch on the same port so connected envs are unaffected, unless it failed to come up there
+        if self.port is None or self.failed_launches:
+            self.port = get_available_port()
+        cmd = balatro_command(self.port, self.pool.verbose)
+        # taskset pins the game before it runs, so everything it spawns inherits the core.
+        # (A preexec_fn would do the same but is unsafe to fork from a multithreaded process.)
+        pin_after_launch = False
+        if self.core is not None:
+            if shutil.which("taskset"):
+                cmd = ["taskset", "-c", str(self.core)] + cmd
+            else:
+                pin_after_launch = hasattr(os, "sched_setaffinity")
+        kwargs = {}
+        if os.name == "posix":
+            # Own process group, so a kill also reaches the game under xvfb-run
+            kwargs["start_new_session"] = True
+        self.process = subprocess.Popen(cmd, **kwargs)
+        if pin_after_launch:
+            try:
+                os.sched_setaffinity(self.process.pid, {self.core})
+            except OSError as e:
+                print(f"Instance {self.index}: could not pin PID {self.process.pid} to core {self.core}: {e}")
+        self.generation += 1
+        self.healthy = False
+        self.launched_at = time.monotonic()
+        if self.pool.verbose:
+            print(f"Instance {self.index}: PID {self.process.pid} on port {self.port}, core {self.core}")
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def ping(self, timeout=0.5):
+        """Sends STATUS from a private socket. Returns READY/BUSY, or None without an answer."""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            deadline = time.monotonic() + timeout
+            try:
+                sock.sendto(b"STATUS", ("localhost", self.port))
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    sock.settimeout(remaining)
+                    data, _ = sock.recvfrom(65536)
+                    response = decode_message(data).get('response')
+                    if isinstance(response, dict) and 'status' in response:
+                        self.healthy = True
+                        self.last_ok = time.monotonic()
+                        return response['status']
+            except (socket.timeout, OSError, ValueError):
+                return None
+
+    def kill(self):
+        if not self.alive():
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except ProcessLookupError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def release(self):
+        self.pool.release(self)
+
+
+class RemoteInstance:
+    """A pool instance as seen from another process, which only knows its port.
+
+    The owning pool keeps supervising it; relaunches reuse the port. Its
+    generation never changes, so the env notices a relaunch by the game's
+    action_no going back instead.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.generation = 0
+
+    def release(self):
+        pass
+
+
+class InstancePool:
+    """Launches, hands out and supervises `size` Balatro instances.
+
+    With `pin` set, instance i runs on core `cores[i % len(cores)]` (by
+    default every core this process may use); pass fewer cores to keep some
+    free for the learner. An instance is relaunched when its process exits,
+    when it has not answered STATUS for `hang_timeout` seconds, or when it
+    does not come up within `startup_timeout` seconds of a launch.
+    """
+
+    def __init__(self, size, verbose=False, pin=True, cores=None, startup_timeout=60, hang_timeout=30,
+                 health_interval=2.0):
+        self.verbose = verbose
+        self.startup_timeout = startup_timeout
+        self.hang_timeout = hang_timeout
+        self.health_interval = health_interval
+
+        if cores is None:
+            cores = available_cores()
+        self.instances = [BalatroInstance(self, i, cores[i % len(cores)] if pin else None) for i in range(size)]
+
+        self.lock = threading.Condition()
+        self.stop = threading.Event()
+        self.supervisor = None
+
+    def __len__(self):
+        return len(self.instances)
+
+    def start(self):
+        """Launches every instance and blocks until all of them answer STATUS."""
+        for instance in self.instances:
+            instance.launch()
+
+        deadline = time.monotonic() + self.startup_timeout
+        waiting = list(self.instances)
+        while waiting:
+            if time.monotonic() > deadline:
+                self.close()
+                raise TimeoutError(f"{len(waiting)} Balatro instances did not start within {self.startup_timeout} s")
+            waiting = [instance for instance in waiting if instance.ping(timeout=0.1) is None]
+        if self.verbose:
+            print(f"{len(self.instances)} Balatro instances ready.")
+
+        self.supervisor = threading.Thread(target=self.supervise, name="instance-pool", daemon=True)
+        self.supervisor.start()
+        return self
+
+    def acquire(self, timeout=None):
+        """Hands out a free instance, preferring healthy ones. Blocks while all are in use."""
+        with self.lock:
+            if not self.lock.wait_for(lambda: any(not instance.in_use for instance in self.instances), timeout):
+                raise TimeoutError("No free Balatro instance in the pool")
+            free = [instance for instance in self.instances if not instance.in_use]
+            instance = next((instance for instance in free if instance.healthy), free[0])
+            instance.in_use = True
+            return instance
+
+    def acquire_many(self, count, timeout=None):
+        """Hands out `count` instances at once. Blocks until that many are free.
+
+        Asking for more instances than the pool has raises ValueError instead of waiting forever.
+        """
+        if count > len(self.instances):
+            raise ValueError(f"Asked for {count} Balatro instances from a pool of {len(self.instances)}")
+        with self.lock:
+            if not self.lock.wait_for(lambda: sum(not instance.in_use for instance in self.instances) >= count,
+                                      timeout):
+                raise TimeoutError(f"Fewer than {count} free Balatro instances in the pool")
+            # Healthy ones first
+            free = sorted((instance for instance in self.instances if not instance.in_use),
+                          key=lambda instance: not instance.healthy)[:count]
+            for instance in free:
+                instance.in_use = True
+            return free
+
+    def release(self, instance):
+        with self.lock:
+            instance.in_use = False
+            self.lock.notify_all()
+
+    def restart(self, instance, reason):
+        PROFILER.count("pool.restart")
+        if self.verbose:
+            print(f"Instance {instance.index} on port {instance.port} {reason}, relaunching.")
+        instance.kill()
+        instance.restarts += 1
+        instance.launch()
+
+    def check(self, instance):
+        now = time.monotonic()
+        if not instance.alive():
+            self.restart(instance, "exited")
+        elif instance.ping() is not None:
+            instance.failed_launches = 0
+        elif not instance.healthy and now - instance.launched_at > self.startup_timeout:
+            instance.failed_launches += 1
+            self.restart(instance, "did not start")
+        elif instance.healthy and now - instance.last_ok > self.hang_timeout:
+            self.restart(instance, "hung")
+
+    def supervise(self):
+        while not self.stop.wait(self.health_interval):
+            for instance in self.instances:
+                if self.stop.is_set():
+                    return
+                self.check(instance)
+
+    def stats(self):
+        return [{"index": instance.index, "port": instance.port, "core": instance.core, "in_use": instance.in_use,
+                 "healthy": instance.healthy, "restarts": instance.restarts} for instance in self.instances]
+
+    def close(self):
+        self.stop.set()
+        if self.supervisor is not None:
+            self.supervisor.join(timeout=self.health_interval + 5)
+            self.supervisor = None
+        for instance in self.instances:
+            instance.kill()
@@ -0,0 +1,44 @@
+import random
+
+from core.balsim import BalatroSim, GAME_OVER, SELECTING_HAND
+
+
+def play(seed, steps=300):
+    """Plays random legal actions (from a fixed RNG) and returns every gamestate seen."""
+    rng = random.Random(1234)
+    sim = BalatroSim(seed=seed)
+    sim.handle("START_RUN|1|Red Deck||")
+    trace = []
+    for _ in range(steps):
+        G = sim.gamestate()
+        trace.append(G)
+        if G["state"] == SELECTING_HAND:
+            count = rng.randint(1, min(5, len(G["hand"])))
+            cards = ",".join(str(i) for i in rng.sample(range(1, len(G["hand"]) + 1), count))
+            action = "DISCARD_HAND" if G["current_round"]["discards_left"] and rng.random() < 0.3 else "PLAY_HAND"
+            sim.handle(f"{action}|{cards}")
+        elif G["state"] == GAME_OVER:
+            sim.handle("START_RUN|1|Red Deck||")
+        else:
+            for command in ("SELECT_BLIND", "CASH_OUT", "END_SHOP"):
+                if "error" not in sim.handle(command)["response"]:
+                    break
+    return trace
+
+
+def test_same_seed_same_run():
+    assert play(7) == play(7)
+
+
+def test_seed_changes_the_deal():
+    assert play(7) != play(8)
+
+
+def test_start_run_seed_fixes_the_deal():
+    hands = []
+    for seed in (None, 1, 2):
+        sim = BalatroSim(seed=seed)
+        sim.handle("START_RUN|1|Red Deck|ABC1234|")
+        sim.handle("SELECT_BLIND")
+        hands.append(sim.gamestate()["hand"])
+    assert hands[0] == hands[1] == hands[2]
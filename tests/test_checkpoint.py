@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+import torch
+
+from core.checkpoint import CheckpointWriter, checkpoint_files, load_replay, replay_segments
+from core.rlutils import ReplayMemory
+from dqn_agent import DQNAgent
+
+
+def push_numbered(memory, count, start=0):
+    for n in range(start, start + count):
+        memory.push(torch.full((memory.state_dim,), float(n)), n % 10, None, float(n))
+
+
+def save(writer, steps, memory):
+    writer.submit(steps, {"steps_done": steps}, memory)
+    writer.flush()
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    # The agent writes its checkpoints under weights/ in the working directory
+    monkeypatch.chdir(tmp_path)
+    agent = DQNAgent(device="cpu", replay_capacity=50)
+    yield agent
+    agent.close()
+
+
+def test_agent_checkpoint_roundtrip(agent, tmp_path):
+    push_numbered(agent.memory, 70)
+    agent.steps_done = 100
+    agent.save_checkpoint()
+    agent.checkpoint_writer.flush()
+    path = tmp_path / "weights" / f"checkpoint_{agent.checkpoint_writer.run_id}_100.pth"
+    assert path.exists()
+
+    restored = DQNAgent(device="cpu", replay_capacity=50)
+    try:
+        restored.load_checkpoint(path, resume=True)
+        assert restored.steps_done == 100
+        for name, value in agent.policy_net.state_dict().items():
+            assert torch.equal(restored.policy_net.state_dict()[name], value)
+        assert restored.memory.total == 70
+        assert len(restored.memory) == 50
+        assert torch.equal(restored.memory.rewards, agent.memory.rewards)
+        assert torch.equal(restored.memory.states, agent.memory.states)
+    finally:
+        restored.close()
+
+
+def test_resume_drops_the_abandoned_run(tmp_path):
+    prefix = tmp_path / "checkpoint"
+    memory = ReplayMemory(capacity=10, state_dim=2)
+    writer = CheckpointWriter(prefix, keep=10)
+    for steps in (1, 2, 3):
+        push_numbered(memory, 6, start=memory.total)
+        save(writer, steps, memory)
+    writer.close()
+    run = writer.run_id
+
+    # Restart from checkpoint 1, taken after 6 pushes
+    writer = CheckpointWriter(prefix, keep=10)
+    writer.resume(6, prefix, run)
+    assert [steps for steps, _ in checkpoint_files(prefix)] == [1]
+    assert [(start, end) for start, end, _ in replay_segments(prefix, run)] == [(0, 6)]
+    replay = ReplayMemory(capacity=10, state_dim=2)
+    push_numbered(replay, 6)
+    push_numbered(replay, 4, start=100) # the resumed run diverges from the abandoned one
+    save(writer, 2, replay)
+    writer.close()
+    restored = load_replay(prefix, 10, 10, run)
+    assert restored["reward"].tolist() == [0, 1, 2, 3, 4, 5, 100, 101, 102, 103]
+
+
+def test_retention_counts_checkpoints_already_on_disk(tmp_path):
+    prefix = tmp_path / "checkpoint"
+    memory = ReplayMemory(capacity=4, state_dim=2)
+    writer = CheckpointWriter(prefix, keep=2)
+    for steps in (1, 2):
+        push_numbered(memory, 4, start=memory.total)
+        save(writer, steps, memory)
+    writer.close()
+    run = writer.run_id
+
+    writer = CheckpointWriter(prefix, keep=2)
+    writer.resume(memory.total, prefix, run)
+    push_numbered(memory, 4, start=memory.total)
+    save(writer, 3, memory)
+    writer.close()
+    assert [steps for steps, _ in checkpoint_files(prefix)] == [2, 3]
+    # Checkpoint 2 restores transitions 4..8, so the first segment is gone
+    assert [(start, end) for start, end, _ in replay_segments(prefix, run)] == [(4, 8), (8, 12)]
+    assert load_replay(prefix, 8, 4, run)["reward"].tolist() == [4, 5, 6, 7]
+
+
+def test_fresh_runs_never_mix(tmp_path):
+    prefix = tmp_path / "checkpoint"
+    first = ReplayMemory(capacity=20, state_dim=2)
+    writer = CheckpointWriter(prefix, keep=10)
+    for steps in (6, 12):
+        push_numbered(first, 6, start=first.total)
+        save(writer, steps, first)
+    writer.close()
+    first_run = writer.run_id
+
+    # A second run started from scratch under the same prefix, without resume()
+    second = ReplayMemory(capacity=20, state_dim=2)
+    writer = CheckpointWriter(prefix, keep=10)
+    push_numbered(second, 8, start=1000)
+    save(writer, 6, second)
+    writer.close()
+    second_run = writer.run_id
+    assert second_run != first_run
+
+    # Both runs' checkpoints survive, including the two taken at step 6
+    assert [steps for steps, _ in checkpoint_files(prefix)] == [6, 6, 12]
+    assert load_replay(prefix, 8, 20, second_run)["reward"].tolist() == list(range(1000, 1008))
+    assert load_replay(prefix, 12, 20, first_run)["reward"].tolist() == list(range(12))
+
+    checkpoint = torch.load(prefix.with_name(f"checkpoint_{first_run}_12.pth"), weights_only=False)
+    assert checkpoint["replay_run"] == first_run
+
+
+def test_pruning_drops_runs_without_checkpoints(tmp_path):
+    prefix = tmp_path / "checkpoint"
+    old = ReplayMemory(capacity=4, state_dim=2)
+    writer = CheckpointWriter(prefix, keep=2)
+    push_numbered(old, 4)
+    save(writer, 1, old)
+    writer.close()
+    old_run = writer.run_id
+
+    new = ReplayMemory(capacity=4, state_dim=2)
+    writer = CheckpointWriter(prefix, keep=2)
+    for steps in (1, 2):
+        push_numbered(new, 4, start=new.total)
+        save(writer, steps, new)
+    writer.close()
+    assert [path.name for _, path in checkpoint_files(prefix)] == [
+        f"checkpoint_{writer.run_id}_1.pth", f"checkpoint_{writer.run_id}_2.pth"]
+    assert replay_segments(prefix, old_run) == []
+    assert [(start, end) for start, end, _ in replay_segments(prefix, writer.run_id)] == [(0, 4), (4, 8)]
+
+
+def test_load_replay_raises_on_gaps(tmp_path):
+    prefix = tmp_path / "checkpoint"
+    for start, end in ((0, 4), (6, 10)):
+        np.savez(tmp_path / f"checkpoint_replay_{start:012d}_{end:012d}.npz", reward=np.arange(start, end))
+    assert load_replay(prefix, 4, 4)["reward"].tolist() == [0, 1, 2, 3]
+    with pytest.raises(FileNotFoundError):
+        load_replay(prefix, 10, 8)
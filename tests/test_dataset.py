@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import torch
+
+from core.dataset import ShardDataset, TransitionRecorder, shard_paths
+
+
+def gamestate(n):
+    return {"hand": [{"id": 2 + n % 13, "suit": "Hearts"}], "game": {"round": n, "dollars": 4, "chips": 0},
+            "current_round": {"hands_left": 4, "discards_left": 3}}
+
+
+def record_numbered(directory, count, start=0, shard_size=4):
+    """Records transitions whose state and reward carry their number; every third one is final."""
+    recorder = TransitionRecorder(directory, shard_size=shard_size)
+    for n in range(start, start + count):
+        state = torch.full((24,), float(n))
+        final = n % 3 == 0
+        mask = torch.zeros(10, dtype=torch.bool)
+        mask[n % 10] = True
+        recorder.record(state, torch.tensor([[n % 10]]), None if final else state + 1, float(n),
+                        None if final else mask, gamestate(n), [1], None if final else gamestate(n + 1), [])
+    recorder.close()
+    return recorder
+
+
+def rows(batches):
+    return torch.cat([batch.reward for batch in batches]).tolist()
+
+
+def test_recorded_transitions_round_trip(tmp_path):
+    record_numbered(tmp_path, 10)
+    assert [index for index, _ in shard_paths(tmp_path)] == [0, 1, 2]
+    dataset = ShardDataset(tmp_path, batch_size=3, window=2, seed=0, drop_last=False)
+    assert len(dataset) == 10
+
+    batches = list(dataset)
+    assert sorted(rows(batches)) == list(range(10))
+    for batch in batches:
+        numbers = batch.reward.long()
+        assert torch.equal(batch.state[:, 0], batch.reward)
+        assert torch.equal(batch.action.flatten(), numbers % 10)
+        assert torch.equal(batch.non_final, numbers % 3 != 0)
+        assert torch.equal(batch.next_state[batch.non_final, 0], batch.reward[batch.non_final] + 1)
+        assert not batch.next_state[~batch.non_final].any()
+        assert torch.equal(batch.next_mask[batch.non_final].float().argmax(1), numbers[batch.non_final] % 10)
+        assert batch.reward.dtype == torch.float32
+
+
+def test_epochs_shuffle_reproducibly_and_drop_the_remainder(tmp_path):
+    record_numbered(tmp_path, 10)
+    epochs = [rows(ShardDataset(tmp_path, batch_size=3, window=2, seed=1)) for _ in range(2)]
+    assert epochs[0] == epochs[1]
+    assert len(epochs[0]) == 9 and len(set(epochs[0])) == 9
+
+
+def test_recording_continues_the_shard_sequence(tmp_path):
+    record_numbered(tmp_path, 4)
+    record_numbered(tmp_path, 6, start=4)
+    assert [index for index, _ in shard_paths(tmp_path)] == [0, 1, 2]
+    assert sorted(rows(ShardDataset(tmp_path, batch_size=5, seed=0))) == list(range(10))
+
+
+def test_encode_reads_the_raw_gamestates(tmp_path):
+    record_numbered(tmp_path, 8)
+
+    def encode(shard):
+        # Round number and first card id, for the state and the next state
+        state = np.stack([shard["game"][:, 0], shard["hand"][:, 0, 0]], axis=1).astype(np.float32)
+        next_state = np.stack([shard["next_game"][:, 0], shard["next_hand"][:, 0, 0]], axis=1).astype(np.float32)
+        return state, np.nan_to_num(next_state, nan=-1)
+
+    for batch in ShardDataset(tmp_path, batch_size=4, seed=0, encode=encode):
+        assert torch.equal(batch.state[:, 0], batch.reward)
+        assert torch.equal(batch.state[:, 1], 2 + batch.reward % 13)
+        assert torch.equal(batch.next_state[batch.non_final, 0], batch.reward[batch.non_final] + 1)
+        assert (batch.next_state[~batch.non_final] == -1).all()
+
+
+def test_empty_directory_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ShardDataset(tmp_path)
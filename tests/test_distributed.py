@@ -0,0 +1,90 @@
+import pytest
+import torch
+import torch.multiprocessing as mp
+
+from core.balnetworks import SimpleDQN
+from distributed import SharedReplayMemory, WeightBroadcast, learner_main
+from dqn_agent import DQNAgent
+
+
+def push_numbered(replay, count, start=0):
+    for n in range(start, start + count):
+        replay.push(torch.full((replay.state_dim,), float(n)), n % 10, None, float(n))
+
+
+def exit_with(code):
+    raise SystemExit(code)
+
+
+@pytest.fixture
+def ctx():
+    return mp.get_context("spawn")
+
+
+def test_weight_broadcast_roundtrip():
+    source, target = SimpleDQN(24, 10), SimpleDQN(24, 10)
+    weights = WeightBroadcast(source)
+    weights.publish(source)
+    assert int(weights.version) == 2
+    assert weights.poll(target, -1) == 2
+    for published, received in zip(source.parameters(), target.parameters()):
+        assert torch.equal(published, received)
+    # Nothing newer to load
+    assert weights.poll(target, 2) == 2
+
+
+def test_weight_broadcast_skips_a_copy_in_progress():
+    source, target = SimpleDQN(24, 10), SimpleDQN(24, 10)
+    before = [parameter.clone() for parameter in target.parameters()]
+    weights = WeightBroadcast(source)
+    weights.version += 1 # the writer is midway through publish
+    assert weights.poll(target, 0) == 0
+
+    # The writer starts another publish while the reader copies
+    weights.version += 1
+    clone = weights.buffer.clone
+    def clone_during_publish():
+        weights.version += 1
+        return clone()
+    weights.buffer.clone = clone_during_publish
+    assert weights.poll(target, 0) == 0
+    for parameter, original in zip(target.parameters(), before):
+        assert torch.equal(parameter, original)
+
+
+def test_shared_replay_sees_pushes_from_another_process(ctx):
+    replay = SharedReplayMemory(8, state_dim=3, lock=ctx.Lock())
+    push_numbered(replay, 2)
+    actor = ctx.Process(target=push_numbered, args=(replay, 9, 2))
+    actor.start()
+    actor.join(timeout=60)
+    assert actor.exitcode == 0
+    assert replay.total == 11 and len(replay) == 8 and replay.position == 3
+    assert sorted(replay.rewards.tolist()) == [float(n) for n in range(3, 11)]
+    batch = replay.sample(16)
+    assert set(batch.reward.flatten().tolist()) <= set(range(3, 11))
+    assert torch.equal(batch.state[:, 0], batch.reward.flatten())
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch, ctx):
+    monkeypatch.chdir(tmp_path)
+    agent = DQNAgent(device="cpu", memory=SharedReplayMemory(512, lock=ctx.Lock()))
+    yield agent
+    agent.close()
+
+
+def test_learner_counts_updates_apart_from_decisions(agent, ctx):
+    push_numbered(agent.memory, agent.minibatch_size)
+    weights = WeightBroadcast(agent.policy_net)
+    assert learner_main(agent, weights, ctx.Event(), publish_interval=2, max_updates=5, save_interval=None) == 5
+    assert agent.steps_done == 0
+    assert int(weights.version) == 4 # published after updates 2 and 4
+
+
+def test_learner_fails_when_an_actor_dies(agent, ctx):
+    actor = ctx.Process(target=exit_with, args=(3,), name="actor-0")
+    actor.start()
+    actor.join(timeout=60)
+    with pytest.raises(RuntimeError, match="actor-0 exited with code 3"):
+        learner_main(agent, WeightBroadcast(agent.policy_net), ctx.Event(), actors=[actor])
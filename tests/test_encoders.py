@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+
+from core.balsim import BalatroSim
+from core.encoders import STATE_SIZE, encode_card, encode_game, encode_games
+from core.wire import pack_gamestate, unpack_gamestate
+
+
+def simulated_gamestates(count, seed=0):
+    """Gamestates and selections along random play of the simulator, hands of varying size."""
+    rng = random.Random(seed)
+    sim = BalatroSim(seed=seed)
+    sim.handle("START_RUN|1|Red Deck|SEED|")
+    sim.handle("SELECT_BLIND")
+    states = []
+    while len(states) < count:
+        G = sim.gamestate()
+        if G["hand"]:
+            selected = sorted(rng.sample(range(1, len(G["hand"]) + 1), rng.randint(0, min(5, len(G["hand"])))))
+            states.append((G, selected))
+            # Drop cards now and then so shorter hands show up too
+            short = dict(G, hand=G["hand"][:rng.randint(1, len(G["hand"]))])
+            states.append((short, [i for i in selected if i <= len(short["hand"])]))
+        if sim.state != 1:
+            sim = BalatroSim(seed=rng.random())
+            sim.handle("START_RUN|1|Red Deck|SEED|")
+            sim.handle("SELECT_BLIND")
+            continue
+        action = "DISCARD_HAND" if sim.discards_left and rng.random() < 0.5 else "PLAY_HAND"
+        sim.handle(f"{action}|{rng.randint(1, len(sim.hand))}")
+    return states[:count]
+
+
+def baseline_encode_game(G, selected):
+    """The per-game encoder the batch encoder replaced, kept as the reference layout."""
+    if(len(G) == 0):
+        return [-1 for _ in range(24)]
+    hand_data = []
+    hand = G["hand"][:8]
+    for i in range(len(hand)):
+        hand_data.append(encode_card(hand[i]))
+    for i in range(8-len(hand_data)):
+        hand_data.append(encode_card(None))
+    selected_vector = [1 if i in selected else 0 for i in range(1, 9)]
+    data_vector = []
+    for d in hand_data:
+        data_vector.extend(d)
+    data_vector.extend(selected_vector)
+    return data_vector
+
+
+def test_encode_games_matches_baseline():
+    states = simulated_gamestates(64)
+    batch = encode_games([G for G, _ in states], [selected for _, selected in states])
+    assert batch.shape == (64, STATE_SIZE)
+    expected = np.array([baseline_encode_game(G, selected) for G, selected in states], dtype=np.float32)
+    assert np.array_equal(batch, expected)
+
+
+def test_encode_game_matches_baseline():
+    for G, selected in simulated_gamestates(16, seed=2):
+        assert encode_game(G, selected).tolist() == baseline_encode_game(G, selected)
+
+
+def test_encode_game_layout():
+    G = {"hand": [{"id": 14, "suit": "Spades"}, {"id": 3, "suit": "Hearts"}]}
+    encoded = encode_game(G, [2]).numpy()
+    assert encoded[:4].tolist() == [14, 2, 3, 0]
+    assert (encoded[4:16] == -1).all()
+    assert encoded[16:].tolist() == [0, 1, 0, 0, 0, 0, 0, 0]
+    assert (encode_game({}, []).numpy() == -1).all()
+
+
+def test_packed_gamestates_encode_like_json():
+    states = simulated_gamestates(32, seed=1)
+    Gs = [G for G, _ in states]
+    selections = [selected for _, selected in states]
+    packed = [unpack_gamestate(pack_gamestate(G)) for G in Gs]
+    assert np.array_equal(encode_games(packed, selections), encode_games(Gs, selections))
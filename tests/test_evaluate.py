@@ -0,0 +1,57 @@
+import math
+
+import pytest
+import torch
+
+from core.balnetworks import SimpleDQN
+from evaluate import METRICS, eval_seeds, evaluate, summarize
+
+
+def episode(rounds, chips, hands_played, decisions, truncated=False):
+    return {"seed": "ABC1234", "rounds": rounds, "chips": chips, "hands_played": hands_played,
+            "decisions": decisions, "truncated": truncated}
+
+
+def test_summarize():
+    episodes = [episode(1, 100, 4, 20), episode(2, 300, 8, 40), episode(3, 500, 12, 60, truncated=True)]
+    report = summarize(episodes, elapsed=2.0)
+    assert report["episodes"] == 3
+    assert report["episodes_per_s"] == 1.5
+    assert report["decisions_per_s"] == 60.0
+    assert report["truncated"] == 1
+    chips = report["chips"]
+    assert chips["mean"] == 300 and chips["std"] == 200
+    half = 1.96 * 200 / math.sqrt(3)
+    assert chips["ci95"] == pytest.approx([300 - half, 300 + half])
+    assert (chips["min"], chips["max"]) == (100, 500)
+    assert set(METRICS) <= set(report)
+
+
+def test_summarize_without_spread():
+    report = summarize([episode(1, 100, 4, 20)], elapsed=0.0)
+    assert report["episodes_per_s"] == 0.0
+    assert report["rounds"] == {"mean": 1.0, "std": 0.0, "ci95": [1.0, 1.0], "min": 1, "max": 1}
+    assert summarize([], elapsed=1.0)["chips"]["mean"] == 0.0
+
+
+def test_eval_seeds_are_fixed_per_base():
+    seeds = eval_seeds(5)
+    assert seeds == eval_seeds(5) and seeds[:3] == eval_seeds(3)
+    assert seeds != eval_seeds(5, base=1)
+    assert all(len(seed) == 7 and set(seed) <= set("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ") for seed in seeds)
+
+
+def test_evaluate_is_deterministic_per_seed():
+    torch.manual_seed(0)
+    policy_state = SimpleDQN(24, 10).state_dict()
+    seeds = eval_seeds(4)
+
+    def results(workers):
+        report = evaluate(policy_state, seeds, workers=workers, max_decisions=500)
+        return [{key: value for key, value in e.items() if key != "elapsed_s"} for e in report["results"]]
+
+    # The same seeds give the same runs however they are spread over workers
+    first = results(2)
+    assert first == results(1)
+    assert [e["seed"] for e in first] == seeds
+    assert len({e["chips"] for e in first}) > 1
@@ -0,0 +1,147 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from core.wire import decode_message
+from dqn_agent import DQNAgent
+from env import AGENT_FIELDS, BasicBalatro, State
+from fakemod import FakeBalatroMod
+from instance_pool import RemoteInstance
+
+
+@pytest.fixture
+def mod():
+    mod = FakeBalatroMod(0, seed=1)
+    threading.Thread(target=mod.serve_forever, daemon=True).start()
+    return mod
+
+
+@pytest.fixture
+def client(mod):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(2)
+    sock.connect(("127.0.0.1", mod.sock.getsockname()[1]))
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DQNAgent(device="cpu")
+    yield agent
+    agent.close()
+
+
+def request(sock, command):
+    sock.send(command.encode())
+    return decode_message(sock.recv(65536))
+
+
+def response(sock, command):
+    """The reply to `command`, skipping gamestates pushed to a subscriber in between."""
+    sock.send(command.encode())
+    while True:
+        data = decode_message(sock.recv(65536))
+        if "response" in data:
+            return data["response"]
+
+
+def play(mod, agent, steps=20, **kwargs):
+    """Runs a subscribed env against `mod` for `steps` steps, closes it and waits for the mod to handle the BYE."""
+    env = BasicBalatro(agent=agent, instance=RemoteInstance(mod.sock.getsockname()[1]), subscribe=True, **kwargs)
+    env.event_timeout = 2
+    try:
+        for _ in range(steps):
+            env.run_step()
+    finally:
+        env.close()
+    deadline = time.monotonic() + 2
+    while mod.last_seen and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return env
+
+
+def test_status_state_and_actions(client):
+    assert request(client, "STATUS") == {"response": {"status": "READY"}}
+    G = request(client, "GET_STATE")
+    assert G["state"] == State.MENU.value
+    assert G["action_no"] == 1
+    assert request(client, "START_RUN|1|Red Deck|ABC1234|")["response"]["response"].startswith("Action received")
+    assert "error" in request(client, "NOT_AN_ACTION")["response"]
+    assert request(client, "GET_STATE")["state"] == State.BLIND_SELECT.value
+
+
+def test_subscribe_pushes_every_ready_state(client):
+    assert response(client, "SUBSCRIBE") == {"subscribed": True}
+    first = decode_message(client.recv(65536))
+    client.send(b"START_RUN|1|Red Deck|ABC1234|")
+    pushed = [decode_message(client.recv(65536)) for _ in range(2)]
+    states = [data for data in pushed if "state" in data]
+    assert states[0]["action_no"] == first["action_no"] + 1
+    assert response(client, "UNSUBSCRIBE") == {"subscribed": False}
+
+
+def test_bye_forgets_the_client(mod, client):
+    response(client, "FORMAT|PACKED")
+    response(client, "FIELDS|hand")
+    response(client, "SUBSCRIBE")
+    assert response(client, "BYE") == {"bye": True}
+    assert not mod.subscribers and not mod.formats and not mod.fields and not mod.last_seen
+
+
+def test_subscribed_env_plays_and_says_bye(mod, agent):
+    env = play(mod, agent)
+    assert env.last_action_no > 10
+    assert not mod.subscribers and not mod.last_seen
+
+
+def test_packed_format(client):
+    assert response(client, "FORMAT|PACKED") == {"format": "PACKED"}
+    G = request(client, "GET_STATE")
+    assert "packed" in G and G["hand"] == []
+    assert G["game"]["hands_played"] == 0
+    assert "error" in response(client, "FORMAT|XML")
+    assert response(client, "FORMAT|JSON") == {"format": "JSON"}
+    assert "packed" not in request(client, "GET_STATE")
+
+
+def test_get_state_resends_a_lost_request(mod, agent):
+    sendto, dropped = mod.sendto, []
+
+    def drop_first_state(payload, addr):
+        if not dropped and b'"state"' in (payload.encode() if isinstance(payload, str) else payload):
+            dropped.append(payload)
+            return
+        sendto(payload, addr)
+
+    mod.sendto = drop_first_state
+    env = BasicBalatro(agent=agent, instance=RemoteInstance(mod.sock.getsockname()[1]))
+    try:
+        assert env.get_state()["state"] == State.MENU.value
+        assert dropped
+    finally:
+        env.close()
+
+
+def test_config_is_validated(client):
+    assert response(client, "CONFIG|dt=0.5,instant_move=true")["config"]["dt"] == 0.5
+    assert "error" in response(client, "CONFIG|warp=1")
+    assert "error" in response(client, "CONFIG|instant_move=yes")
+
+
+def test_fields_project_the_gamestate(client):
+    assert response(client, "FIELDS|" + ",".join(AGENT_FIELDS))["fields"]
+    G = request(client, "GET_STATE")
+    assert set(G) == {"state", "waitingForAction", "action_no", "hand", "game", "current_round", "shop"}
+    assert set(G["game"]) == {"round", "dollars", "chips", "hands_played"}
+    assert "error" in response(client, "FIELDS|nope")
+    assert response(client, "FIELDS|") == {"fields": "ALL"}
+
+
+def test_env_plays_with_packed_projected_gamestates(mod, agent):
+    env = play(mod, agent, wire_format="packed", fields=AGENT_FIELDS)
+    assert env.last_action_no > 10
+    assert not mod.subscribers and not mod.formats and not mod.fields
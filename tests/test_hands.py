@@ -0,0 +1,125 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from core.hands import (HAND_NAMES, SUBSETS, SUITS, classify, encode_cards, encode_hands, evaluate,
+                        evaluate_subsets, hand_reward)
+
+
+# The Counter-based classifier of balsim and reward of BasicBalatro.evaluate_hand that core.hands replaced
+
+def reference_is_straight(ranks):
+    if len(ranks) != 5 or len(set(ranks)) != 5:
+        return False
+    ranks = sorted(ranks)
+    if ranks == [2, 3, 4, 5, 14]:
+        return True
+    return ranks[-1] - ranks[0] == 4
+
+
+def reference_classify(cards):
+    ranks = [rank for rank, _ in cards]
+    counts = Counter(ranks)
+    flush = len(cards) == 5 and len(set(suit for _, suit in cards)) == 1
+    straight = reference_is_straight(ranks)
+    groups = sorted(counts.values(), reverse=True)
+    everything = list(range(len(cards)))
+
+    def of_rank(*wanted):
+        return [i for i, rank in enumerate(ranks) if counts[rank] in wanted]
+
+    if groups[0] == 5:
+        return ("Flush Five" if flush else "Five of a Kind"), everything
+    if flush and groups[:2] == [3, 2]:
+        return "Flush House", everything
+    if flush and straight:
+        return "Straight Flush", everything
+    if groups[0] == 4:
+        return "Four of a Kind", of_rank(4)
+    if groups[:2] == [3, 2]:
+        return "Full House", everything
+    if flush:
+        return "Flush", everything
+    if straight:
+        return "Straight", everything
+    if groups[0] == 3:
+        return "Three of a Kind", of_rank(3)
+    if groups[:2] == [2, 2]:
+        return "Two Pair", of_rank(2)
+    if groups[0] == 2:
+        return "Pair", of_rank(2)
+    high = max(range(len(cards)), key=lambda i: ranks[i])
+    return "High Card", [high]
+
+
+def reference_reward(hand):
+    rank_counts = Counter(card["id"] for card in hand)
+    suit_counts = Counter(card["suit"] for card in hand)
+    if any(count >= 5 for count in suit_counts.values()):
+        return 40
+    elif all(count in rank_counts.values() for count in [2, 3]):
+        return 40
+    elif 3 in rank_counts.values():
+        return 30
+    elif list(rank_counts.values()).count(2) >= 2:
+        return 20
+    elif 2 in rank_counts.values():
+        return 10
+    else:
+        return -15
+
+
+def random_cards(rng, size):
+    # Few ranks and suits, so pairs, flushes and five of a kind come up often; None is an unknown suit
+    ranks = rng.sample(range(2, 15), 4) + [2, 3, 4, 5, 14]
+    return [(rng.choice(ranks), rng.choice(SUITS[:2] + [None])) for _ in range(size)]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_classify_matches_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(3000):
+        cards = random_cards(rng, rng.randint(1, 5))
+        assert classify(cards) == reference_classify(cards), cards
+
+
+def test_named_hands():
+    assert classify([(14, "Spades"), (2, "Spades"), (3, "Spades"), (4, "Spades"), (5, "Spades")])[0] == \
+        "Straight Flush"
+    assert classify([(9, "Hearts"), (9, "Spades"), (4, "Clubs"), (4, "Hearts"), (4, "Spades")]) == \
+        ("Full House", [0, 1, 2, 3, 4])
+    assert classify([(13, "Hearts"), (9, "Spades"), (13, "Clubs")]) == ("Pair", [0, 2])
+    assert classify([(7, "Hearts"), (12, "Spades")]) == ("High Card", [1])
+
+
+def test_hand_reward_matches_reference():
+    rng = random.Random(7)
+    for _ in range(5000):
+        hand = [{"id": rank, "suit": suit} for rank, suit in random_cards(rng, rng.randint(1, 5))]
+        assert hand_reward(hand) == reference_reward(hand), hand
+
+
+def test_evaluate_matches_classify():
+    rng = random.Random(11)
+    hands = [random_cards(rng, rng.randint(1, 5)) for _ in range(2000)]
+    ranks, suits = encode_hands([[{"id": r, "suit": s} for r, s in hand] for hand in hands], slots=5)
+    category, _, scoring, _ = evaluate(ranks, suits)
+    for row, hand in enumerate(hands):
+        name, indices = classify(hand)
+        assert HAND_NAMES[category[row]] == name
+        assert np.flatnonzero(scoring[row]).tolist() == indices
+
+
+def test_evaluate_subsets_matches_evaluate():
+    rng = random.Random(5)
+    hand = [{"id": rank, "suit": suit} for rank, suit in random_cards(rng, 8)]
+    ranks, suits = encode_hands([hand])
+    categories, scores = evaluate_subsets(ranks, suits)
+    for s, subset in enumerate(SUBSETS):
+        played = [hand[i] for i in subset if i < 8]
+        single_ranks, single_suits = encode_cards(played, 5)
+        category, _, _, score = evaluate(single_ranks, single_suits)
+        assert categories[0, s] == category
+        assert scores[0, s] == score
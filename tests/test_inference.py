@@ -0,0 +1,51 @@
+import warnings
+
+import pytest
+import torch
+
+from core.balnetworks import SimpleDQN
+from core.inference import InferenceEngine
+
+
+@pytest.fixture
+def net():
+    torch.manual_seed(0)
+    return SimpleDQN(24, 10)
+
+
+def test_int8_agrees_with_the_eager_network(net):
+    engine = InferenceEngine(net, "int8")
+    states = torch.rand((2000, 24))
+    with torch.inference_mode():
+        expected, actual = net(states), engine(states)
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=0.05)
+    assert engine.agreement(states) > 0.95
+
+
+def test_refresh_follows_the_weights(net):
+    engine = InferenceEngine(net, "int8", refresh_every=2)
+    states = torch.rand((64, 24))
+    with torch.no_grad():
+        for parameter in net.parameters():
+            parameter.mul_(-1)
+    # A snapshot keeps acting with the old weights until refresh_every updates were reported
+    engine.updated()
+    with torch.inference_mode():
+        assert not torch.allclose(engine(states), net(states), atol=0.05)
+        engine.updated()
+        assert torch.allclose(engine(states), net(states), atol=0.05)
+    assert engine.updates == 0
+
+
+def test_build_raises_no_warnings(net):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        InferenceEngine(net, "int8").refresh()
+
+
+def test_rejects_unknown_backends_and_other_networks(net):
+    with pytest.raises(ValueError):
+        InferenceEngine(net, "script")
+    with pytest.raises(ValueError):
+        InferenceEngine(SimpleDQN(24, 10, dtype=torch.bfloat16), "int8")
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import instance_pool
+from instance_pool import InstancePool
+
+FAKEMOD_PATH = Path(__file__).resolve().parent.parent / "fakemod.py"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # The pool launches fakemod.py exactly as it would launch the game
+    monkeypatch.setenv("BALATRO_EXEC_PATH", str(FAKEMOD_PATH))
+    pool = InstancePool(2, startup_timeout=20, health_interval=0.1)
+    pool.start()
+    yield pool
+    pool.close()
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_start_warms_every_instance(pool):
+    assert all(instance.healthy and instance.alive() for instance in pool.instances)
+    assert all(instance.ping() == "READY" for instance in pool.instances)
+    assert len({instance.port for instance in pool.instances}) == 2
+
+
+def test_acquire_blocks_until_release(pool):
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
+
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+    waiter.start()
+    time.sleep(0.1)
+    assert not acquired
+    second.release()
+    waiter.join()
+    assert acquired == [second]
+
+
+def test_acquire_many(pool):
+    with pytest.raises(ValueError):
+        pool.acquire_many(3)
+    instance = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire_many(2, timeout=0.1)
+    instance.release()
+    assert set(pool.acquire_many(2)) == set(pool.instances)
+
+
+def test_supervisor_relaunches_an_exited_instance(pool):
+    instance = pool.acquire()
+    port, generation, pid = instance.port, instance.generation, instance.process.pid
+    instance.kill()
+    assert wait_until(lambda: instance.restarts == 1 and instance.ping() == "READY")
+    assert instance.process.pid != pid
+    assert instance.generation == generation + 1
+    # Relaunched on the same port, so connected envs only need to re-send their setup
+    assert instance.port == port
+    assert instance.in_use
+
+
+@pytest.mark.parametrize("taskset", [True, False])
+def test_pin_runs_each_instance_on_its_core(monkeypatch, taskset):
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if not cores:
+        pytest.skip("no CPU affinity on this platform")
+    monkeypatch.setenv("BALATRO_EXEC_PATH", str(FAKEMOD_PATH))
+    if not taskset:
+        # Without taskset the pool pins the process right after launching it
+        monkeypatch.setattr(instance_pool.shutil, "which", lambda name: None)
+    pool = InstancePool(1, cores=cores[-1:], startup_timeout=20)
+    try:
+        pool.start()
+        assert os.sched_getaffinity(pool.instances[0].process.pid) == {cores[-1]}
+    finally:
+        pool.close()
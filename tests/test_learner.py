@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from core.learner import BackgroundLearner
+
+
+class CountingAgent:
+    """The parts of DQNAgent a BackgroundLearner drives; updates wait for `gate` when one is set."""
+
+    def __init__(self, size=256, gate=None, fail=False):
+        self.memory = [None] * size
+        self.gate = gate
+        self.fail = fail
+        self.steps_done = 0
+        self.updates = 0
+        self.published = 0
+        self.saved = []
+
+    def sample_and_learn(self):
+        if self.fail:
+            raise ValueError("bad batch")
+        if self.gate is not None:
+            self.gate.wait()
+        self.updates += 1
+
+    def publish_policy(self):
+        self.published += 1
+
+    def save_checkpoint(self):
+        self.saved.append(self.steps_done)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.mark.parametrize("replay_ratio, pushes, updates", [(0.5, 100, 50), (4, 10, 40)])
+def test_updates_follow_the_replay_ratio(replay_ratio, pushes, updates):
+    agent = CountingAgent()
+    learner = BackgroundLearner(agent, replay_ratio, min_size=1, publish_every=8, max_lag=None)
+    try:
+        for _ in range(pushes):
+            learner.transition_pushed()
+        assert wait_until(lambda: learner.updates == updates)
+        time.sleep(0.05)
+        # Caught up: the learner waits for more pushes instead of running ahead
+        assert learner.updates == agent.updates == updates
+        assert agent.published == updates // 8
+    finally:
+        learner.stop()
+
+
+def test_warmup_pushes_owe_no_updates():
+    agent = CountingAgent(size=10)
+    learner = BackgroundLearner(agent, 1.0, min_size=20, max_lag=None)
+    try:
+        for _ in range(5):
+            learner.transition_pushed()
+        time.sleep(0.05)
+        assert learner.pushes == 0 and agent.updates == 0
+    finally:
+        learner.stop()
+
+
+def test_pushes_block_while_the_learner_lags():
+    gate = threading.Event()
+    agent = CountingAgent(gate=gate)
+    learner = BackgroundLearner(agent, 1.0, min_size=1, max_lag=2)
+    pusher = threading.Thread(target=lambda: [learner.transition_pushed() for _ in range(10)])
+    try:
+        pusher.start()
+        # The first update is stuck; the third push puts the learner 3 updates behind and waits
+        assert wait_until(lambda: learner.pushes == 3)
+        time.sleep(0.1)
+        assert learner.pushes == 3 and pusher.is_alive()
+        gate.set()
+        pusher.join(timeout=5)
+        assert not pusher.is_alive()
+        assert wait_until(lambda: learner.updates == 10)
+    finally:
+        gate.set()
+        learner.stop()
+
+
+def test_checkpoints_follow_decisions():
+    agent = CountingAgent()
+    learner = BackgroundLearner(agent, 1.0, min_size=1, save_every=100, max_lag=None)
+    try:
+        for steps in (50, 120, 180, 260):
+            agent.steps_done = steps
+            learner.transition_pushed()
+            assert wait_until(lambda: learner.updates == learner.pushes)
+        assert agent.saved == [120, 260]
+    finally:
+        learner.stop()
+
+
+# The learner thread re-raises after handing the error over
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_a_failed_update_reaches_the_pushing_thread():
+    learner = BackgroundLearner(CountingAgent(fail=True), 1.0, min_size=1, max_lag=0)
+    with pytest.raises(RuntimeError, match="Background learner failed"):
+        learner.transition_pushed()
+    learner.thread.join(timeout=5)
+    assert isinstance(learner.error, ValueError)
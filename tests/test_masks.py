@@ -0,0 +1,82 @@
+import random
+
+import pytest
+import torch
+
+from core.balsim import SELECTING_HAND, BalatroSim
+from core.masks import SUBSET_SELECTIONS, ActionMasker, legal_subsets
+from dqn_agent import DQNAgent
+from env import Actions, BasicBalatro
+
+
+def reference_mask(G, selected):
+    """Illegal actions by the rules leave_correct_actions applied before the mask tables."""
+    mask = [False] * 10
+    if len(selected) == 5:
+        mask[:8] = [True] * 8
+    if len(selected) == 0:
+        mask[8] = mask[9] = True
+    if G["current_round"]["discards_left"] == 0:
+        mask[9] = True
+    for i in range(1, 8 + 1):
+        if i in selected or i + 1 > len(G["hand"]):
+            mask[i-1] = True
+    return mask
+
+
+def random_state(rng):
+    hand_size = rng.randint(0, 9)
+    G = {"hand": [{"id": 2, "suit": "Hearts"}] * hand_size,
+         "current_round": {"discards_left": rng.choice([0, 1, 3])}}
+    selected = rng.sample(range(1, 9), rng.randint(0, 6))
+    return G, selected
+
+
+def test_masks_match_rules():
+    rng = random.Random(0)
+    masker = ActionMasker()
+    states = [random_state(rng) for _ in range(3000)]
+    masks = masker.masks([G for G, _ in states], [selected for _, selected in states], "Hand")
+    for row, (G, selected) in enumerate(states):
+        assert masks[row].tolist() == reference_mask(G, selected), (len(G["hand"]), selected)
+        assert torch.equal(masker.mask(G, selected, "Hand"), masks[row])
+
+
+def test_other_contexts_are_unmasked():
+    G, selected = random_state(random.Random(1))
+    assert not ActionMasker().mask(G, selected, "Shop").any()
+
+
+
+def test_legal_subsets_use_the_card_mask():
+    masker = ActionMasker()
+    for hand_size in range(0, 10):
+        G = {"hand": [None] * hand_size, "current_round": {"discards_left": 1}}
+        selectable = [i + 1 for i in range(8) if not masker.mask(G, [], "Hand")[i]]
+        expected = [s for s, selection in enumerate(SUBSET_SELECTIONS) if set(selection) <= set(selectable)]
+        assert legal_subsets(G).tolist() == expected
+    assert len(legal_subsets({"hand": [None] * 9})) == 218
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DQNAgent(device="cpu")
+    yield agent
+    agent.close()
+
+
+def test_subset_mode_falls_back_to_card_actions(agent):
+    sim = BalatroSim(seed=3)
+    env = BasicBalatro(agent=agent, simulator=sim, action_mode="subset")
+    sim.handle("START_RUN|1|Red Deck||")
+    sim.handle("SELECT_BLIND")
+    G = sim.gamestate()
+    assert G["state"] == SELECTING_HAND
+    # No subset passes the card mask with a single card in hand
+    G = dict(G, hand=G["hand"][:1])
+    assert len(legal_subsets(G)) == 0
+    env.G = G
+    command = env.handle_selecting_hand(G)
+    assert command[0] in (Actions.PLAY_HAND, Actions.DISCARD_HAND)
+    assert command[1]
@@ -0,0 +1,86 @@
+import csv
+import json
+
+import pytest
+
+from core.profiling import Profiler
+
+
+def profiled(report_path):
+    """A profiler that saw 4 env steps of 0.25 s each, 0.5 s of which slept, and 3 busy replies."""
+    profiler = Profiler()
+    profiler.configure(enabled=True, report_path=report_path, report_every=float("inf"))
+    for _ in range(4):
+        profiler.step()
+        profiler.record("env.step", 0.25)
+    for _ in range(2):
+        profiler.record("env.sleep", 0.25)
+    profiler.count("env.busy", 3)
+    return profiler
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    profiler.count("env.busy")
+    profiler.step()
+    with profiler.timer("env.step"):
+        pass
+    assert profiler.snapshot()["counters"] == {} and profiler.snapshot()["timers"] == {}
+    assert profiler.steps == 0
+
+
+def test_snapshot_splits_sleep_from_work(tmp_path):
+    report = profiled(tmp_path / "report.jsonl").snapshot()
+    assert report["steps"] == 4
+    assert report["sleep_s"] == pytest.approx(0.5)
+    assert report["work_s"] == pytest.approx(0.5)
+    assert report["counters"] == {"env.busy": 3}
+    assert report["timers"]["env.step"]["count"] == 4
+    assert report["timers"]["env.step"]["mean_s"] == pytest.approx(0.25)
+
+
+def test_csv_report_columns(tmp_path):
+    path = tmp_path / "report.csv"
+    profiler = profiled(path)
+    profiler.write_report()
+    profiler.write_report()
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    # One header, then the same rows for each report
+    assert list(rows[0]) == ["time", "elapsed_s", "metric", "count", "total_s", "mean_s", "p50_s", "p99_s", "max_s"]
+    assert len(rows) == 10
+    by_metric = {row["metric"]: row for row in rows[:5]}
+    assert set(by_metric) == {"env.step", "env.sleep", "env.busy", "steps", "sleep"}
+    assert int(by_metric["env.step"]["count"]) == 4
+    assert float(by_metric["env.step"]["total_s"]) == pytest.approx(1.0)
+    assert float(by_metric["env.step"]["p50_s"]) == pytest.approx(0.25, rel=0.2)
+    assert by_metric["env.busy"]["count"] == "3" and by_metric["env.busy"]["total_s"] == ""
+    assert int(by_metric["steps"]["count"]) == 4
+    assert float(by_metric["steps"]["total_s"]) == pytest.approx(0.5)
+    assert float(by_metric["steps"]["mean_s"]) == pytest.approx(0.125)
+    assert by_metric["sleep"]["count"] == "" and float(by_metric["sleep"]["total_s"]) == pytest.approx(0.5)
+
+
+def test_jsonl_report_lines(tmp_path):
+    path = tmp_path / "report.jsonl"
+    profiler = profiled(path)
+    profiler.write_report()
+    profiler.count("env.busy")
+    profiler.write_report()
+    reports = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(reports) == 2
+    assert set(reports[0]) == {"time", "elapsed_s", "steps", "steps_per_s", "sleep_s", "work_s", "counters", "timers"}
+    assert set(reports[0]["timers"]["env.step"]) == {"count", "total_s", "mean_s", "p50_s", "p99_s", "max_s"}
+    assert [report["counters"]["env.busy"] for report in reports] == [3, 4]
+
+
+def test_prometheus_report_is_rewritten(tmp_path):
+    path = tmp_path / "report.prom"
+    profiler = profiled(path)
+    profiler.write_report()
+    profiler.write_report()
+    lines = path.read_text().splitlines()
+    assert "balatro_steps_total 4" in lines
+    assert "balatro_env_busy_total 3" in lines
+    assert "balatro_env_step_seconds_count 4" in lines
+    assert lines.count("balatro_steps_total 4") == 1
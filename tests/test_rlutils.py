@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+import torch
+
+from core.rlutils import MinSegmentTree, PrioritizedReplayMemory, ReplayMemory, SumSegmentTree
+
+
+def push_numbered(memory, count, start=0):
+    """Pushes transitions whose state, action and reward all carry their push number."""
+    for n in range(start, start + count):
+        state = torch.full((memory.state_dim,), float(n))
+        memory.push(state, n % 10, None if n % 3 == 0 else state + 1, float(n))
+
+
+def test_replay_memory_wraps_around():
+    memory = ReplayMemory(capacity=5, state_dim=3)
+    push_numbered(memory, 7)
+    assert len(memory) == 5
+    assert memory.total == 7
+    assert memory.position == 2
+    # Pushes 5 and 6 overwrote slots 0 and 1
+    assert memory.rewards.tolist() == [5.0, 6.0, 2.0, 3.0, 4.0]
+    assert memory.non_final.tolist() == [True, False, True, False, True]
+
+
+def test_replay_memory_export_and_restore_keep_push_positions():
+    memory = ReplayMemory(capacity=5, state_dim=3)
+    push_numbered(memory, 7)
+    first, columns = memory.export_since(4)
+    assert first == 4
+    assert columns["reward"].tolist() == [4.0, 5.0, 6.0]
+    # Older pushes than the stored window are gone
+    first, columns = memory.export_since(0)
+    assert first == 2
+    assert columns["reward"].tolist() == [2.0, 3.0, 4.0, 5.0, 6.0]
+
+    restored = ReplayMemory(capacity=5, state_dim=3)
+    restored.load_state_dict(memory.state_dict(), total=memory.total)
+    assert restored.total == 7 and len(restored) == 5 and restored.position == 2
+    assert torch.equal(restored.rewards, memory.rewards)
+    assert torch.equal(restored.states, memory.states)
+
+
+def test_replay_memory_keeps_float32_rewards_with_bfloat16_states():
+    memory = ReplayMemory(capacity=4, state_dim=3, dtype=torch.bfloat16)
+    memory.push(torch.ones(3), 1, None, 1.2345678)
+    assert memory.states.dtype == torch.bfloat16
+    assert memory.rewards.dtype == torch.float32
+    assert memory.next_masks.dtype == torch.bool
+    assert memory.rewards[0].item() == pytest.approx(1.2345678)
+
+
+def test_sum_segment_tree_prefix_sums():
+    tree = SumSegmentTree(6)
+    values = np.array([1.0, 0.0, 2.0, 3.0, 0.5, 1.5])
+    tree.update(np.arange(6), values)
+    assert tree.root() == pytest.approx(values.sum())
+    cumulative = np.cumsum(values)
+    queries = np.array([0.0, 0.99, 1.0, 2.5, 3.0, 5.9, 6.0, 7.9])
+    expected = np.searchsorted(cumulative, queries, side="right")
+    assert tree.find_prefixsum(queries).tolist() == expected.tolist()
+
+    tree.update([3], [0.0])
+    assert tree.root() == pytest.approx(values.sum() - 3.0)
+    assert tree.find_prefixsum([3.2]).tolist() == [4]
+
+
+def test_min_segment_tree():
+    tree = MinSegmentTree(5)
+    assert tree.root() == np.inf
+    tree.update([0, 1, 2], [3.0, 1.0, 2.0])
+    assert tree.root() == 1.0
+    tree.update([1], [5.0])
+    assert tree.root() == 2.0
+    assert tree[[0, 1, 2]].tolist() == [3.0, 5.0, 2.0]
+
+
+def test_prioritized_replay_samples_by_priority():
+    np.random.seed(0)
+    memory = PrioritizedReplayMemory(capacity=4, state_dim=3, alpha=1.0)
+    push_numbered(memory, 4)
+    memory.update_priorities([0, 1, 2, 3], [0.0, 0.0, 0.0, 9.0])
+    batch, weights, indices = memory.sample_weighted(64)
+    # Priority is |td| + eps, so slot 3 carries almost all the mass
+    assert (indices == 3).mean() > 0.95
+    assert batch.reward[indices == 3].eq(3.0).all()
+    # The rarest sample gets the largest weight, normalized to 1
+    assert weights.dtype == torch.float32
+    assert weights.max().item() <= 1.0 + 1e-6
+    assert memory.max_priority == pytest.approx(9.0 + memory.eps)
+
+
+def test_prioritized_replay_keeps_priorities_of_refilled_slots():
+    memory = PrioritizedReplayMemory(capacity=4, state_dim=3, alpha=1.0)
+    push_numbered(memory, 4)
+    pushed = memory.total
+    push_numbered(memory, 1, start=4) # refills slot 0 after the sample was taken
+    memory.update_priorities(np.array([0, 1]), np.array([0.5, 0.5]), pushed)
+    assert memory.sum_tree[[0]][0] == pytest.approx(1.0) # still the max priority it was pushed with
+    assert memory.sum_tree[[1]][0] == pytest.approx(0.5 + memory.eps)
+
+
+def test_prioritized_replay_samples_only_restored_slots():
+    source = ReplayMemory(capacity=8, state_dim=3)
+    push_numbered(source, 11)
+    # A checkpoint holding the last 5 of 11 pushes restores them to slots 6, 7, 0, 1, 2 of a larger memory
+    _, window = source.export_since(6)
+    memory = PrioritizedReplayMemory(capacity=8, state_dim=3)
+    memory.load_state_dict(window, total=11)
+    stored = {6, 7, 0, 1, 2}
+    assert len(memory) == 5
+    np.random.seed(0)
+    for _ in range(50):
+        batch, _, indices = memory.sample_weighted(32)
+        assert set(indices.tolist()) <= stored
+        assert set(batch.reward.tolist()) <= {6.0, 7.0, 8.0, 9.0, 10.0}
+
+
+def test_prioritized_replay_restore_forgets_old_priorities():
+    memory = PrioritizedReplayMemory(capacity=8, state_dim=3)
+    push_numbered(memory, 8)
+    source = ReplayMemory(capacity=8, state_dim=3)
+    push_numbered(source, 3)
+    memory.load_state_dict(source.state_dict(), total=3)
+    assert memory.sum_tree[np.arange(3, 8)].tolist() == [0.0] * 5
+    np.random.seed(1)
+    _, _, indices = memory.sample_weighted(64)
+    assert set(indices.tolist()) <= {0, 1, 2}
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from core.balsim import BalatroSim
+from dqn_agent import DQNAgent
+from fakemod import FakeBalatroMod
+from instance_pool import RemoteInstance
+from vec_env import VecBalatroEnv
+
+
+class ModPool:
+    """Stands in for a started InstancePool: one fake mod per instance, each BUSY for its own time."""
+
+    def __init__(self, busy):
+        self.mods = [FakeBalatroMod(0, seed=i, busy=b) for i, b in enumerate(busy)]
+        for mod in self.mods:
+            threading.Thread(target=mod.serve_forever, daemon=True).start()
+
+    def __len__(self):
+        return len(self.mods)
+
+    def acquire_many(self, count):
+        return [RemoteInstance(mod.sock.getsockname()[1]) for mod in self.mods[:count]]
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DQNAgent(device="cpu")
+    agent.batches = []
+    agent.updates = 0
+    select_actions, optimize_model = agent.select_actions, agent.optimize_model
+
+    def counted_select(game_states, selections, context):
+        agent.batches.append(len(game_states))
+        return select_actions(game_states, selections, context)
+
+    def counted_optimize():
+        agent.updates += 1
+        return optimize_model()
+
+    agent.select_actions = counted_select
+    agent.optimize_model = counted_optimize
+    yield agent
+    agent.close()
+
+
+def test_lockstep_batches_every_env_with_one_update_each(agent):
+    vec = VecBalatroEnv(simulators=[BalatroSim(seed=i) for i in range(3)], agent=agent)
+    try:
+        # A run takes at least eight decisions to lose, so no game over adds updates of its own
+        for _ in range(7):
+            assert vec.step() == 3
+    finally:
+        vec.close()
+    assert agent.batches == [3] * 7
+    assert agent.updates == 7
+
+
+def test_lockstep_waits_for_the_slowest_env(agent):
+    vec = VecBalatroEnv(pool=ModPool([0.0, 0.2]), agent=agent, subscribe=True)
+    try:
+        for _ in range(4):
+            assert vec.step() == 2
+    finally:
+        vec.close()
+    assert agent.batches == [2] * 4
+    assert agent.updates == 4
+
+
+def test_async_answers_fast_envs_without_waiting(agent):
+    vec = VecBalatroEnv(pool=ModPool([0.0, 0.3]), agent=agent, subscribe=True, asynchronous=True, min_batch=1)
+    try:
+        decisions = 0
+        # Fewer than the eight decisions a run takes to lose, so every update comes from a batch
+        while decisions < 6:
+            decisions += vec.step()
+    finally:
+        vec.close()
+    assert 1 in agent.batches
+    assert len(agent.batches) > 3 # lockstep would have taken three 2-env batches
+    assert agent.updates == len(agent.batches)
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+
+from core.balsim import BalatroSim
+from core.encoders import encode_games
+from core.wire import decode_hand_into, decode_message, is_packed, pack_gamestate, unpack_gamestate
+
+
+def sample_gamestate():
+    return {
+        "state": 1, "action_no": 4321, "waitingForAction": True,
+        "game": {"round": 3, "dollars": -2, "chips": 1234.5, "hands_played": 7},
+        "hand": [{"id": 14, "suit": "Spades"}, {"id": 2, "suit": "Hearts"}, {"id": 10, "suit": "Clubs"}],
+        "shop": {"cards": [{"type": "Joker", "cost": 6}, {"type": "Planet", "cost": 3}]},
+        "current_round": {"hands_left": 2, "discards_left": 0},
+    }
+
+
+def test_pack_unpack_roundtrip():
+    G = sample_gamestate()
+    data = pack_gamestate(G)
+    assert is_packed(data)
+    unpacked = unpack_gamestate(data)
+    assert unpacked["state"] == 1
+    assert unpacked["action_no"] == 4321
+    assert unpacked["waitingForAction"] is True
+    assert unpacked["game"] == {"round": 3, "dollars": -2, "chips": 1234.5, "hands_played": 7}
+    assert unpacked["hand"] == G["hand"]
+    assert unpacked["shop"] == {"cards": [{"type": "Joker", "cost": 6}, {"type": "Other", "cost": 3}]}
+    assert unpacked["current_round"] == {"hands_left": 2, "discards_left": 0}
+    assert pack_gamestate(unpacked) == data
+
+
+def test_roundtrip_of_simulated_gamestates():
+    sim = BalatroSim(seed=3)
+    sim.handle("START_RUN|1|Red Deck|SEED|")
+    sim.handle("SELECT_BLIND")
+    G = sim.gamestate()
+    unpacked = unpack_gamestate(pack_gamestate(G))
+    assert unpacked["hand"] == [{"id": card["id"], "suit": card["suit"]} for card in G["hand"]]
+    assert unpacked["current_round"]["hands_left"] == G["current_round"]["hands_left"]
+
+
+def test_decode_message_tells_packed_from_json():
+    G = sample_gamestate()
+    assert decode_message(json.dumps(G).encode())["action_no"] == 4321
+    assert decode_message(pack_gamestate(G))["action_no"] == 4321
+
+
+def test_decode_hand_into_matches_hand():
+    row = np.full(16, -1, dtype=np.float32)
+    decode_hand_into(row, pack_gamestate(sample_gamestate()))
+    assert row[:6].tolist() == [14, 2, 2, 0, 10, 3]
+    assert (row[6:] == -1).all()
+
+
+def test_unknown_suits_are_rejected_in_both_formats():
+    G = sample_gamestate()
+    G["hand"][1]["suit"] = None
+    packed = unpack_gamestate(pack_gamestate(G))
+    assert packed["hand"][1]["suit"] is None
+    with pytest.raises(ValueError):
+        encode_games([G], [[]])
+    with pytest.raises(ValueError):
+        encode_games([packed], [[]])
@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from env import BasicBalatro, State, get_available_port
+from dqn_agent import DQNAgent
+
+
+class VecBalatroEnv:
+    """Drives several BasicBalatro environments with one shared DQNAgent.
+
+    Every env escalates SELECTING_HAND instead of answering it itself. Pending
+    hand decisions are encoded together and answered with one batched forward
+    pass, then the resulting commands are dispatched back to their envs.
+
+    Real game instances are stepped in worker threads, since they spend most
+    of their time waiting on the game. Simulated envs are stepped inline.
+    In lockstep mode a batch waits for every env; in asynchronous mode it is
+    formed as soon as `min_batch` envs are waiting for a decision.
+    Given a started InstancePool, one env is attached to each of its
+    instances instead of launching games of their own.
+    """
+
+    def __init__(self, num_envs=None, simulators=None, verbose=False, agent=None,
+                 asynchronous=False, min_batch=1, subscribe=False, pool=None, replay_ratio=None):
+        # replay_ratio configures the agent created when none is given; a given one is the caller's to close
+        self.owns_agent = agent is None
+        self.agent = agent if agent is not None else DQNAgent(replay_ratio=replay_ratio)
+        self.asynchronous = asynchronous
+        self.min_batch = min_batch
+        # Serializes replay pushes and gradient steps between worker threads
+        self.lock = threading.Lock()
+
+        self.envs = []
+        if simulators is not None:
+            for simulator in simulators:
+                self.envs.append(BasicBalatro(verbose=verbose, simulator=simulator, agent=self.agent,
+                                              policy_states=[State.SELECTING_HAND]))
+        elif pool is not None:
+            for instance in pool.acquire_many(num_envs if num_envs is not None else len(pool)):
+                self.envs.append(BasicBalatro(verbose=verbose, agent=self.agent, instance=instance,
+                                              policy_states=[State.SELECTING_HAND], subscribe=subscribe))
+        else:
+            port = get_available_port()
+            for _ in range(num_envs):
+                self.envs.append(BasicBalatro(verbose=verbose, agent=self.agent, port=port,
+                                              policy_states=[State.SELECTING_HAND], subscribe=subscribe))
+                port = get_available_port(start=port + 1)
+
+        for env in self.envs:
+            env.state_handlers[State.GAME_OVER] = self.locked(env.handle_game_over)
+
+        self.executor = None
+        if simulators is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.envs))
+        self.futures = {}
+        self.pending = []
+
+    def locked(self, handler):
+        def call(state):
+            with self.lock:
+                return handler(state)
+        return call
+
+    def collect(self):
+        """Returns the envs currently waiting for a hand decision."""
+        waiting = [env for env in self.envs if env not in self.pending and env not in self.futures.values()]
+
+        if self.executor is None:
+            for env in waiting:
+                env.run_until_policy()
+                self.pending.append(env)
+            return self.pending
+
+        for env in waiting:
+            self.futures[self.executor.submit(env.run_until_policy)] = env
+
+        if self.asynchronous:
+            done = set()
+            while self.futures and len(self.pending) + len(done) < self.min_batch:
+                finished, _ = wait(self.futures, return_when=FIRST_COMPLETED)
+                done |= finished
+                done |= {future for future in self.futures if future.done()}
+        else:
+            done, _ = wait(self.futures)
+
+        for future in done:
+            future.result()
+            self.pending.append(self.futures.pop(future))
+        return self.pending
+
+    def act(self, envs):
+        game_states = [env.G for env in envs]
+        with self.lock:
+            for env in envs:
+                env.observe(env.G, "Hand", optimize=False)
+
+            actions = self.agent.select_actions(game_states, [env.selected for env in envs], "Hand")
+
+            for env, action in zip(envs, actions):
+                env.remember_action(env.G, "Hand", action.view(1, 1))
+                command = env.apply_hand_action(action.item())
+                if command is not None:
+                    env.sendcmd(env.actionToCmd(command))
+                    self.pending.remove(env)
+
+            self.agent.optimize_model()
+
+    def step(self):
+        """Advances the envs to their next hand decisions and answers them in one batch.
+
+        Returns the number of decisions made.
+        """
+        ready = list(self.collect())
+        if ready:
+            self.act(ready)
+        return len(ready)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        for env in self.envs:
+            env.close()
+        if self.owns_agent:
+            self.agent.close()